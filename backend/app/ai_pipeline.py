@@ -3,15 +3,23 @@ AI Processing Pipeline - Orchestrates Azure Vision, Azure Face, and OpenAI
 to analyze uploaded media and generate captions.
 """
 
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from app.celery_app import celery_app
+from app.core.config import settings
 from app.database.session import SessionLocal
-from app.database.models_media import Media, ProcessingStatus
+from app.database.models_media import AnalysisCache, Media, ProcessingStatus
 from app.database.models_user import User  # Import User to resolve relationship
+from app.services.analysis_image import prepare_analysis_image
+from app.services.index_shards import index_shards
+from app.services.media_attributes import MediaAttributes
+from app.services.vector_index import vector_index
 from app.utils.azure_vision import azure_vision
 from app.utils.azure_face import azure_face
 from app.utils.openai_caption import openai_caption
@@ -26,17 +34,141 @@ def get_db():
         pass  
 
 
+# Bump when prompts or stage logic change, so cached analyses are redone
+PIPELINE_VERSION = 1
+
+# Threads for the analysis stages that can overlap (Vision and Face)
+_stage_pool = ThreadPoolExecutor(
+    max_workers=max(1, settings.pipeline_stage_workers),
+    thread_name_prefix="ai-stage"
+)
+
+
+def _timed(timings: Dict[str, float], stage: str, func, *args):
+    """Run one stage and record its wall-clock time in milliseconds."""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _run_vision(file_path: str) -> Optional[Tuple[List[str], Optional[str]]]:
+    """Azure Vision stage: (tags, description), or None on failure."""
+    try:
+        logger.info(f"Running Azure Vision analysis on {file_path}")
+        vision_result = azure_vision.analyze_image_from_file(file_path)
+        
+        if "error" not in vision_result:
+            tags = vision_result.get("tags", [])
+            logger.info(f"Azure Vision found {len(tags)} tags")
+            return tags, vision_result.get("description")
+        logger.warning(f"Azure Vision error: {vision_result.get('error')}")
+    
+    except Exception as e:
+        logger.error(f"Azure Vision analysis failed: {str(e)}")
+    
+    return None
+
+
+def _run_face(file_path: str) -> Optional[Dict]:
+    """Azure Face stage: emotion data, a note when Face is off, or None on failure."""
+    # Note: Azure Face API requires Limited Access approval for most features
+    # Without it, Azure Vision + OpenAI provide sufficient analysis
+    if not settings.azure_face_enabled:
+        logger.info("Skipping Azure Face (requires Limited Access approval)")
+        return {"note": "Azure Face requires special approval - using Vision + OpenAI instead"}
+    
+    try:
+        logger.info(f"Running Azure Face analysis on {file_path}")
+        face_result = azure_face.detect_emotion_from_file(file_path)
+        
+        if "error" not in face_result:
+            logger.info(f"Azure Face found {face_result.get('face_count', 0)} face(s)")
+            return face_result.get("emotions", {})
+        logger.warning(f"Azure Face error: {face_result.get('error')}")
+    
+    except Exception as e:
+        logger.error(f"Azure Face analysis failed: {str(e)}")
+    
+    return None
+
+
+def _run_caption(tags: List[str], emotions: Dict, vision_description: Optional[str]) -> Tuple[str, bool]:
+    """OpenAI caption stage: (caption, False if it is a fallback caption)."""
+    try:
+        if tags or emotions or vision_description:
+            logger.info("Generating caption with OpenAI")
+            caption = openai_caption.generate_caption(
+                tags=tags,
+                emotions=emotions,
+                description=vision_description,
+                strict=True
+            )
+            logger.info(f"Generated caption: {caption[:100]}...")
+            return caption, True
+        
+        logger.warning("No AI data available, using default caption")
+        return "A photo.", True
+    
+    except Exception as e:
+        logger.error(f"Caption generation failed: {str(e)}")
+        return openai_caption.fallback_caption(tags, vision_description), False
+
+
+def pipeline_version() -> str:
+    """
+    Version of everything an analysis depends on; cached analyses are only
+    reused by a pipeline with the same version.
+    """
+    from app.utils.embeddings import embedding_service
+    
+    face = "face" if settings.azure_face_enabled else "noface"
+    return (
+        f"{PIPELINE_VERSION}:{openai_caption.model}:"
+        f"{embedding_service.model}-{settings.embedding_dimension}:{face}"
+    )
+
+
+def _cached_analysis(db: Session, content_hash: Optional[str]) -> Optional[AnalysisCache]:
+    """The stored analysis of identical file bytes, if any."""
+    if not content_hash:
+        return None
+    return db.get(AnalysisCache, (content_hash, pipeline_version()))
+
+
+def _store_analysis(db: Session, media: Media, vision_description: Optional[str]) -> None:
+    """Remember a complete analysis for later uploads of the same bytes."""
+    try:
+        db.merge(AnalysisCache(
+            content_hash=media.content_hash,
+            pipeline_version=pipeline_version(),
+            tags=media.tags,
+            description=vision_description,
+            emotion=media.emotion,
+            caption=media.caption,
+            embedding=media.embedding
+        ))
+        db.commit()
+    except SQLAlchemyError as e:
+        # e.g. a concurrent upload of the same file stored it first
+        db.rollback()
+        logger.warning(f"Failed to cache analysis for media {media.id}: {str(e)}")
+
+
 @celery_app.task(bind=True, name="process_media_task")
 def process_media_task(self, media_id: int, file_path: str):
     """
     Background task to process uploaded media with AI analysis.
     
     This task:
-    1. Fetches the media record from database
-    2. Runs Azure Vision analysis for tags and description
-    3. Runs Azure Face analysis for emotion detection
-    4. Generates a natural caption using OpenAI GPT-4
-    5. Updates the database with results
+    1. Fetches the media record from database (and, if the same file
+       bytes were analyzed before, reuses that analysis for steps 2-4)
+    2. Runs Azure Vision analysis (tags, description) and Azure Face
+       analysis (emotions) concurrently on a downscaled copy of the file
+    3. Generates a natural caption using OpenAI GPT-4 from both
+    4. Generates the search embedding from the caption
+    5. Updates the database with results and per-stage timings
     
     Args:
         media_id: Database ID of the media record
@@ -58,55 +190,34 @@ def process_media_task(self, media_id: int, file_path: str):
         
         logger.info(f"Starting AI pipeline for media {media_id}: {file_path}")
         
-        # Initialize results
-        tags = []
-        emotions = {}
-        caption = None
-        vision_description = None
+        timings: Dict[str, float] = {}
+        pipeline_start = time.perf_counter()
         
-        # Step 1: Azure Vision Analysis
-        try:
-            logger.info(f"Running Azure Vision analysis on {file_path}")
-            vision_result = azure_vision.analyze_image_from_file(file_path)
+        # The same bytes were analyzed before (re-upload, shared photo): no API calls
+        cached = _timed(timings, "cache", _cached_analysis, db, media.content_hash)
+        if cached is not None:
+            logger.info(f"Reusing cached analysis for media {media_id} ({media.content_hash[:12]})")
+            tags = cached.tags or []
+            emotions = cached.emotion or {}
+            caption = cached.caption
+            vision_description = cached.description
+            complete = True
+        else:
+            # Both analyses get one downscaled, upright JPEG (kept for retries)
+            analysis_path = _timed(timings, "prepare", prepare_analysis_image, file_path)
             
-            if "error" not in vision_result:
-                tags = vision_result.get("tags", [])
-                vision_description = vision_result.get("description")
-                logger.info(f"Azure Vision found {len(tags)} tags")
-            else:
-                logger.warning(f"Azure Vision error: {vision_result.get('error')}")
-        
-        except Exception as e:
-            logger.error(f"Azure Vision analysis failed: {str(e)}")
-        
-        # Step 2: Azure Face Analysis
-        # Note: Azure Face API requires Limited Access approval for most features
-        # Skipping for now - Azure Vision + OpenAI provide sufficient analysis
-        try:
-            logger.info("Skipping Azure Face (requires Limited Access approval)")
-            emotions = {"note": "Azure Face requires special approval - using Vision + OpenAI instead"}
-            face_count = 0
-        
-        except Exception as e:
-            logger.error(f"Azure Face analysis failed: {str(e)}")
-        
-        # Step 3: OpenAI Caption Generation
-        try:
-            if tags or emotions or vision_description:
-                logger.info("Generating caption with OpenAI")
-                caption = openai_caption.generate_caption(
-                    tags=tags,
-                    emotions=emotions,
-                    description=vision_description
-                )
-                logger.info(f"Generated caption: {caption[:100]}...")
-            else:
-                caption = "A photo."
-                logger.warning("No AI data available, using default caption")
-        
-        except Exception as e:
-            logger.error(f"Caption generation failed: {str(e)}")
-            caption = "A memorable moment."
+            # Steps 1-2: Vision and Face only read the file, so they run side by side
+            vision_future = _stage_pool.submit(_timed, timings, "vision", _run_vision, analysis_path)
+            face_future = _stage_pool.submit(_timed, timings, "face", _run_face, analysis_path)
+            vision = vision_future.result()
+            face = face_future.result()
+            tags, vision_description = vision if vision is not None else ([], None)
+            emotions = face if face is not None else {}
+            
+            # Step 3: OpenAI Caption Generation (needs both analyses)
+            caption, captioned = _timed(timings, "caption", _run_caption, tags, emotions, vision_description)
+            # Only fully successful analyses are cached
+            complete = vision is not None and face is not None and captioned
         
         # Step 4: Update database with results
         media.tags = tags
@@ -123,10 +234,14 @@ def process_media_task(self, media_id: int, file_path: str):
             search_text = embedding_service.generate_search_text(media)
             media.search_text = search_text
             
-            # Generate embedding
-            embedding_vector = embedding_service.generate_embedding(search_text)
-            if embedding_vector:
-                media.embedding = embedding_vector  # Store as JSON in SQLite
+            # Generate embedding (needs the caption)
+            if cached is not None:
+                embedding_vector = cached.embedding
+            else:
+                embedding_vector = _timed(timings, "embedding", embedding_service.embed_document, search_text)
+            if embedding_vector is not None and len(embedding_vector):
+                media.embedding = embedding_vector  # Stored as a binary float32 vector
+                media.coarse_embedding = embedding_service.coarse_embedding(embedding_vector)
                 logger.info(f"Generated embedding with {len(embedding_vector)} dimensions")
             else:
                 logger.warning("Failed to generate embedding")
@@ -145,9 +260,32 @@ def process_media_task(self, media_id: int, file_path: str):
         except Exception as e:
             logger.error(f"Failed to generate embedding: {str(e)}")
         
+        timings["total"] = round((time.perf_counter() - pipeline_start) * 1000, 1)
+        media.metadata_json = {**(media.metadata_json or {}), "pipeline_timings_ms": timings}
+        logger.info(f"Pipeline timings for media {media_id} (ms): {timings}")
+        
         db.commit()
         db.refresh(media)
         
+        if cached is None and complete and media.content_hash and media.embedding is not None:
+            _store_analysis(db, media, vision_description)
+        
+        # Keep this process's search index in sync with the new embedding
+        if media.embedding is not None:
+            # With shards on, the global index only serves unscoped searches
+            # and loads their candidates on demand: refresh what it already
+            # holds rather than growing a second copy of every library
+            if not index_shards.enabled or media.id in vector_index:
+                vector_index.upsert(media.id, media.embedding)
+            index_shards.upsert(media.owner_id, media.id, media.embedding, MediaAttributes.of(media))
+            
+            # Precompute its "more like this" list and slot it into its neighbours'
+            try:
+                from app.services.search_service import SearchService
+                SearchService(db).index_neighbors(media.id)
+            except Exception as e:
+                logger.warning(f"Failed to update neighbour lists for media {media_id}: {str(e)}")
+        
         logger.info(f"✅ Successfully processed media {media_id}")
         
         # NOTE: We do NOT auto-create albums during upload anymore.
@@ -160,7 +298,9 @@ def process_media_task(self, media_id: int, file_path: str):
             "status": "done",
             "tags": tags,
             "emotions": emotions,
-            "caption": caption
+            "caption": caption,
+            "cached": cached is not None,
+            "timings_ms": timings
         }
     
     except Exception as e:
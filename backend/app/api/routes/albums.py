@@ -2,7 +2,7 @@
 Albums API Routes - AI-Generated Smart Albums
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
@@ -13,12 +13,12 @@ import os
 
 from app.database.session import get_db
 from app.database.models_album import Album
-from app.database.models_media import Media, ProcessingStatus
+from app.database.models_media import Media, media_card_columns
 from app.database.models_user import User
 from app.core.dependencies import get_current_user
+from app.schemas.media import MediaCard
 from app.services.album_service import SmartAlbumService
 from app.services.search_service import SearchService
-from app.utils.embeddings import embedding_service
 
 
 router = APIRouter(tags=["Albums"])
@@ -51,18 +51,9 @@ class AlbumSummary(BaseModel):
         from_attributes = True
 
 
-class MediaInAlbum(BaseModel):
+class MediaInAlbum(MediaCard):
     """Media item within an album"""
-    id: int
-    filename: str
-    file_url: str
-    caption: Optional[str] = None
-    tags: Optional[List[str]] = None
-    has_people: bool
-    created_at: datetime
-    
-    class Config:
-        from_attributes = True
+    has_people: bool = False
 
 
 class AlbumDetail(BaseModel):
@@ -186,20 +177,13 @@ async def get_album(
         raise HTTPException(status_code=404, detail="Album not found")
     
     # Get all media in album
-    media_items = album.media_items.all()
+    media_items = album.media_items.options(media_card_columns()).all()
     
     # Build media list
-    media_list = []
-    for media in media_items:
-        media_list.append(MediaInAlbum(
-            id=media.id,
-            filename=media.filename,
-            file_url=f"{backend_url}/uploads/{Path(media.stored_path).name}",
-            caption=media.caption,
-            tags=media.tags,
-            has_people=media.has_people or False,
-            created_at=media.created_at
-        ))
+    media_list = [
+        MediaInAlbum.from_media(media, backend_url, has_people=media.has_people or False)
+        for media in media_items
+    ]
     
     # Build response
     cover_url = None
@@ -353,7 +337,7 @@ async def create_album_from_prompt(
         db.flush()
         
         # Add media to album
-        media_items = db.query(Media).filter(
+        media_items = db.query(Media).options(media_card_columns()).filter(
             Media.id.in_(media_ids),
             Media.owner_id == current_user.id
         ).all()
@@ -369,17 +353,10 @@ async def create_album_from_prompt(
         db.refresh(new_album)
         
         # Build full response with media
-        media_list = []
-        for media in media_items:
-            media_list.append(MediaInAlbum(
-                id=media.id,
-                filename=media.filename,
-                file_url=f"{backend_url}/uploads/{Path(media.stored_path).name}",
-                caption=media.caption,
-                tags=media.tags,
-                has_people=media.has_people or False,
-                created_at=media.created_at
-            ))
+        media_list = [
+            MediaInAlbum.from_media(media, backend_url, has_people=media.has_people or False)
+            for media in media_items
+        ]
         
         # Build response
         cover_url = None
@@ -569,19 +546,8 @@ async def rebuild_all_albums(
         ).delete()
         db.commit()
     
-    # Get all processed media
-    media_items = db.query(Media).filter(
-        Media.owner_id == current_user.id,
-        Media.status == ProcessingStatus.DONE
-    ).all()
-    
-    # Assign each to albums
-    album_service = SmartAlbumService(db)
-    total_assigned = 0
-    
-    for media in media_items:
-        albums = album_service.assign_to_albums(media)
-        total_assigned += len(albums)
+    # Albums for every processed photo's top tags, from tag aggregates
+    rebuilt = SmartAlbumService(db).rebuild_albums(current_user.id)
     
     # Get final album count
     album_count = db.query(func.count(Album.id)).filter(
@@ -591,6 +557,6 @@ async def rebuild_all_albums(
     return {
         "message": "Albums rebuilt successfully",
         "total_albums": album_count,
-        "photos_processed": len(media_items),
-        "assignments_made": total_assigned
+        "photos_processed": rebuilt["photos_processed"],
+        "assignments_made": rebuilt["assignments_made"]
     }
@@ -1,9 +1,14 @@
 from fastapi import APIRouter
 from app.schemas.common import HealthResponse
+from app.utils.embeddings import embedding_service
 
 router = APIRouter()
 
 @router.get("/", response_model=HealthResponse)
 def health():
-    """Basic health-check endpoint."""
-    return HealthResponse(status="ok", version="0.1.0")
+    """Basic health-check endpoint, with the query embedding cache counters."""
+    return HealthResponse(
+        status="ok",
+        version="0.1.0",
+        query_embedding_cache=embedding_service.query_cache.stats()
+    )
@@ -1,17 +1,21 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel, Field
+from pydantic import Field
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Request, BackgroundTasks
 from pathlib import Path
-import uuid
 import os
 from sqlalchemy.orm import Session
 from app.services import storage
+from app.services.analysis_image import remove_analysis_images
 from app.database.models_media import Media, ProcessingStatus
 from app.database.session import get_db
 from app.core.dependencies import get_current_user
 from app.database.models_user import User
 from app.ai_pipeline import process_media_sync
+from app.services.index_shards import index_shards
+from app.services.neighbor_graph import neighbor_graph
+from app.services.vector_index import vector_index
+from app.schemas.media import MediaCard
 # Note: we define a local MediaRead (below) so we don't need to import the project's
 # schema here. Importing it earlier caused a name collision and unexpected behavior.
 
@@ -40,28 +44,17 @@ max_size = 10 * 1024 * 1024  # 10 MB
 allowed_types = ("image/jpeg", "image/png")
 
 
-class MediaBase(BaseModel):
+class MediaRead(MediaCard):
     filename: str = Field(..., min_length=1)
     mime_type: str = Field(..., min_length=1)
     size_bytes: int = Field(..., ge=0)
     description: Optional[str] = None
-
-
-class MediaRead(MediaBase):
-    id: Optional[int] = None
     owner_id: Optional[int] = None
-    created_at: datetime
     updated_at: Optional[datetime] = None
-    file_url: Optional[str] = None
     status: Optional[str] = None
-    tags: Optional[List[str]] = None
     emotion: Optional[dict] = None
-    caption: Optional[str] = None
     error_message: Optional[str] = None
 
-    class Config:
-        from_attributes = True
-
 
 @router.post("/", response_model=MediaRead)
 async def upload_media(
@@ -91,7 +84,7 @@ async def upload_media(
     # Use the existing storage service to save the file
     ext = Path(file.filename).suffix or ".bin"
     owner_id = current_user.id  # Set the owner to the current logged-in user
-    dest_path = storage.save_upload(file, contents, owner_id)
+    dest_path, content_hash = storage.save_upload(file, contents, owner_id)
     metadata = storage.extract_metadata(dest_path)
 
     # Persist the DB row. The Media model requires `stored_path` and `size_bytes`.
@@ -102,6 +95,7 @@ async def upload_media(
         mime_type=file.content_type,
         size_bytes=metadata.get("size_bytes", len(contents)),
         metadata_json=metadata,
+        content_hash=content_hash,
         owner_id=owner_id,
         status=ProcessingStatus.PENDING,  # Set initial status
     )
@@ -119,11 +113,7 @@ async def upload_media(
     )
 
     # Build the response with FULL file URL (dynamically determined)
-    backend_url = get_backend_url(request)
-    response = MediaRead.from_orm(media_row)
-    response.file_url = f"{backend_url}/uploads/{Path(media_row.stored_path).name}"
-    
-    return response
+    return MediaRead.from_media(media_row, get_backend_url(request))
 
 
 @router.get("/", response_model=List[MediaRead])
@@ -136,12 +126,7 @@ async def list_media(
     backend_url = get_backend_url(request)
     # Filter media by the current user's ID
     media_items = db.query(Media).filter(Media.owner_id == current_user.id).order_by(Media.created_at.desc()).all()
-    results = []
-    for item in media_items:
-        media_read = MediaRead.from_orm(item)
-        media_read.file_url = f"{backend_url}/uploads/{Path(item.stored_path).name}"
-        results.append(media_read)
-    return results
+    return [MediaRead.from_media(item, backend_url) for item in media_items]
 
 
 @router.delete("/{media_id}")
@@ -164,11 +149,17 @@ async def delete_media(
     file_path = Path(media_item.stored_path)
     if file_path.exists():
         file_path.unlink()
+    remove_analysis_images(media_item.stored_path)
     
-    # Delete from database
+    # Delete from database (neighbour lists mentioning it first - they reference the row)
+    neighbor_graph.forget(db, media_id)
     db.delete(media_item)
     db.commit()
     
+    # Drop it from the in-memory search indexes
+    vector_index.remove(media_id)
+    index_shards.remove(current_user.id, media_id)
+    
     return {"message": "Media deleted successfully"}
 
 
@@ -187,8 +178,4 @@ async def get_media_status(
     if not media_item:
         raise HTTPException(status_code=404, detail="Media not found")
     
-    backend_url = get_backend_url(request)
-    response = MediaRead.from_orm(media_item)
-    response.file_url = f"{backend_url}/uploads/{Path(media_item.stored_path).name}"
-    
-    return response
+    return MediaRead.from_media(media_item, get_backend_url(request))
@@ -7,17 +7,26 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-from pathlib import Path
 import os
 
+from app.core.dependencies import get_current_user_optional
+from app.database.models_user import User
 from app.database.session import get_db
+from app.schemas.media import MediaCard
 from app.services.search_service import SearchService
+from app.services.index_shards import index_shards
+from app.services.media_attributes import MediaAttributes
+from app.services.neighbor_graph import neighbor_graph
+from app.services.search_snapshots import search_snapshots
+from app.services.vector_index import vector_index
 from app.utils.embeddings import embedding_service
 from loguru import logger
 
 
 router = APIRouter(tags=["Search"])
 
+MAX_BATCH_QUERIES = 50
+
 
 def get_backend_url(request: Request) -> str:
     """
@@ -56,30 +65,41 @@ class SearchFilters(BaseModel):
     tags: Optional[List[str]] = Field(None, description="Filter by specific tags")
 
 
-class MediaSearchResult(BaseModel):
+class MediaSearchResult(MediaCard):
     """Single search result with media data and relevance score"""
-    id: int
-    filename: str
-    caption: Optional[str]
-    tags: Optional[List[str]]
-    emotion: Optional[Dict[str, Any]]
-    has_people: Optional[bool]
-    file_url: str
-    created_at: datetime
+    emotion: Optional[Dict[str, Any]] = None
     score: float = Field(..., description="Relevance score (0-1)")
     match_type: str = Field(..., description="Type of match: semantic, text, or hybrid")
-    
-    class Config:
-        from_attributes = True
 
 
 class SearchResponse(BaseModel):
     """Response model for search queries"""
     query: str
-    total_results: int
+    total_results: int = Field(
+        ...,
+        description="Results ranked so far for this search (the snapshot depth); "
+                    "grows as deeper pages are requested, so it is a lower bound "
+                    "on the total match count"
+    )
     results: List[MediaSearchResult]
     search_type: str = Field(..., description="Type of search performed")
     filters_applied: Optional[Dict[str, Any]] = None
+    cursor: Optional[str] = Field(None, description="Pass back with the next page of this search")
+
+
+class BatchSearchRequest(BaseModel):
+    """Several searches sharing one scope and set of filters"""
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES, description="Search queries")
+    search_type: str = Field("hybrid", pattern="^(semantic|text|hybrid)$", description="Search algorithm to use")
+    user_id: Optional[int] = Field(None, description="Filter by user ID")
+    limit: int = Field(20, ge=1, le=100, description="Maximum results per query")
+    filters: Optional[SearchFilters] = None
+    fusion: str = Field("linear", pattern="^(linear|rrf)$", description="How hybrid search combines its signals")
+
+
+class BatchSearchResponse(BaseModel):
+    """One search response per query, in request order"""
+    results: List[SearchResponse]
 
 
 class RecommendationResponse(BaseModel):
@@ -132,7 +152,10 @@ async def search_media(
     has_people: Optional[bool] = Query(None, description="Filter by presence of people"),
     date_from: Optional[datetime] = Query(None, description="Filter by start date"),
     date_to: Optional[datetime] = Query(None, description="Filter by end date"),
-    db: Session = Depends(get_db)
+    fusion: str = Query("linear", regex="^(linear|rrf)$", description="How hybrid search combines its signals"),
+    cursor: Optional[str] = Query(None, description="Cursor from an earlier page of the same search"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """
     Search media using natural language queries.
@@ -140,7 +163,8 @@ async def search_media(
     **Search Types:**
     - `semantic`: Vector similarity search using embeddings (most intelligent)
     - `text`: Traditional keyword search (fallback)
-    - `hybrid`: Combines both methods (recommended, default)
+    - `hybrid`: Combines both methods (recommended, default); `fusion=rrf`
+      uses reciprocal-rank fusion instead of the weighted score blend
     
     **Examples:**
     - "happy moments with friends"
@@ -152,6 +176,14 @@ async def search_media(
     - `has_people`: true/false to filter photos with/without people
     - `date_from` / `date_to`: Filter by date range
     - `user_id`: Filter by owner (admin use)
+    
+    **Pagination:**
+    The first request ranks the results once and returns a `cursor`.
+    Sending it back with a new `offset` serves that page from the stored
+    ranking (no re-embedding or rescan) until it expires. The stored
+    ranking reaches a window past the requested page and is extended when
+    a page goes beyond it, so `total_results` counts the results ranked
+    so far.
     """
     logger.info(f"Search request: query='{query}', type={search_type}, limit={limit}")
     
@@ -167,68 +199,141 @@ async def search_media(
     # Initialize search service
     search_service = SearchService(db)
     
-    # Perform search based on type
-    if search_type == "semantic":
-        results = search_service.semantic_search(
+    def rank(depth: int, skip: int = 0):
+        return search_service.rank(
             query=query,
+            search_type=search_type,
             user_id=user_id,
-            limit=limit,
-            offset=offset,
-            filters=filters if filters else None
-        )
-    elif search_type == "text":
-        results = search_service.text_search(
-            query=query,
-            user_id=user_id,
-            limit=limit,
-            offset=offset,
-            filters=filters if filters else None
-        )
-    else:  # hybrid
-        results = search_service.hybrid_search(
-            query=query,
-            user_id=user_id,
-            limit=limit,
-            offset=offset,
-            filters=filters if filters else None
+            filters=filters if filters else None,
+            limit=depth,
+            fusion=fusion,
+            offset=skip
         )
     
+    # Later pages slice the ranking stored for the first page
+    # Snapshots belong to the caller, not to the `user_id` being searched
+    client = search_snapshots.client_for(current_user.id if current_user else None, cursor)
+    search_key = search_snapshots.make_key(query, search_type, user_id, filters, fusion)
+    snapshot = search_snapshots.get(cursor, search_key, client) if cursor else None
+    end = offset + limit
+    
+    if snapshot is None:
+        depth = search_snapshots.depth(end)
+        ranked, match_type = rank(depth)
+        cursor, snapshot = search_snapshots.create(search_key, client, ranked, match_type, depth)
+    elif not snapshot.covers(end) and len(snapshot) < search_snapshots.max_results:
+        depth = search_snapshots.depth(end)
+        snapshot.extend(rank(depth)[0], depth)
+    
+    if snapshot.covers(end):
+        page = snapshot.page(offset, limit)
+    else:
+        # Deeper than any snapshot keeps: rank just this page
+        page, _ = rank(limit, offset)
+    
+    results = search_service.hydrate(page, snapshot.match_type)
+    
     # Format results
     backend_url = get_backend_url(request)
-    formatted_results = []
-    for result in results:
-        media = result["media"]
-        formatted_results.append(
-            MediaSearchResult(
-                id=media.id,
-                filename=media.filename,
-                caption=media.caption,
-                tags=media.tags,
-                emotion=media.emotion,
-                has_people=media.has_people,
-                file_url=f"{backend_url}/uploads/{Path(media.stored_path).name}",
-                created_at=media.created_at,
-                score=result["score"],
-                match_type=result["match_type"]
-            )
+    formatted_results = [
+        MediaSearchResult.from_media(
+            result["media"],
+            backend_url,
+            score=result["score"],
+            match_type=result["match_type"]
         )
+        for result in results
+    ]
     
     logger.info(f"Returning {len(formatted_results)} results for query: {query}")
     
     return SearchResponse(
         query=query,
-        total_results=len(formatted_results),
+        total_results=len(snapshot),
         results=formatted_results,
         search_type=search_type,
-        filters_applied=filters if filters else None
+        filters_applied=filters if filters else None,
+        cursor=cursor
     )
 
 
+@router.post("/batch", response_model=BatchSearchResponse)
+async def batch_search(
+    body: BatchSearchRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """
+    Run several searches in one request (e.g. one per album theme or
+    search chip).
+    
+    All queries are embedded in one OpenAI call, the candidate set is
+    loaded once and every query is scored against it together. Each
+    result carries a `cursor` for paging that query with `GET /api/search`.
+    """
+    logger.info(f"Batch search request: {len(body.queries)} queries, type={body.search_type}")
+    
+    filters = body.filters.model_dump(exclude_none=True) if body.filters else {}
+    search_service = SearchService(db)
+    
+    depth = search_snapshots.depth(body.limit)
+    rankings = search_service.rank_many(
+        queries=body.queries,
+        search_type=body.search_type,
+        user_id=body.user_id,
+        filters=filters if filters else None,
+        limit=depth,
+        fusion=body.fusion
+    )
+    
+    # One eviction unit, so a batch larger than the per-user cap keeps
+    # every cursor it hands out
+    snapshots = search_snapshots.create_many(
+        [
+            (
+                search_snapshots.make_key(query, body.search_type, body.user_id, filters, body.fusion),
+                ranked,
+                match_type
+            )
+            for query, (ranked, match_type) in zip(body.queries, rankings)
+        ],
+        search_snapshots.client_for(current_user.id if current_user else None),
+        depth
+    )
+    
+    # First page of every query from a single row load
+    pages = search_service.hydrate_many(
+        [(snapshot.page(0, body.limit), snapshot.match_type) for _, snapshot in snapshots]
+    )
+    
+    backend_url = get_backend_url(request)
+    return BatchSearchResponse(results=[
+        SearchResponse(
+            query=query,
+            total_results=len(snapshot),
+            results=[
+                MediaSearchResult.from_media(
+                    result["media"],
+                    backend_url,
+                    score=result["score"],
+                    match_type=result["match_type"]
+                )
+                for result in page
+            ],
+            search_type=body.search_type,
+            filters_applied=filters if filters else None,
+            cursor=cursor
+        )
+        for query, (cursor, snapshot), page in zip(body.queries, snapshots, pages)
+    ])
+
+
 @router.get("/similar/{media_id}", response_model=RecommendationResponse)
 async def get_similar_media(
     media_id: int,
     request: Request,
-    user_id: Optional[int] = Query(None, description="Filter by user ID"),
+    user_id: Optional[int] = Query(None, description="Filter by user ID (default: the photo's owner)"),
     limit: int = Query(10, ge=1, le=50, description="Maximum results"),
     db: Session = Depends(get_db)
 ):
@@ -260,23 +365,15 @@ async def get_similar_media(
     
     # Format results
     backend_url = get_backend_url(request)
-    formatted_results = []
-    for result in results:
-        media = result["media"]
-        formatted_results.append(
-            MediaSearchResult(
-                id=media.id,
-                filename=media.filename,
-                caption=media.caption,
-                tags=media.tags,
-                emotion=media.emotion,
-                has_people=media.has_people,
-                file_url=f"{backend_url}/uploads/{Path(media.stored_path).name}",
-                created_at=media.created_at,
-                score=result["score"],
-                match_type=result["match_type"]
-            )
+    formatted_results = [
+        MediaSearchResult.from_media(
+            result["media"],
+            backend_url,
+            score=result["score"],
+            match_type=result["match_type"]
         )
+        for result in results
+    ]
     
     return RecommendationResponse(
         reference_media_id=media_id,
@@ -333,18 +430,19 @@ async def reindex_media(
     
     success_count = 0
     failed_count = 0
+    reindexed = []
+    
+    # Embed in batches instead of one API call per item
+    search_texts = [embedding_service.generate_search_text(media) for media in media_items]
+    embeddings = embedding_service.embed_documents(search_texts)
     
-    for media in media_items:
+    for media, search_text, embedding in zip(media_items, search_texts, embeddings):
         try:
-            # Generate search text
-            search_text = embedding_service.generate_search_text(media)
             media.search_text = search_text
             
-            # Generate embedding
-            embedding = embedding_service.generate_embedding(search_text)
-            
             if embedding:
                 media.embedding = embedding
+                media.coarse_embedding = embedding_service.coarse_embedding(embedding)
                 
                 # Update has_people flag
                 has_people = False
@@ -353,6 +451,7 @@ async def reindex_media(
                     has_people = any(tag.lower() in people_tags for tag in media.tags)
                 
                 media.has_people = has_people
+                reindexed.append((media.owner_id, media.id, embedding, MediaAttributes.of(media)))
                 
                 success_count += 1
                 logger.debug(f"Reindexed media {media.id}")
@@ -367,6 +466,19 @@ async def reindex_media(
     # Commit all changes
     db.commit()
     
+    # Refresh the in-memory search index with the new embeddings
+    # (only vectors it already holds when shards serve user-scoped search;
+    # the rest load on demand)
+    vector_index.upsert_many(
+        (media_id, embedding) for _, media_id, embedding, _ in reindexed
+        if not index_shards.enabled or media_id in vector_index
+    )
+    vector_index.save_ann()
+    for owner_id, media_id, embedding, attributes in reindexed:
+        index_shards.upsert(owner_id, media_id, embedding, attributes)
+        # Lists ranked against the old vector are re-ranked on demand or by the sweep
+        neighbor_graph.forget(db, media_id)
+    
     logger.info(f"Reindex complete: {success_count} success, {failed_count} failed")
     
     return {
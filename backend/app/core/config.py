@@ -1,10 +1,98 @@
+from pathlib import Path
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     app_name: str = "Legacy Album"
     debug: bool = True
     secret_key: str = "your-secret-key-change-this-in-production-min-32-chars"
-    database_url: str = "sqlite:///./legacy_album.db"
+    # SQLite by default; set DATABASE_URL to a postgresql:// URL to use
+    # PostgreSQL + pgvector for vector search
+    database_url: str = f"sqlite:///{Path.home() / '.legacy_album' / 'legacy_album.db'}"
+
+    # Embedding vectors (text-embedding-3-small)
+    embedding_dimension: int = 1536
+    # Scan with only the first N embedding values (e.g. 256) and rerank
+    # with the full vector; 0 scans full vectors. Existing rows get their
+    # short vectors from `python -m app.database.migrations derive-coarse`
+    coarse_embedding_dimension: int = 0
+
+    # Query embedding cache; set embedding_cache_path to a file to keep
+    # cached queries across restarts (at most embedding_cache_disk_entries)
+    embedding_cache_size: int = 1024
+    embedding_cache_ttl_seconds: float = 7 * 24 * 3600
+    embedding_cache_path: str = ""
+    embedding_cache_disk_entries: int = 100_000
+
+    # Document embeddings from concurrent pipeline runs and reindex are sent
+    # together: up to embedding_batch_size texts per API call, each waiting
+    # at most embedding_batch_wait_ms for others (batch size 1 = no batching)
+    embedding_batch_size: int = 64
+    embedding_batch_wait_ms: float = 20.0
+
+    # pgvector index on media.embedding: "hnsw" or "ivfflat"
+    pgvector_index: str = "hnsw"
+    pgvector_ivfflat_lists: int = 100
+
+    # Approximate (HNSW) vector search - used once a search covers at least
+    # ann_min_items vectors; smaller libraries are scanned exactly
+    ann_enabled: bool = True
+    ann_min_items: int = 20000
+    ann_m: int = 16
+    ann_ef_construction: int = 200
+    ann_ef_search: int = 64
+    vector_index_dir: str = str(Path.home() / ".legacy_album" / "vector_index")
+
+    # Store in-memory vectors as int8 (about 4x smaller); the best
+    # quantized_rerank_depth matches are rescored with the float vectors
+    vector_quantization: bool = False
+    quantized_rerank_depth: int = 200
+
+    # Directory of memory-mapped vector segments shared by all workers
+    # instead of an index per process (empty = per-process index); fill it
+    # with `python -m app.services.vector_store build` and merge segments
+    # offline with `python -m app.services.vector_store compact`
+    vector_store_dir: str = ""
+
+    # Per-user search shards, least recently used evicted above this budget;
+    # checked against the database for other workers' writes at most this often
+    index_shard_memory_mb: int = 512
+    index_shard_check_seconds: float = 5.0
+
+    # Precomputed "more like this" lists: top neighbor_graph_k per item
+    # (0 disables), re-ranked once older than neighbor_max_age_seconds by a
+    # background sweep every neighbor_sweep_interval_seconds (0 = no sweep).
+    # Only the worker holding neighbor_sweep_lock_path sweeps (empty = every
+    # worker); the lock is per host, so use interval 0 on all hosts but one
+    neighbor_graph_k: int = 20
+    neighbor_max_age_seconds: float = 24 * 3600
+    neighbor_sweep_interval_seconds: float = 3600
+    neighbor_sweep_batch: int = 500
+    neighbor_sweep_lock_path: str = str(Path.home() / ".legacy_album" / "neighbor-sweep.lock")
+
+    # Search pagination cursors: ranked id lists kept server-side, ranked
+    # search_snapshot_window results past the requested page at a time,
+    # grouped per signed-in user or anonymous client (at most
+    # search_snapshot_clients groups)
+    search_snapshot_ttl_seconds: float = 600
+    search_snapshots_per_user: int = 8
+    search_snapshot_clients: int = 1000
+    search_snapshot_max_results: int = 1000
+    search_snapshot_window: int = 100
+
+    # AI pipeline: Vision and Face run side by side on this many threads
+    # (caption waits for both). Face detection needs Limited Access approval
+    pipeline_stage_workers: int = 4
+    azure_face_enabled: bool = False
+    # Vision and Face get a JPEG copy with its longest side capped at this
+    # many pixels (0 = send the original upload)
+    analysis_image_max_side: int = 1024
+    analysis_image_quality: int = 85
+
+    # Azure Vision / Face HTTP clients: keep-alive connections per client
+    azure_http_pool_size: int = 10
+    azure_http_connect_timeout: float = 5.0
+    azure_http_read_timeout: float = 30.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
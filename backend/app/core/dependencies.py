@@ -7,6 +7,7 @@ from app.database.session import get_db
 from app.database.models_user import User
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -42,10 +43,12 @@ def get_current_user(
     return user
 
 def get_current_user_optional(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
     db: Session = Depends(get_db)
 ) -> Optional[User]:
     """Optional authentication - returns None if no valid token."""
+    if credentials is None:
+        return None
     try:
         return get_current_user(credentials, db)
     except HTTPException:
@@ -0,0 +1,178 @@
+"""
+Full-text index - SQLite FTS5 table over media captions, search text and
+tags, kept in sync with the media table by triggers.
+
+The table stores its own copy of the text (tags are flattened from the
+JSON list), keyed by rowid = media.id.
+"""
+
+import re
+import weakref
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import Column, Integer, MetaData, Table, Text, literal_column, select, text
+from sqlalchemy.engine import Engine
+
+
+FTS_TABLE = "media_fts"
+
+# Not part of Base.metadata - virtual tables are created by ensure_fts_index
+media_fts = Table(
+    FTS_TABLE,
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("caption", Text),
+    Column("search_text", Text),
+    Column("tags", Text),
+)
+
+# Space-separated tag list from the media.tags JSON array
+_TAGS_SQL = (
+    "CASE WHEN json_valid({row}.tags) "
+    "THEN (SELECT group_concat(value, ' ') FROM json_each({row}.tags)) END"
+)
+
+# No porter stemmer: stemmed query terms break prefix matching
+# ("volley" stems to "vollei", which is not a prefix of "volleyball")
+_CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+    caption, search_text, tags,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS media_fts_insert AFTER INSERT ON media BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, caption, search_text, tags)
+        VALUES (new.id, new.caption, new.search_text, {_TAGS_SQL.format(row="new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS media_fts_update
+    AFTER UPDATE OF caption, search_text, tags ON media BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE} (rowid, caption, search_text, tags)
+        VALUES (new.id, new.caption, new.search_text, {_TAGS_SQL.format(row="new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS media_fts_delete AFTER DELETE ON media BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+]
+
+_BACKFILL = f"""
+INSERT INTO {FTS_TABLE} (rowid, caption, search_text, tags)
+SELECT id, caption, search_text, {_TAGS_SQL.format(row="media")} FROM media
+"""
+
+# BM25 column weights, in table column order (caption, search_text, tags).
+# search_text repeats the caption and tags, so it gets the lowest weight.
+FIELD_WEIGHTS = (3.0, 1.0, 2.0)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Engines known to have the FTS table (filled by ensure_fts_index / fts_available)
+_fts_engines: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+
+def ensure_fts_index(engine: Engine) -> bool:
+    """
+    Create the FTS5 table and its triggers, backfilling existing rows.
+
+    Safe to call repeatedly. Does nothing on databases other than SQLite
+    or SQLite builds without FTS5.
+
+    Args:
+        engine: Database engine
+
+    Returns:
+        True if the full-text index is available
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+
+        if not exists:
+            try:
+                conn.execute(text(_CREATE_TABLE))
+            except Exception as e:
+                logger.warning(f"SQLite FTS5 unavailable - text search uses LIKE: {str(e)}")
+                return False
+            conn.execute(text(_BACKFILL))
+            count = conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+            logger.info(f"Created full-text index over {count} media rows")
+
+        for trigger in _TRIGGERS:
+            conn.execute(text(trigger))
+
+    _fts_engines[engine] = True
+    return True
+
+
+def fts_available(engine: Engine) -> bool:
+    """Whether `engine` has the full-text index (cached per engine)."""
+    if engine.dialect.name != "sqlite":
+        return False
+
+    available = _fts_engines.get(engine)
+    if available is None:
+        with engine.connect() as conn:
+            available = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            ).first() is not None
+        _fts_engines[engine] = available
+    return available
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term ("beach"*), so user input can
+    never inject FTS syntax and partial words still match. Terms are
+    OR-ed: documents matching more of them rank higher under BM25.
+
+    Args:
+        query: User search text
+
+    Returns:
+        MATCH expression, or None if the query has no searchable words
+    """
+    tokens = _TOKEN.findall(query.lower())
+    if not tokens:
+        return None
+    return " OR ".join(f'"{token}"*' for token in tokens)
+
+
+def ranked_matches(match_query: str):
+    """
+    Subquery of full-text matches with their BM25 relevance.
+
+    Relevance is computed by FTS5 itself (`bm25()` with FIELD_WEIGHTS),
+    negated so that higher is better.
+
+    Args:
+        match_query: Expression from build_match_query
+
+    Returns:
+        Subquery with columns `media_id` and `relevance`
+    """
+    weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS)
+    relevance = literal_column(f"-bm25({FTS_TABLE}, {weights})")
+    return select(
+        media_fts.c.rowid.label("media_id"),
+        relevance.label("relevance")
+    ).where(
+        text(f"{FTS_TABLE} MATCH :match_query").bindparams(match_query=match_query)
+    ).subquery("fts_matches")
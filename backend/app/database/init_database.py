@@ -3,9 +3,12 @@ from app.database.models_user import User
 from app.database.models_media import Media
 from app.database.models_person import Person, FaceInstance
 from app.database.models_album import Album  # Import album model
+from app.database.migrations import enable_pgvector, run_migrations
 
 def init_db():
+    enable_pgvector(engine)
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     print("Database initialized.")
 
 
@@ -0,0 +1,360 @@
+"""
+Data migrations - Idempotent upgrades applied to existing databases
+on startup (see init_database.init_db).
+"""
+
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.database.fts import ensure_fts_index
+from app.database.types import (
+    pack_embedding,
+    pgvector_available,
+    truncate_embedding,
+    unpack_embedding,
+)
+
+
+# Rows converted per UPDATE batch
+BACKFILL_BATCH_SIZE = 500
+
+
+def migrate_embeddings_to_binary(engine: Engine) -> int:
+    """
+    Convert legacy JSON-text embeddings to the binary vector format.
+
+    Older databases declared `media.embedding` as JSON, so SQLite kept
+    each vector as ~30 KB of text. Rows already stored as BLOBs are left
+    untouched, so this is safe to run repeatedly; batches are read by id
+    and committed one at a time.
+
+    Args:
+        engine: Database engine
+
+    Returns:
+        Number of rows converted
+    """
+    if engine.dialect.name != "sqlite":
+        return 0
+
+    converted = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, embedding FROM media "
+                "WHERE id > :last_id AND typeof(embedding) = 'text' ORDER BY id LIMIT :batch"
+            ), {"last_id": last_id, "batch": BACKFILL_BATCH_SIZE}).fetchall()
+            if not rows:
+                break
+
+            batch = []
+            for media_id, raw in rows:
+                try:
+                    vector = unpack_embedding(raw)
+                except ValueError:
+                    logger.warning(f"Dropping unreadable embedding for media {media_id}")
+                    vector = None
+                batch.append({
+                    "id": media_id,
+                    "embedding": pack_embedding(vector) if vector is not None and vector.size else None,
+                })
+
+            conn.execute(text("UPDATE media SET embedding = :embedding WHERE id = :id"), batch)
+            converted += len(batch)
+            last_id = rows[-1][0]
+
+    if converted:
+        logger.info(f"Converted {converted} embeddings from JSON to binary format")
+    return converted
+
+
+def enable_pgvector(engine: Engine) -> bool:
+    """
+    Enable the pgvector extension (PostgreSQL only).
+
+    Must run before the tables are created, since media.embedding is a
+    `vector` column there.
+
+    Returns:
+        True if pgvector is in use
+    """
+    if engine.dialect.name != "postgresql" or not pgvector_available():
+        return False
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    return True
+
+
+def migrate_embeddings_to_pgvector(engine: Engine) -> None:
+    """
+    Convert a legacy JSON or binary `media.embedding` column to `vector(n)`.
+
+    JSON arrays use the same `[x, y, ...]` text form that pgvector parses,
+    so the cast happens in place. Binary blobs cannot be cast: they are
+    decoded in batches into a new vector column, which then replaces the
+    old one. Both run in one transaction, so a failure leaves the original
+    column untouched.
+    """
+    if engine.dialect.name != "postgresql" or not pgvector_available():
+        return
+
+    with engine.begin() as conn:
+        column_type = conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() "
+            "AND table_name = 'media' AND column_name = 'embedding'"
+        )).scalar()
+        if column_type in ("json", "jsonb"):
+            logger.info(f"Converting media.embedding from {column_type} to vector")
+            conn.execute(text(
+                f"ALTER TABLE media ALTER COLUMN embedding "
+                f"TYPE vector({settings.embedding_dimension}) "
+                f"USING NULLIF(embedding::text, 'null')::vector"
+            ))
+        elif column_type == "bytea":
+            logger.info("Converting media.embedding from bytea to vector")
+            converted = _copy_blobs_to_vector_column(conn, settings.embedding_dimension)
+            conn.execute(text("ALTER TABLE media DROP COLUMN embedding"))
+            conn.execute(text("ALTER TABLE media RENAME COLUMN embedding_vector TO embedding"))
+            logger.info(f"Converted {converted} binary embeddings to vector")
+
+
+def _copy_blobs_to_vector_column(conn, dimension: int) -> int:
+    """Decode media.embedding blobs into a new `embedding_vector` column, paged by id."""
+    conn.execute(text(f"ALTER TABLE media ADD COLUMN embedding_vector vector({dimension})"))
+
+    converted = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, embedding FROM media "
+            "WHERE id > :last_id AND embedding IS NOT NULL ORDER BY id LIMIT :batch"
+        ), {"last_id": last_id, "batch": BACKFILL_BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        batch = []
+        for media_id, raw in rows:
+            try:
+                vector = unpack_embedding(bytes(raw))
+            except ValueError:
+                vector = None
+            if vector is None or vector.size != dimension:
+                logger.warning(f"Dropping unreadable embedding for media {media_id}")
+                continue
+            batch.append({
+                "id": media_id,
+                "embedding": "[" + ",".join(repr(float(x)) for x in vector) + "]",
+            })
+
+        if batch:
+            conn.execute(text(
+                "UPDATE media SET embedding_vector = CAST(:embedding AS vector) WHERE id = :id"
+            ), batch)
+            converted += len(batch)
+    return converted
+
+
+def create_pgvector_index(engine: Engine) -> None:
+    """Create the approximate-search index on media.embedding (PostgreSQL only)."""
+    if engine.dialect.name != "postgresql" or not pgvector_available():
+        return
+
+    if settings.pgvector_index == "ivfflat":
+        ddl = (
+            "CREATE INDEX IF NOT EXISTS ix_media_embedding_ivfflat ON media "
+            "USING ivfflat (embedding vector_cosine_ops) "
+            f"WITH (lists = {int(settings.pgvector_ivfflat_lists)})"
+        )
+    else:
+        ddl = (
+            "CREATE INDEX IF NOT EXISTS ix_media_embedding_hnsw ON media "
+            "USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {int(settings.ann_m)}, ef_construction = {int(settings.ann_ef_construction)})"
+        )
+
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+
+
+def add_coarse_embedding_column(engine: Engine) -> None:
+    """
+    Add media.coarse_embedding to databases created before it existed.
+
+    On pgvector the column has a fixed dimension, so when
+    COARSE_EMBEDDING_DIMENSION no longer matches it the column is
+    recreated and refilled from the full embeddings.
+    """
+    pgvector = engine.dialect.name == "postgresql" and pgvector_available()
+    column_type = f"vector({settings.coarse_embedding_dimension or 256})"
+    columns = {column["name"] for column in inspect(engine).get_columns("media")}
+
+    if "coarse_embedding" in columns:
+        if not pgvector or not settings.coarse_embedding_dimension:
+            return
+        with engine.begin() as conn:
+            current = conn.execute(text(
+                "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                "WHERE attrelid = 'media'::regclass AND attname = 'coarse_embedding'"
+            )).scalar()
+            if current == column_type:
+                return
+            logger.warning(f"media.coarse_embedding is {current}, expected {column_type}: rebuilding it")
+            conn.execute(text("ALTER TABLE media DROP COLUMN coarse_embedding"))
+            conn.execute(text(f"ALTER TABLE media ADD COLUMN coarse_embedding {column_type}"))
+        derive_coarse_embeddings(engine)
+        return
+
+    if not pgvector:
+        column_type = "BYTEA" if engine.dialect.name == "postgresql" else "BLOB"
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE media ADD COLUMN coarse_embedding {column_type}"))
+    logger.info("Added media.coarse_embedding column")
+
+
+def add_content_hash_column(engine: Engine) -> None:
+    """Add media.content_hash to databases created before it existed."""
+    columns = {column["name"] for column in inspect(engine).get_columns("media")}
+    if "content_hash" in columns:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE media ADD COLUMN content_hash VARCHAR(64)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_media_content_hash ON media (content_hash)"))
+    logger.info("Added media.content_hash column")
+
+
+def derive_coarse_embeddings(
+    engine: Engine,
+    dimension: Optional[int] = None,
+    force: bool = False
+) -> int:
+    """
+    Fill media.coarse_embedding from the stored full embeddings.
+
+    Truncates locally - no embedding API calls. Run after setting or
+    changing COARSE_EMBEDDING_DIMENSION.
+
+    Args:
+        engine: Database engine
+        dimension: Leading values to keep (default: the configured one)
+        force: Recompute rows that already have a short vector
+
+    Returns:
+        Number of rows written
+    """
+    from sqlalchemy.orm import Session
+
+    from app.database.models_media import Media
+
+    dimension = dimension or settings.coarse_embedding_dimension
+    if not dimension:
+        raise ValueError("No coarse dimension given and COARSE_EMBEDDING_DIMENSION is not set")
+
+    written = 0
+    last_id = 0
+    with Session(engine) as db:
+        while True:
+            query = db.query(Media.id, Media.embedding).filter(
+                Media.id > last_id,
+                Media.embedding.isnot(None)
+            )
+            if not force:
+                query = query.filter(Media.coarse_embedding.is_(None))
+            rows = query.order_by(Media.id).limit(BACKFILL_BATCH_SIZE).all()
+            if not rows:
+                break
+
+            db.bulk_update_mappings(Media, [
+                {"id": media_id, "coarse_embedding": truncate_embedding(embedding, dimension)}
+                for media_id, embedding in rows
+            ])
+            db.commit()
+            written += len(rows)
+            last_id = rows[-1][0]
+
+    logger.info(f"Derived {dimension}-dim embeddings for {written} media rows")
+    return written
+
+
+def backfill_media_tags(engine: Engine) -> int:
+    """
+    Fill the media_tags table from media.tags for rows tagged before it
+    existed. Rows that already have tag rows are skipped, so this is safe
+    to run repeatedly.
+
+    Args:
+        engine: Database engine
+
+    Returns:
+        Number of media rows backfilled
+    """
+    from sqlalchemy import exists
+    from sqlalchemy.orm import Session
+
+    from app.database.models_media import Media, MediaTag, normalize_tags
+
+    written = 0
+    last_id = 0
+    with Session(engine) as db:
+        while True:
+            rows = db.query(Media.id, Media.tags).filter(
+                Media.id > last_id,
+                Media.tags.isnot(None),
+                ~exists().where(MediaTag.media_id == Media.id)
+            ).order_by(Media.id).limit(BACKFILL_BATCH_SIZE).all()
+            if not rows:
+                break
+
+            mappings = [
+                {"media_id": media_id, "tag": tag, "position": position}
+                for media_id, tags in rows
+                for position, tag in enumerate(normalize_tags(tags))
+            ]
+            db.bulk_insert_mappings(MediaTag, mappings)
+            db.commit()
+            written += len({mapping["media_id"] for mapping in mappings})
+            last_id = rows[-1][0]
+
+    if written:
+        logger.info(f"Backfilled media_tags for {written} media rows")
+    return written
+
+
+def run_migrations(engine: Engine) -> None:
+    """Apply all data migrations."""
+    migrate_embeddings_to_binary(engine)
+    migrate_embeddings_to_pgvector(engine)
+    create_pgvector_index(engine)
+    add_coarse_embedding_column(engine)
+    add_content_hash_column(engine)
+    ensure_fts_index(engine)
+    backfill_media_tags(engine)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.database.init_database import init_db
+    from app.database.session import engine
+
+    parser = argparse.ArgumentParser(description="Apply database migrations.")
+    parser.add_argument("command", nargs="?", choices=["derive-coarse"],
+                        help="derive-coarse: fill media.coarse_embedding from stored embeddings")
+    parser.add_argument("--dimension", type=int, default=None)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    init_db()
+    print("Migrations applied.")
+
+    if args.command == "derive-coarse":
+        count = derive_coarse_embeddings(engine, args.dimension, args.force)
+        print(f"Derived short embeddings for {count} media items.")
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, JSON, Text, Enum, func, Boolean
-from sqlalchemy.orm import relationship
+from typing import List
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, JSON, Text, Enum, event, func, Boolean
+from sqlalchemy.orm import deferred, load_only, relationship
 import enum
 
+from app.core.config import settings
 from app.database.session import Base
+from app.database.types import EmbeddingVector
 
 
 class ProcessingStatus(str, enum.Enum):
@@ -22,6 +26,7 @@ class Media(Base):
     mime_type = Column(String, nullable=False)
     size_bytes = Column(Integer, nullable=False)
     metadata_json = Column(JSON, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the file bytes
     
     # AI Processing fields
     status = Column(Enum(ProcessingStatus), default=ProcessingStatus.PENDING, nullable=False)
@@ -31,8 +36,13 @@ class Media(Base):
     error_message = Column(Text, nullable=True)  # Error details if status=ERROR
     
     # Phase 4: Semantic Search fields
-    embedding = Column(JSON, nullable=True)  # Vector embedding for semantic search (stored as JSON for SQLite)
-    search_text = Column(Text, nullable=True)  # Combined searchable text
+    # Deferred: loaded only when accessed, so listing and rendering rows never
+    # pulls the vectors or the search text. Scoring code selects them explicitly.
+    embedding = deferred(Column(EmbeddingVector, nullable=True))  # Vector embedding for semantic search (binary float32, see types.py)
+    # Leading values of the embedding, renormalized - scanned first when
+    # settings.coarse_embedding_dimension is set
+    coarse_embedding = deferred(Column(EmbeddingVector(settings.coarse_embedding_dimension or 256), nullable=True))
+    search_text = deferred(Column(Text, nullable=True))  # Combined searchable text
     has_people = Column(Boolean, default=False, nullable=True)  # Whether image contains people
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -42,4 +52,96 @@ class Media(Base):
         onupdate=func.now(),
     )
 
-    owner = relationship("User", backref="media_items")
\ No newline at end of file
+    owner = relationship("User", backref="media_items")
+    # One row per tag, rewritten whenever `tags` is assigned (see below)
+    tag_rows = relationship("MediaTag", cascade="all, delete-orphan", order_by="MediaTag.position")
+
+
+# Longest tag kept in media_tags
+MAX_TAG_LENGTH = 100
+
+
+def normalize_tags(tags) -> List[str]:
+    """Lowercased, stripped tags without duplicates, in their original order."""
+    normalized = {}
+    for tag in tags or ():
+        tag = str(tag).strip().lower()[:MAX_TAG_LENGTH]
+        if tag:
+            normalized.setdefault(tag, None)
+    return list(normalized)
+
+
+class MediaTag(Base):
+    """
+    One (normalized) tag of a media item, so tag filters and per-tag
+    counts are indexed lookups instead of scans of the media.tags JSON.
+    """
+    __tablename__ = "media_tags"
+    __table_args__ = (Index("ix_media_tags_tag_media", "tag", "media_id"),)
+
+    media_id = Column(Integer, ForeignKey("media.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(MAX_TAG_LENGTH), primary_key=True)
+    position = Column(Integer, nullable=False)  # Index in media.tags
+
+
+@event.listens_for(Media.tags, "set")
+def _sync_tag_rows(media, tags, oldvalue, initiator):
+    """Rewrite media_tags rows whenever media.tags is assigned."""
+    media.tag_rows = [
+        MediaTag(tag=tag, position=position)
+        for position, tag in enumerate(normalize_tags(tags))
+    ]
+
+
+class AnalysisCache(Base):
+    """
+    AI analysis of one file's bytes, so a re-uploaded photo reuses its
+    tags, caption and embedding instead of calling the APIs again.
+
+    Keyed by content hash and pipeline version: results from an older
+    pipeline (other models, prompts or stages) are never reused.
+    """
+    __tablename__ = "analysis_cache"
+
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the file bytes
+    pipeline_version = Column(String(100), primary_key=True)
+    tags = Column(JSON, nullable=True)
+    description = Column(Text, nullable=True)  # Azure Vision description
+    emotion = Column(JSON, nullable=True)
+    caption = Column(Text, nullable=True)
+    embedding = deferred(Column(EmbeddingVector, nullable=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class MediaNeighbor(Base):
+    """
+    One entry of a media item's precomputed "more like this" list
+    (see app.services.neighbor_graph).
+    """
+    __tablename__ = "media_neighbors"
+
+    media_id = Column(Integer, ForeignKey("media.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 = most similar
+    neighbor_id = Column(Integer, ForeignKey("media.id", ondelete="CASCADE"), nullable=False, index=True)
+    owner_id = Column(Integer, nullable=True)  # Library the list was ranked in
+    score = Column(Float, nullable=False)
+    computed_at = Column(Float, nullable=False)  # Unix time the list was ranked
+
+
+# Columns a media card (app.schemas.media.MediaCard) is rendered from
+MEDIA_CARD_COLUMNS = (
+    Media.id,
+    Media.owner_id,
+    Media.filename,
+    Media.stored_path,
+    Media.caption,
+    Media.tags,
+    Media.emotion,
+    Media.has_people,
+    Media.created_at,
+)
+
+
+def media_card_columns():
+    """Query option loading only MEDIA_CARD_COLUMNS of Media rows."""
+    return load_only(*MEDIA_CARD_COLUMNS)
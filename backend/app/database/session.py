@@ -3,21 +3,34 @@ from pathlib import Path
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from app.core.config import settings  # noqa: F401
+from app.core.config import settings
+from app.database.types import pgvector_available
 
 
-# Ensure the SQLite database lives in a writable location
+# Default SQLite database lives in a writable location
 DATA_DIR = Path.home() / ".legacy_album"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
-DB_PATH = DATA_DIR / "legacy_album.db"
 
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+
+def normalize_database_url(url: str) -> str:
+    """Accept the legacy `postgres://` scheme some hosts (Railway, Heroku) hand out."""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+DATABASE_URL = normalize_database_url(settings.database_url)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    pool_pre_ping=not IS_SQLITE,
 )
 
+# On PostgreSQL with pgvector, vector search runs inside the database
+USE_PGVECTOR = engine.dialect.name == "postgresql" and pgvector_available()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -0,0 +1,163 @@
+"""
+Custom column types - Compact binary storage for embedding vectors.
+
+Embeddings are stored as a little-endian float32 BLOB with a small header
+instead of JSON text, which is roughly 5x smaller on disk and is decoded
+with a single np.frombuffer call instead of json.loads.
+
+Layout (8-byte header followed by the vector):
+    magic    2 bytes  b"EV"
+    version  1 byte   EMBEDDING_FORMAT_VERSION
+    dtype    1 byte   1 = float32
+    dim      4 bytes  uint32, little-endian
+    data     dim * 4 bytes, little-endian float32
+"""
+
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.types import Float, LargeBinary, TypeDecorator
+
+try:
+    from pgvector.sqlalchemy import Vector
+except ImportError:  # pragma: no cover - optional dependency
+    Vector = None
+
+from app.core.config import settings
+
+
+EMBEDDING_MAGIC = b"EV"
+EMBEDDING_FORMAT_VERSION = 1
+DTYPE_FLOAT32 = 1
+
+_HEADER = struct.Struct("<2sBBI")
+_FLOAT32_LE = np.dtype("<f4")
+
+
+def pgvector_available() -> bool:
+    """Whether the pgvector SQLAlchemy type can be used."""
+    return Vector is not None
+
+
+def pack_embedding(vector) -> bytes:
+    """
+    Encode an embedding as a binary vector blob.
+
+    Args:
+        vector: Embedding as a list of floats or NumPy array
+
+    Returns:
+        Header plus little-endian float32 data
+    """
+    array = np.asarray(vector, dtype=_FLOAT32_LE).ravel()
+    header = _HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, DTYPE_FLOAT32, array.size)
+    return header + array.tobytes()
+
+
+def unpack_embedding(blob) -> Optional[np.ndarray]:
+    """
+    Decode a stored embedding.
+
+    Accepts the binary format and, for rows that have not been migrated
+    yet, the legacy JSON text format.
+
+    Args:
+        blob: Stored column value (bytes or JSON string)
+
+    Returns:
+        Read-only float32 array, or None for empty values
+    """
+    if blob is None:
+        return None
+
+    if isinstance(blob, str):
+        values = json.loads(blob)
+        return None if values is None else np.asarray(values, dtype=np.float32)
+
+    blob = bytes(blob)
+    if len(blob) < _HEADER.size:
+        raise ValueError("Embedding blob is too short")
+
+    magic, version, dtype, dimension = _HEADER.unpack_from(blob)
+    if magic != EMBEDDING_MAGIC:
+        raise ValueError("Embedding blob has an unknown format")
+    if version != EMBEDDING_FORMAT_VERSION or dtype != DTYPE_FLOAT32:
+        raise ValueError(f"Unsupported embedding format v{version} (dtype {dtype})")
+
+    expected = _HEADER.size + dimension * _FLOAT32_LE.itemsize
+    if len(blob) != expected:
+        raise ValueError(f"Embedding blob length {len(blob)} does not match dimension {dimension}")
+
+    return np.frombuffer(blob, dtype=_FLOAT32_LE, count=dimension, offset=_HEADER.size)
+
+
+def truncate_embedding(vector, dimension: int) -> Optional[np.ndarray]:
+    """
+    Shorten an embedding to its first `dimension` values, renormalized.
+
+    text-embedding-3 models are trained so that prefixes are themselves
+    usable embeddings; this matches what the API returns for the same
+    `dimensions` request.
+
+    Args:
+        vector: Full embedding (list or NumPy array)
+        dimension: Number of leading values to keep
+
+    Returns:
+        Unit-length float32 array, or None for empty/zero vectors
+    """
+    if vector is None:
+        return None
+    prefix = np.asarray(vector, dtype=np.float32).ravel()[:dimension]
+    norm = float(np.linalg.norm(prefix))
+    if prefix.size == 0 or norm == 0.0:
+        return None
+    return prefix / norm
+
+
+class EmbeddingVector(TypeDecorator):
+    """
+    Column type for embedding vectors.
+
+    Accepts lists or NumPy arrays on write and always returns a float32
+    NumPy array on read.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    class comparator_factory(TypeDecorator.Comparator):
+        def cosine_distance(self, other):
+            """pgvector cosine distance (`<=>`); PostgreSQL only."""
+            return self.op("<=>", return_type=Float)(other)
+
+    def __init__(self, dimension: Optional[int] = None):
+        super().__init__()
+        self.dimension = dimension or settings.embedding_dimension
+
+    def _native(self, dialect) -> bool:
+        return dialect.name == "postgresql" and Vector is not None
+
+    def load_dialect_impl(self, dialect):
+        if self._native(dialect):
+            return dialect.type_descriptor(Vector(self.dimension))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if self._native(dialect):
+            return np.asarray(value, dtype=np.float32)
+        return pack_embedding(value)
+
+    def process_result_value(self, value, dialect):
+        if self._native(dialect):
+            return None if value is None else np.asarray(value, dtype=np.float32)
+        return unpack_embedding(value)
+
+    def compare_values(self, x, y):
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(np.asarray(x), np.asarray(y))
@@ -1,5 +1,7 @@
+from typing import Dict, Optional
 from pydantic import BaseModel
 
 class HealthResponse(BaseModel):
     status: str
     version: str
+    query_embedding_cache: Optional[Dict[str, float]] = None
@@ -1,4 +1,5 @@
 from datetime import datetime
+from pathlib import Path
 from typing import Any
 
 from pydantic import BaseModel, Field
@@ -19,4 +20,45 @@ class MediaRead(MediaBase):
     updated_at: datetime | None = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+def media_file_url(backend_url: str, stored_path: str) -> str:
+    """Public URL of an uploaded file."""
+    return f"{backend_url}/uploads/{Path(stored_path).name}"
+
+
+class MediaCard(BaseModel):
+    """
+    Fields needed to render one media tile.
+
+    Built from rows loaded with `media_card_columns()`, so rendering never
+    touches the embedding or search text. Response models extend it with
+    their own fields.
+    """
+    id: int
+    filename: str
+    file_url: str
+    caption: str | None = None
+    tags: list[str] | None = None
+    has_people: bool | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+    @classmethod
+    def from_media(cls, media, backend_url: str, **fields):
+        """
+        Build from a Media row.
+
+        Every field except `file_url` is read from the row attribute of the
+        same name when it has one; `fields` override or supply the rest.
+        """
+        values = {
+            name: getattr(media, name)
+            for name in cls.model_fields
+            if name != "file_url" and name not in fields and hasattr(type(media), name)
+        }
+        return cls(file_url=media_file_url(backend_url, media.stored_path), **values, **fields)
+
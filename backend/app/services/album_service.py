@@ -4,12 +4,12 @@ Smart Album Service - Automatically organize photos into themed albums
 
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import case, func, desc, select
 from collections import Counter
 from loguru import logger
 
 from app.database.models_album import Album
-from app.database.models_media import Media, ProcessingStatus
+from app.database.models_media import Media, MediaTag, ProcessingStatus
 
 
 class SmartAlbumService:
@@ -329,34 +329,114 @@ class SmartAlbumService:
         Returns:
             List of suggested album themes
         """
-        # Get all processed media
-        media_items = self.db.query(Media).filter(
+        existing_themes = select(Album.theme_tag).where(
+            Album.owner_id == owner_id,
+            Album.theme_tag.isnot(None)
+        )
+        
+        # Photos per tag, counted by the database over the media_tags index
+        photo_count = func.count(MediaTag.media_id)
+        tag_counts = self.db.query(MediaTag.tag, photo_count).join(
+            Media, Media.id == MediaTag.media_id
+        ).filter(
             Media.owner_id == owner_id,
             Media.status == ProcessingStatus.DONE,
-            Media.tags.isnot(None)
-        ).all()
+            MediaTag.tag.notin_(self.EXCLUDED_TAGS),
+            MediaTag.tag.notin_(existing_themes)
+        ).group_by(
+            MediaTag.tag
+        ).having(
+            photo_count >= self.MIN_PHOTOS_FOR_ALBUM
+        ).order_by(photo_count.desc(), MediaTag.tag).limit(10).all()
+        
+        return [
+            {
+                'theme': tag,
+                'title': tag.title(),
+                'photo_count': count
+            }
+            for tag, count in tag_counts
+        ]
+    
+    def rebuild_albums(self, owner_id: int) -> Dict[str, int]:
+        """
+        Create the albums `assign_to_albums` would create for every
+        processed photo of a user, with a few aggregate queries instead of
+        one pass per photo.
+        
+        Each photo contributes its top 3 tags by TAG_PRIORITIES (ranked in
+        the database with a window function) plus 'people' when it shows
+        people. Albums are created in the order a photo-by-photo pass would
+        reach them, so the MAX_AUTO_ALBUMS cap keeps the same ones.
+        
+        Args:
+            owner_id: User ID
+            
+        Returns:
+            photos_processed (processed photos) and assignments_made
+            (photo/album pairs whose album exists)
+        """
+        library = (
+            Media.owner_id == owner_id,
+            Media.status == ProcessingStatus.DONE
+        )
+        
+        priority = case(self.TAG_PRIORITIES, value=MediaTag.tag, else_=50)
+        ranked = select(
+            MediaTag.media_id,
+            MediaTag.tag,
+            func.row_number().over(
+                partition_by=MediaTag.media_id,
+                order_by=(priority.desc(), MediaTag.position)
+            ).label("tag_rank")
+        ).join(Media, Media.id == MediaTag.media_id).where(*library).subquery()
+        top_tags = select(ranked).where(ranked.c.tag_rank <= 3).subquery()
+        
+        # (first position in a photo-by-photo pass, photos) per theme
+        themes: Dict[str, List[int]] = {}
+        for tag, first, count in self.db.query(
+            top_tags.c.tag,
+            func.min(top_tags.c.media_id * 4 + top_tags.c.tag_rank),
+            func.count()
+        ).group_by(top_tags.c.tag):
+            if tag not in self.EXCLUDED_TAGS and len(tag) >= 3:
+                themes[tag] = [first, count]
+        
+        # People album for tagged photos with people but no 'people' top tag
+        first_id, count = self.db.query(func.min(Media.id), func.count(Media.id)).filter(
+            *library,
+            Media.has_people.is_(True),
+            Media.id.in_(select(MediaTag.media_id)),
+            Media.id.notin_(select(top_tags.c.media_id).where(top_tags.c.tag == 'people'))
+        ).one()
+        if count:
+            first, total = themes.get('people', [first_id * 4, 0])
+            themes['people'] = [min(first, first_id * 4), total + count]
+        
+        existing = {
+            theme for theme, in self.db.query(Album.theme_tag).filter(Album.owner_id == owner_id)
+        }
+        auto_count = self.db.query(func.count(Album.id)).filter(
+            Album.owner_id == owner_id,
+            Album.is_auto_generated == 1
+        ).scalar()
+        
+        assignments = 0
+        for theme, (_, count) in sorted(themes.items(), key=lambda item: item[1][0]):
+            if theme not in existing:
+                if auto_count >= self.MAX_AUTO_ALBUMS:
+                    continue
+                self.db.add(Album(
+                    owner_id=owner_id,
+                    title=theme.title(),
+                    theme_tag=theme,
+                    is_auto_generated=1,
+                    media_count=0
+                ))
+                auto_count += 1
+                logger.info(f"Created new album: {theme.title()} (theme: {theme})")
+            assignments += count
+        self.db.commit()
         
-       
-        existing_themes = {a.theme_tag for a in self.db.query(Album.theme_tag).filter(
-            Album.owner_id == owner_id
-        ).all()}
-        
-        tag_counts = Counter()
-        for item in media_items:
-            if item.tags:
-                for tag in item.tags:
-                    tag_lower = tag.lower()
-                    if tag_lower not in existing_themes and tag_lower not in self.EXCLUDED_TAGS:
-                        tag_counts[tag_lower] += 1
-        
-        # Return suggestions with enough photos
-        suggestions = []
-        for tag, count in tag_counts.most_common(10):
-            if count >= self.MIN_PHOTOS_FOR_ALBUM:
-                suggestions.append({
-                    'theme': tag,
-                    'title': tag.title(),
-                    'photo_count': count
-                })
-        
-        return suggestions
+        photos = self.db.query(func.count(Media.id)).filter(*library).scalar()
+        return {"photos_processed": photos, "assignments_made": assignments}
@@ -0,0 +1,108 @@
+"""
+Analysis Image - Downscaled JPEG copies of uploads for the vision APIs.
+
+Originals can be up to 10 MB, but Azure Vision's tags and captions barely
+change below ~1024 px. The AI pipeline sends Vision and Face a derivative
+instead: EXIF orientation applied, longest side capped at
+settings.analysis_image_max_side, recompressed as JPEG.
+
+Each derivative is written once next to the upload (under `.analysis/`)
+and reused by every stage and by retries of the same task. Needs the
+optional `Pillow` package - without it the original file is sent.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+
+DERIVATIVE_DIR = ".analysis"
+
+# EXIF tag holding the camera orientation (1 = upright)
+_ORIENTATION_TAG = 0x0112
+
+
+def derivative_path(file_path: str, max_side: Optional[int] = None) -> Path:
+    """Where the analysis copy of an upload is kept."""
+    max_side = max_side or settings.analysis_image_max_side
+    original = Path(file_path)
+    return original.parent / DERIVATIVE_DIR / f"{original.stem}.{max_side}.jpg"
+
+
+def prepare_analysis_image(file_path: str, max_side: Optional[int] = None) -> str:
+    """
+    Path of the image to send for analysis, creating the derivative once.
+
+    Args:
+        file_path: Local path to the uploaded file
+        max_side: Longest side in pixels (default: settings.analysis_image_max_side)
+
+    Returns:
+        Path of the derivative, or of the original when it is already
+        small and upright, downscaling is off, or it cannot be decoded
+    """
+    max_side = max_side or settings.analysis_image_max_side
+    if Image is None or max_side <= 0:
+        return file_path
+
+    target = derivative_path(file_path, max_side)
+    try:
+        # Reused across stages and retries while the original is unchanged
+        if target.stat().st_mtime_ns >= Path(file_path).stat().st_mtime_ns:
+            return str(target)
+    except OSError:
+        pass
+
+    try:
+        with Image.open(file_path) as image:
+            orientation = image.getexif().get(_ORIENTATION_TAG, 1)
+            if image.format == "JPEG" and max(image.size) <= max_side and orientation == 1:
+                return file_path
+
+            # JPEG decoders can scale by 1/2..1/8 while decoding
+            image.draft("RGB", (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image = _to_rgb(image)
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            partial = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            image.save(partial, "JPEG", quality=settings.analysis_image_quality, optimize=True)
+            os.replace(partial, target)
+    except Exception as e:
+        logger.warning(f"Could not prepare analysis image for {file_path}, sending original: {str(e)}")
+        return file_path
+
+    logger.info(
+        f"Analysis image {target.name}: {image.size[0]}x{image.size[1]}, "
+        f"{Path(file_path).stat().st_size} -> {target.stat().st_size} bytes"
+    )
+    return str(target)
+
+
+def remove_analysis_images(file_path: str) -> None:
+    """Delete every analysis copy of an upload."""
+    original = Path(file_path)
+    for derivative in (original.parent / DERIVATIVE_DIR).glob(f"{original.stem}.*.jpg"):
+        derivative.unlink(missing_ok=True)
+
+
+def _to_rgb(image):
+    """JPEG has no alpha or palette: flatten onto white."""
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
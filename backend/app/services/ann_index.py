@@ -0,0 +1,202 @@
+"""
+Approximate nearest-neighbour index - HNSW graph over media embeddings.
+
+Used by VectorIndex for large libraries; small libraries (and heavily
+filtered searches) are scored exactly instead. Requires the optional
+`hnswlib` package - without it every search falls back to the exact scan.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover - optional dependency
+    hnswlib = None
+
+
+GRAPH_FILE = "hnsw.bin"
+META_FILE = "hnsw.json"
+
+
+def ann_available() -> bool:
+    """Whether the HNSW backend can be used in this environment."""
+    return hnswlib is not None
+
+
+class HNSWIndex:
+    """
+    HNSW graph keyed by media id.
+
+    Vectors must be unit length; the graph uses inner-product space so
+    `1 - distance` is the cosine similarity.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        initial_capacity: int = 1024
+    ):
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed")
+
+        self.dimension = dimension
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._labels: Set[int] = set()
+        self._deleted: Set[int] = set()
+        # When the graph was last saved or loaded (epoch seconds)
+        self.saved_at: Optional[float] = None
+
+        self._graph = hnswlib.Index(space="ip", dim=dimension)
+        self._graph.init_index(
+            max_elements=max(initial_capacity, 16),
+            M=m,
+            ef_construction=ef_construction
+        )
+        self._graph.set_ef(ef_search)
+
+    def __len__(self) -> int:
+        return len(self._labels) - len(self._deleted)
+
+    def __contains__(self, media_id: int) -> bool:
+        return media_id in self._labels and media_id not in self._deleted
+
+    def ids(self) -> List[int]:
+        """Media ids in the graph (excluding deleted ones)."""
+        return sorted(self._labels - self._deleted)
+
+    def _reserve(self, extra: int) -> None:
+        """Resize the graph so `extra` more elements fit."""
+        capacity = self._graph.get_max_elements()
+        required = self._graph.get_current_count() + extra
+        if required > capacity:
+            self._graph.resize_index(max(required, capacity * 2))
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray) -> None:
+        """
+        Insert or update vectors.
+
+        Args:
+            ids: Media ids, one per row of `vectors`
+            vectors: Unit-length float32 rows
+        """
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if ids.size == 0:
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(ids.size, self.dimension)
+        for media_id in ids.tolist():
+            if media_id in self._deleted:
+                self._graph.unmark_deleted(media_id)
+                self._deleted.discard(media_id)
+
+        new = sum(1 for media_id in ids.tolist() if media_id not in self._labels)
+        self._reserve(new)
+        self._graph.add_items(vectors, ids)
+        self._labels.update(ids.tolist())
+
+    def remove(self, media_id: int) -> bool:
+        """Mark a media item as deleted so it is never returned."""
+        if media_id not in self._labels or media_id in self._deleted:
+            return False
+        self._graph.mark_deleted(media_id)
+        self._deleted.add(media_id)
+        return True
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        allowed: Optional[Callable[[int], bool]] = None,
+        ef: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the approximate k nearest neighbours of a query.
+
+        Args:
+            query: Unit-length query vector
+            k: Number of neighbours
+            allowed: Optional predicate restricting which ids may be returned
+            ef: Search breadth (defaults to ef_search, raised to at least k)
+
+        Returns:
+            Tuple of (media ids, cosine similarities), best first
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        self._graph.set_ef(max(ef or self.ef_search, k))
+        labels, distances = self._graph.knn_query(query, k=k, num_threads=1, filter=allowed)
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def save(self, directory: Path) -> None:
+        """Write the graph and its parameters to `directory`."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        saved_at = time.time()
+        self._graph.save_index(str(directory / GRAPH_FILE))
+        meta = {
+            "dimension": self.dimension,
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "deleted": sorted(self._deleted),
+            "saved_at": saved_at,
+        }
+        (directory / META_FILE).write_text(json.dumps(meta))
+        self.saved_at = saved_at
+        logger.info(f"Saved HNSW index with {len(self)} vectors to {directory}")
+
+    @classmethod
+    def load(cls, directory: Path, dimension: int, ef_search: int = 64) -> Optional["HNSWIndex"]:
+        """
+        Load a graph saved with `save`.
+
+        Args:
+            directory: Directory passed to `save`
+            dimension: Expected vector dimension
+            ef_search: Search breadth for the loaded graph
+
+        Returns:
+            HNSWIndex, or None if nothing usable is stored there
+        """
+        directory = Path(directory)
+        graph_path = directory / GRAPH_FILE
+        meta_path = directory / META_FILE
+        if hnswlib is None or not graph_path.exists() or not meta_path.exists():
+            return None
+
+        try:
+            meta = json.loads(meta_path.read_text())
+            if meta["dimension"] != dimension:
+                logger.warning("Stored HNSW index has a different dimension - ignoring it")
+                return None
+
+            index = cls.__new__(cls)
+            index.dimension = dimension
+            index.m = meta["m"]
+            index.ef_construction = meta["ef_construction"]
+            index.ef_search = ef_search
+            index._graph = hnswlib.Index(space="ip", dim=dimension)
+            index._graph.load_index(str(graph_path))
+            index._graph.set_ef(ef_search)
+            index._labels = set(int(i) for i in index._graph.get_ids_list())
+            index._deleted = set(meta.get("deleted", []))
+            # Missing in graphs saved before it was recorded
+            index.saved_at = meta.get("saved_at")
+        except Exception as e:
+            logger.error(f"Failed to load HNSW index from {directory}: {str(e)}")
+            return None
+
+        logger.info(f"Loaded HNSW index with {len(index)} vectors from {directory}")
+        return index
@@ -0,0 +1,285 @@
+"""
+Index Shards - One in-memory VectorIndex per owner, loaded on first use
+and evicted least-recently-used under a memory budget.
+
+Searches scoped to a user score that user's shard directly instead of
+refetching candidate ids from the database on every query. Shards keep
+each item's filterable attributes (see media_attributes.py), so filtered
+searches are a row mask too. The ingest
+pipeline and media deletion update loaded shards in place, so a shard is
+never rebuilt; users who have not searched recently hold no memory.
+
+Other worker processes update their own shards, not this one's, so a
+shard is checked against a cheap database watermark (row count and latest
+`updated_at`) at most every `check_interval` seconds. Changed rows are
+upserted; a count that still differs afterwards (a deletion elsewhere)
+reloads the shard.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.database.session import USE_PGVECTOR
+from app.services.media_attributes import MediaAttributes
+from app.services.vector_index import VectorIndex, VectorLoader, load_embeddings
+
+# (media_id, embedding, attributes) as loaded into a shard
+ShardRow = Tuple[int, object, MediaAttributes]
+# (row count, latest updated_at) of an owner's searchable media
+Watermark = Tuple[int, object]
+
+
+class IndexShards:
+    """
+    LRU cache of per-owner vector indexes bounded by `memory_budget` bytes.
+
+    The most recently used shard is never evicted, so a single library
+    larger than the budget still works - it just stays the only one loaded.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 1536,
+        memory_budget: int = 512 * 1024 * 1024,
+        ann_min_items: Optional[int] = None,
+        enabled: bool = True,
+        quantize: bool = False,
+        rerank_depth: int = 200,
+        vector_loader: Optional[VectorLoader] = None,
+        scan_dimension: Optional[int] = None,
+        check_interval: float = 5.0
+    ):
+        self.dimension = dimension
+        self.memory_budget = memory_budget
+        self.ann_min_items = ann_min_items
+        self.quantize = quantize
+        self.rerank_depth = rerank_depth
+        self.vector_loader = vector_loader
+        self.scan_dimension = scan_dimension
+        self.check_interval = check_interval
+        # Disabled when vector search runs in the database (pgvector)
+        self.enabled = enabled
+        self._shards: "OrderedDict[int, VectorIndex]" = OrderedDict()
+        self._loading: Dict[int, threading.Event] = {}
+        # Watermark each shard was last synced to, and when it was checked
+        self._watermarks: Dict[int, Watermark] = {}
+        self._checked: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, owner_id: int) -> bool:
+        return owner_id in self._shards
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by all loaded shards."""
+        with self._lock:
+            return sum(shard.nbytes for shard in self._shards.values())
+
+    def loaded_owners(self) -> List[int]:
+        """Owner ids with a loaded shard, least recently used first."""
+        with self._lock:
+            return list(self._shards)
+
+    def shard(
+        self,
+        owner_id: int,
+        load: Callable[[], Iterable[ShardRow]],
+        watermark: Optional[Callable[[], Watermark]] = None,
+        load_changed: Optional[Callable[[object], Iterable[ShardRow]]] = None
+    ) -> VectorIndex:
+        """
+        Get an owner's shard, loading it on first use.
+
+        Args:
+            owner_id: Owner (user) ID
+            load: Returns the owner's (media_id, embedding, attributes)
+                triples; only called when the shard is not loaded
+            watermark: Returns the owner's (row count, latest updated_at)
+                in the database; None trusts the loaded shard
+            load_changed: Returns the triples updated at or after a given
+                time; without it any change reloads the shard
+
+        Returns:
+            The owner's vector index
+        """
+        if watermark is not None:
+            self._sync(owner_id, watermark, load_changed)
+
+        with self._lock:
+            shard = self._shards.get(owner_id)
+            loading = self._loading.get(owner_id)
+            if shard is not None and loading is None:
+                self._shards.move_to_end(owner_id)
+                return shard
+            if loading is None:
+                # Registered before loading so pipeline updates that land
+                # meanwhile are not lost
+                shard = VectorIndex(
+                    dimension=self.dimension,
+                    initial_capacity=16,
+                    ann_min_items=self.ann_min_items,
+                    quantize=self.quantize,
+                    rerank_depth=self.rerank_depth,
+                    vector_loader=self.vector_loader,
+                    scan_dimension=self.scan_dimension,
+                    attributes=True
+                )
+                self._shards[owner_id] = shard
+                loading = self._loading[owner_id] = threading.Event()
+                is_loader = True
+            else:
+                is_loader = False
+
+        if not is_loader:
+            loading.wait()
+            return shard
+
+        try:
+            # Taken first, so changes that land during the load are seen
+            # by the next check
+            mark = watermark() if watermark is not None else None
+            # Rows already upserted by the pipeline are newer - keep them
+            loaded = shard.load_many(
+                item for item in load() if item[0] not in shard
+            )
+            logger.info(f"Loaded search shard for user {owner_id}: {loaded} vectors")
+            with self._lock:
+                self._watermarks[owner_id] = mark
+                self._checked[owner_id] = time.monotonic()
+        except Exception:
+            with self._lock:
+                self._forget(owner_id)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(owner_id, None)
+                if owner_id in self._shards:
+                    self._shards.move_to_end(owner_id)
+            loading.set()
+
+        self._evict()
+        return shard
+
+    def build(self, load: Callable[[], Iterable[ShardRow]]) -> VectorIndex:
+        """
+        Load an index like an owner's shard without caching it.
+
+        For one-off batch work (the neighbour sweep) over owners who are
+        not searching: nothing loaded or evicted here.
+        """
+        shard = VectorIndex(
+            dimension=self.dimension,
+            initial_capacity=16,
+            ann_min_items=self.ann_min_items,
+            quantize=self.quantize,
+            rerank_depth=self.rerank_depth,
+            vector_loader=self.vector_loader,
+            scan_dimension=self.scan_dimension,
+            attributes=True
+        )
+        shard.load_many(load())
+        return shard
+
+    def _sync(
+        self,
+        owner_id: int,
+        watermark: Callable[[], Watermark],
+        load_changed: Optional[Callable[[object], Iterable[ShardRow]]]
+    ) -> None:
+        """Bring a loaded shard up to date with writes from other processes."""
+        now = time.monotonic()
+        with self._lock:
+            shard = self._shards.get(owner_id)
+            if shard is None or owner_id in self._loading:
+                return
+            if now - self._checked.get(owner_id, float("-inf")) < self.check_interval:
+                return
+            self._checked[owner_id] = now
+            known = self._watermarks.get(owner_id)
+
+        current = watermark()
+        if current == known:
+            return
+
+        since = known[1] if known is not None else None
+        caught_up = since is not None and load_changed is not None
+        if caught_up:
+            for media_id, embedding, attributes in load_changed(since):
+                shard.upsert(media_id, embedding, attributes)
+
+        with self._lock:
+            if self._shards.get(owner_id) is not shard:
+                return
+            if caught_up and len(shard) == current[0]:
+                self._watermarks[owner_id] = current
+                return
+            # Rows removed elsewhere (or no time to catch up from): drop the
+            # shard so the caller reloads it
+            if owner_id not in self._loading:
+                self._forget(owner_id)
+        logger.info(f"Search shard for user {owner_id} changed in another process, reloading")
+
+    def _forget(self, owner_id: int) -> Optional[VectorIndex]:
+        """Drop a shard and its watermark; caller holds the lock."""
+        self._watermarks.pop(owner_id, None)
+        self._checked.pop(owner_id, None)
+        return self._shards.pop(owner_id, None)
+
+    def _evict(self) -> None:
+        """Drop least recently used shards until the budget is met."""
+        with self._lock:
+            total = sum(shard.nbytes for shard in self._shards.values())
+            for owner_id in list(self._shards)[:-1]:
+                if total <= self.memory_budget:
+                    break
+                if owner_id in self._loading:
+                    continue
+                total -= self._forget(owner_id).nbytes
+                logger.info(f"Evicted search shard for user {owner_id}")
+
+    def upsert(
+        self,
+        owner_id: int,
+        media_id: int,
+        embedding,
+        attributes: Optional[MediaAttributes] = None
+    ) -> None:
+        """Update a loaded shard with a new or changed embedding."""
+        with self._lock:
+            shard = self._shards.get(owner_id)
+        if shard is not None:
+            shard.upsert(media_id, embedding, attributes)
+
+    def remove(self, owner_id: int, media_id: int) -> None:
+        """Remove a media item from a loaded shard."""
+        with self._lock:
+            shard = self._shards.get(owner_id)
+        if shard is not None:
+            shard.remove(media_id)
+
+    def clear(self) -> None:
+        """Drop every shard."""
+        with self._lock:
+            self._shards.clear()
+            self._watermarks.clear()
+            self._checked.clear()
+
+
+# Singleton instance
+index_shards = IndexShards(
+    dimension=settings.embedding_dimension,
+    memory_budget=settings.index_shard_memory_mb * 1024 * 1024,
+    ann_min_items=settings.ann_min_items if settings.ann_enabled else None,
+    # A shared vector store already holds every library once per host
+    enabled=not USE_PGVECTOR and not settings.vector_store_dir,
+    quantize=settings.vector_quantization,
+    rerank_depth=settings.quantized_rerank_depth,
+    vector_loader=load_embeddings,
+    scan_dimension=settings.coarse_embedding_dimension or None,
+    check_interval=settings.index_shard_check_seconds
+)
@@ -0,0 +1,175 @@
+"""
+Media Attributes - Filterable columns held next to a vector index's rows.
+
+Search filters (has_people, date range, tags) and the processing status
+are kept as NumPy arrays aligned with the index rows, so a filter becomes
+a boolean row mask applied before scoring instead of a SQL candidate
+query whose ids are then looked up one by one.
+
+Tags use an inverted index (tag -> row positions) over normalized tags,
+matching the media_tags lookup in SearchService._apply_filters.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from app.database.models_media import Media, ProcessingStatus, normalize_tags
+
+# Filters the mask can evaluate; others need the SQL candidate query
+FILTER_KEYS = frozenset({"has_people", "date_from", "date_to", "tags"})
+
+# Columns to select after (media_id, embedding) to build MediaAttributes
+ATTRIBUTE_COLUMNS = (Media.has_people, Media.created_at, Media.tags, Media.status)
+
+_STATUS_CODES = {status: code for code, status in enumerate(ProcessingStatus)}
+_NO_TIME = np.datetime64("NaT", "us")
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Datetimes are stored naive (UTC); compare aware values in UTC."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class MediaAttributes(NamedTuple):
+    """Filterable attributes of one media item."""
+
+    has_people: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    tags: Tuple[str, ...] = ()
+    status: Optional[ProcessingStatus] = None
+
+    @classmethod
+    def of(cls, media) -> "MediaAttributes":
+        """Attributes of a Media instance."""
+        return cls.from_row(media.has_people, media.created_at, media.tags, media.status)
+
+    @classmethod
+    def from_row(cls, has_people, created_at, tags, status) -> "MediaAttributes":
+        """Attributes from values selected with ATTRIBUTE_COLUMNS."""
+        return cls(
+            has_people=has_people,
+            created_at=_naive_utc(created_at),
+            tags=tuple(normalize_tags(tags)),
+            status=status
+        )
+
+
+class AttributeColumns:
+    """
+    Row-aligned attribute arrays for a VectorIndex.
+
+    The index calls `write`, `move` and `grow` as its rows change, so row
+    positions here always match the index's.
+    """
+
+    def __init__(self, capacity: int):
+        self.has_people = np.full(capacity, -1, dtype=np.int8)
+        self.created_at = np.full(capacity, _NO_TIME)
+        self.status = np.full(capacity, -1, dtype=np.int8)
+        self._row_tags: List[Tuple[int, ...]] = [()] * capacity
+        self._tag_ids: Dict[str, int] = {}
+        self._tag_rows: List[Set[int]] = []
+
+    @property
+    def nbytes(self) -> int:
+        return self.has_people.nbytes + self.created_at.nbytes + self.status.nbytes
+
+    @staticmethod
+    def supports(filters: Dict[str, Any]) -> bool:
+        """Whether `mask` can evaluate every filter."""
+        return set(filters) <= FILTER_KEYS
+
+    def grow(self, capacity: int) -> None:
+        """Extend the arrays to `capacity` rows."""
+        size = len(self.has_people)
+        extra = capacity - size
+        if extra <= 0:
+            return
+        self.has_people = np.concatenate([self.has_people, np.full(extra, -1, dtype=np.int8)])
+        self.created_at = np.concatenate([self.created_at, np.full(extra, _NO_TIME)])
+        self.status = np.concatenate([self.status, np.full(extra, -1, dtype=np.int8)])
+        self._row_tags.extend([()] * extra)
+
+    def write(self, position: int, attributes: MediaAttributes) -> None:
+        """Set the attributes of a row."""
+        has_people = attributes.has_people
+        self.has_people[position] = -1 if has_people is None else int(bool(has_people))
+        created_at = attributes.created_at
+        self.created_at[position] = _NO_TIME if created_at is None else np.datetime64(created_at, "us")
+        self.status[position] = _STATUS_CODES.get(attributes.status, -1)
+
+        self._set_tags(position, ())
+        tag_ids = []
+        for tag in attributes.tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                tag_id = self._tag_ids[tag] = len(self._tag_rows)
+                self._tag_rows.append(set())
+            tag_ids.append(tag_id)
+        self._set_tags(position, tuple(tag_ids))
+
+    def move(self, source: int, target: int) -> None:
+        """Move row `source` into `target` (whose previous row is dropped)."""
+        self.has_people[target] = self.has_people[source]
+        self.created_at[target] = self.created_at[source]
+        self.status[target] = self.status[source]
+        tag_ids = self._row_tags[source]
+        self._set_tags(source, ())
+        self._set_tags(target, tag_ids)
+
+    def clear_row(self, position: int) -> None:
+        self.write(position, MediaAttributes())
+
+    def clear(self) -> None:
+        self.__init__(len(self.has_people))
+
+    def mask(self, filters: Dict[str, Any], size: int) -> np.ndarray:
+        """
+        Rows among the first `size` that are searchable and match `filters`.
+
+        Args:
+            filters: Search filters (keys in FILTER_KEYS)
+            size: Number of rows in use
+
+        Returns:
+            Boolean array of length `size`
+        """
+        mask = self.status[:size] == _STATUS_CODES[ProcessingStatus.DONE]
+
+        if "has_people" in filters:
+            mask &= self.has_people[:size] == int(bool(filters["has_people"]))
+
+        # NaT (unknown date) compares False, like NULL in SQL
+        if "date_from" in filters:
+            mask &= self.created_at[:size] >= np.datetime64(_naive_utc(filters["date_from"]), "us")
+        if "date_to" in filters:
+            mask &= self.created_at[:size] <= np.datetime64(_naive_utc(filters["date_to"]), "us")
+
+        if filters.get("tags"):
+            tagged = np.zeros(size, dtype=bool)
+            rows = self._tagged_rows(normalize_tags(filters["tags"]))
+            if rows:
+                tagged[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+            mask &= tagged
+
+        return mask
+
+    def _tagged_rows(self, tags: Iterable[str]) -> Set[int]:
+        """Rows having any of the (normalized) tags."""
+        rows: Set[int] = set()
+        for tag in tags:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is not None:
+                rows |= self._tag_rows[tag_id]
+        return rows
+
+    def _set_tags(self, position: int, tag_ids: Tuple[int, ...]) -> None:
+        for tag_id in self._row_tags[position]:
+            self._tag_rows[tag_id].discard(position)
+        for tag_id in tag_ids:
+            self._tag_rows[tag_id].add(position)
+        self._row_tags[position] = tag_ids
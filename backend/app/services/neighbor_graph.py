@@ -0,0 +1,311 @@
+"""
+Neighbour Graph - Precomputed "more like this" lists.
+
+Each media item keeps its `k` most similar items from its owner's library
+in the media_neighbors table, so a recommendation request is one primary
+key range read instead of a vector scan.
+
+Lists are written when an embedding arrives (the new item's own list, and
+the new item merged into the lists of its neighbours), re-ranked by a
+background sweep once older than `max_age_seconds`, and dropped when an
+item they mention is deleted or re-embedded. A missing or stale list is a
+miss: the caller ranks live and stores the result. An item with no
+neighbours keeps a single row pointing at itself, so its empty list is
+remembered (and aged) like any other.
+
+Every worker starts the sweeper, but only the one holding the lock file
+`sweep_lock_path` sweeps; the others retry the lock each interval and
+take over if that worker exits.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+from loguru import logger
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.models_media import Media, MediaNeighbor, ProcessingStatus
+
+
+class NeighborGraph:
+    """
+    Reads and maintains the media_neighbors table.
+
+    A list is ranked within one library - the reference item's owner - so
+    it only answers recommendation requests scoped to that owner (or not
+    scoped at all, which means the owner's library).
+    """
+
+    def __init__(
+        self,
+        k: int = 20,
+        max_age_seconds: float = 86400,
+        sweep_interval_seconds: float = 3600,
+        sweep_batch: int = 500,
+        sweep_lock_path: Optional[str] = None
+    ):
+        self.k = k
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.sweep_batch = sweep_batch
+        # None: every process that starts the sweeper sweeps
+        self.sweep_lock_path = sweep_lock_path
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self._lock_handle = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.k > 0
+
+    def lookup(
+        self,
+        db: Session,
+        media_id: int,
+        user_id: Optional[int],
+        limit: int
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Stored neighbours of an item.
+
+        Args:
+            db: Database session
+            media_id: Reference media ID
+            user_id: Library the request is scoped to (None: the item's
+                owner)
+            limit: Number of neighbours wanted
+
+        Returns:
+            (media_id, score) tuples, most similar first, or None on a miss
+            (no list, list stale, ranked for another scope, or limit > k)
+        """
+        if not self.enabled or limit > self.k:
+            return None
+
+        rows = db.query(
+            MediaNeighbor.neighbor_id,
+            MediaNeighbor.score,
+            MediaNeighbor.owner_id,
+            MediaNeighbor.computed_at
+        ).filter(
+            MediaNeighbor.media_id == media_id
+        ).order_by(MediaNeighbor.rank).limit(limit).all()
+
+        if not rows:
+            return None
+        first_id, _, owner_id, computed_at = rows[0]
+        if user_id is not None and owner_id != user_id:
+            return None
+        if time.time() - computed_at > self.max_age_seconds:
+            return None
+        if first_id == media_id:
+            return []  # Ranked, but nothing else in the library
+        return [(neighbor_id, score) for neighbor_id, score, _, _ in rows]
+
+    def store(
+        self,
+        db: Session,
+        media_id: int,
+        owner_id: Optional[int],
+        ranked: List[Tuple[int, float]],
+        computed_at: Optional[float] = None
+    ) -> None:
+        """
+        Replace an item's list with the first `k` entries of `ranked`.
+
+        Args:
+            db: Database session (committed here)
+            media_id: Reference media ID
+            owner_id: Library `ranked` was computed in
+            ranked: (media_id, score) tuples, most similar first
+            computed_at: When `ranked` was computed (default: now)
+        """
+        computed_at = time.time() if computed_at is None else computed_at
+        db.query(MediaNeighbor).filter(MediaNeighbor.media_id == media_id).delete(
+            synchronize_session=False
+        )
+        # An empty list is stored as the item itself, so sweeps see its age
+        ranked = ranked[:self.k] or [(media_id, 0.0)]
+        db.bulk_insert_mappings(MediaNeighbor, [
+            {
+                "media_id": media_id,
+                "rank": rank,
+                "neighbor_id": neighbor_id,
+                "owner_id": owner_id,
+                "score": float(score),
+                "computed_at": computed_at,
+            }
+            for rank, (neighbor_id, score) in enumerate(ranked)
+        ])
+        db.commit()
+
+    def merge(self, db: Session, media_id: int, ranked: List[Tuple[int, float]]) -> int:
+        """
+        Add a new item to the lists of the items it is closest to.
+
+        Similarity is symmetric, so the new item belongs in neighbour j's
+        list when it beats j's current k-th entry. Only j in the new item's
+        own top-k are checked; anything missed is corrected by the sweep.
+
+        Args:
+            db: Database session (committed here)
+            media_id: Newly embedded media ID
+            ranked: Its own neighbours, (media_id, score) tuples
+
+        Returns:
+            Number of lists updated
+        """
+        updated = 0
+        for neighbor_id, score in ranked[:self.k]:
+            rows = db.query(
+                MediaNeighbor.neighbor_id,
+                MediaNeighbor.score,
+                MediaNeighbor.owner_id,
+                MediaNeighbor.computed_at
+            ).filter(
+                MediaNeighbor.media_id == neighbor_id
+            ).order_by(MediaNeighbor.rank).all()
+
+            # Cold lists are ranked in full on first use
+            if not rows or (len(rows) >= self.k and score <= rows[-1].score):
+                continue
+
+            entries = [
+                (row.neighbor_id, row.score) for row in rows
+                if row.neighbor_id not in (media_id, neighbor_id)
+            ]
+            entries.append((media_id, score))
+            entries.sort(key=lambda entry: entry[1], reverse=True)
+            # Keeps the list's age: the other entries were not re-ranked
+            self.store(db, neighbor_id, rows[0].owner_id, entries, computed_at=rows[0].computed_at)
+            updated += 1
+        return updated
+
+    def forget(self, db: Session, media_id: int) -> None:
+        """
+        Drop an item's list and every list it appears in.
+
+        Call when an item is deleted or re-embedded; the affected items
+        are ranked again on their next request or sweep.
+        """
+        affected = db.query(MediaNeighbor.media_id).filter(
+            MediaNeighbor.neighbor_id == media_id
+        ).scalar_subquery()
+        db.query(MediaNeighbor).filter(
+            or_(MediaNeighbor.media_id == media_id, MediaNeighbor.media_id.in_(affected))
+        ).delete(synchronize_session=False)
+        db.commit()
+
+    def stale_ids(self, db: Session, limit: int) -> List[int]:
+        """Searchable items with no list or a list older than max_age_seconds, oldest first."""
+        lists = db.query(
+            MediaNeighbor.media_id,
+            func.min(MediaNeighbor.computed_at).label("computed_at")
+        ).group_by(MediaNeighbor.media_id).subquery()
+
+        cutoff = time.time() - self.max_age_seconds
+        rows = db.query(Media.id).outerjoin(
+            lists, lists.c.media_id == Media.id
+        ).filter(
+            Media.status == ProcessingStatus.DONE,
+            Media.embedding.isnot(None),
+            or_(lists.c.computed_at.is_(None), lists.c.computed_at < cutoff)
+        ).order_by(
+            lists.c.computed_at.isnot(None), lists.c.computed_at
+        ).limit(limit).all()
+        return [media_id for media_id, in rows]
+
+    def sweep(self, db: Optional[Session] = None, batch: Optional[int] = None) -> int:
+        """
+        Re-rank up to `batch` missing or stale lists.
+
+        Owners whose search shard is not loaded are ranked in a throwaway
+        index, so a sweep does not push searching users' shards out of
+        the cache.
+
+        Args:
+            db: Database session (a new one is opened if omitted)
+            batch: Maximum lists to rank (default: sweep_batch)
+
+        Returns:
+            Number of lists ranked
+        """
+        from app.database.session import SessionLocal
+        from app.services.search_service import SearchService
+
+        own_session = db is None
+        db = SessionLocal() if own_session else db
+        try:
+            media_ids = self.stale_ids(db, batch or self.sweep_batch)
+            SearchService(db).refresh_neighbors_many(media_ids)
+            if media_ids:
+                logger.info(f"Neighbour sweep ranked {len(media_ids)} lists")
+            return len(media_ids)
+        finally:
+            if own_session:
+                db.close()
+
+    def start_sweeper(self) -> None:
+        """Run `sweep` every sweep_interval_seconds in a daemon thread."""
+        if not self.enabled or self.sweep_interval_seconds <= 0 or self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(self.sweep_interval_seconds):
+                try:
+                    if self._hold_sweep_lock():
+                        self.sweep()
+                except Exception as e:
+                    logger.error(f"Neighbour sweep failed: {str(e)}")
+
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=run, name="neighbor-sweep", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        self._sweeper = None
+        if self._lock_handle is not None:
+            self._lock_handle.close()  # Releases the lock
+            self._lock_handle = None
+
+    def _hold_sweep_lock(self) -> bool:
+        """Take the cross-process sweep lock if it is free; kept until stop_sweeper."""
+        if self.sweep_lock_path is None or self._lock_handle is not None:
+            return True
+
+        path = Path(self.sweep_lock_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:  # pragma: no cover - Windows
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_handle = handle
+        logger.info("This worker now runs the neighbour sweep")
+        return True
+
+
+# Singleton instance
+neighbor_graph = NeighborGraph(
+    k=settings.neighbor_graph_k,
+    max_age_seconds=settings.neighbor_max_age_seconds,
+    sweep_interval_seconds=settings.neighbor_sweep_interval_seconds,
+    sweep_batch=settings.neighbor_sweep_batch,
+    sweep_lock_path=settings.neighbor_sweep_lock_path or None
+)
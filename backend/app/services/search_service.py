@@ -3,17 +3,37 @@ Search Service - Implements semantic search using embeddings
 and hybrid search combining vector similarity with filters.
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from loguru import logger
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-import json
+from sqlalchemy import or_, func, select, case, null, type_coerce
 import math
+from datetime import datetime, timedelta, timezone
 
-from app.database.models_media import Media, ProcessingStatus
+import numpy as np
+
+from app.core.config import settings
+from app.database.fts import build_match_query, fts_available, ranked_matches
+from app.database.models_media import Media, MediaTag, ProcessingStatus, media_card_columns, normalize_tags
+from app.database.session import USE_PGVECTOR
+from app.database.types import EmbeddingVector
+from app.services.index_shards import index_shards
+from app.services.media_attributes import ATTRIBUTE_COLUMNS, MediaAttributes
+from app.services.neighbor_graph import neighbor_graph
+from app.services.vector_index import VectorIndex, top_k, vector_index
 from app.utils.embeddings import embedding_service
 
 
+# Max ids per IN (...) clause when loading embeddings into the index
+INDEX_LOAD_CHUNK = 500
+
+# Text score for LIKE matches - a substring scan has no relevance signal
+LIKE_MATCH_SCORE = 0.5
+
+# Rank constant for reciprocal-rank fusion (Cormack et al. use 60)
+RRF_K = 60
+
+
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """
     Calculate cosine similarity between two vectors.
@@ -46,11 +66,77 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     return similarity
 
 
+def _searchable(user_id: int) -> Tuple:
+    """Criteria for a user's media that belong in their search shard."""
+    return (
+        Media.owner_id == user_id,
+        Media.status == ProcessingStatus.DONE,
+        Media.embedding.isnot(None)
+    )
+
+
+def _index_vector_column():
+    """
+    Column the in-memory indexes are loaded from: the short vector when
+    coarse scanning is on (falling back to the full one for rows not yet
+    derived), else the full embedding.
+    """
+    if not settings.coarse_embedding_dimension:
+        return Media.embedding
+    return type_coerce(
+        func.coalesce(Media.coarse_embedding, Media.embedding), EmbeddingVector()
+    )
+
+
+def _reciprocal_ranks(scores: np.ndarray, k: int = RRF_K) -> np.ndarray:
+    """
+    Reciprocal-rank contribution 1 / (k + rank) of each score.
+    
+    Args:
+        scores: Signal scores, NaN where the signal is missing
+        k: Rank constant
+        
+    Returns:
+        Contributions, 0 where the signal is missing
+    """
+    present = np.flatnonzero(~np.isnan(scores))
+    ranks = np.empty(len(present))
+    ranks[np.argsort(-scores[present], kind="stable")] = np.arange(1, len(present) + 1)
+    
+    contributions = np.zeros(len(scores))
+    contributions[present] = 1.0 / (k + ranks)
+    return contributions
+
+
+def _fuse(
+    semantic_scores: np.ndarray,
+    text_scores: np.ndarray,
+    semantic_weight: float,
+    text_weight: float,
+    fusion: str
+) -> np.ndarray:
+    """Combine hybrid signals (NaN = missing) by weighted sum or reciprocal-rank fusion."""
+    if fusion == "rrf":
+        return _reciprocal_ranks(semantic_scores) + _reciprocal_ranks(text_scores)
+    return (
+        semantic_weight * np.nan_to_num(semantic_scores) +
+        text_weight * np.nan_to_num(text_scores)
+    )
+
+
 class SearchService:
-    """Service for semantic and hybrid search of media items."""
+    """
+    Service for semantic and hybrid search of media items.
+    
+    On PostgreSQL with pgvector, similarity ranking runs in the database
+    (`ORDER BY embedding <=> :query LIMIT k`); otherwise embeddings are
+    scored by the in-process vector index.
+    """
     
     def __init__(self, db: Session):
         self.db = db
+        self.use_pgvector = USE_PGVECTOR and db.get_bind().dialect.name == "postgresql"
+        self.use_fts = fts_available(db.get_bind())
     
     def semantic_search(
         self,
@@ -77,66 +163,73 @@ class SearchService:
             logger.warning("Empty search query provided")
             return []
         
-        # Generate embedding for the query
-        query_embedding = embedding_service.generate_embedding(query)
+        ranked = self._semantic_ranking(query, user_id, limit, offset, filters)
         
-        if not query_embedding:
-            logger.error("Failed to generate query embedding")
+        if ranked is None:
             # Fallback to text search
             return self.text_search(query, user_id, limit, offset, filters)
         
-        # Build base query with filters
-        base_query = self.db.query(Media).filter(
-            Media.status == ProcessingStatus.DONE,
-            Media.embedding.isnot(None)  # Only items with embeddings
-        )
+        paginated_results = self.hydrate(ranked, "semantic")
         
-        # Apply user filter
-        if user_id is not None:
-            base_query = base_query.filter(Media.owner_id == user_id)
+        logger.info(f"Semantic search returned {len(paginated_results)} results")
+        return paginated_results
+    
+    def _semantic_ranking(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        offset: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Rank media ids by similarity to the query.
         
-        # Apply additional filters
-        if filters:
-            base_query = self._apply_filters(base_query, filters)
+        Returns:
+            List of (media_id, score) tuples, or None if the query
+            embedding could not be generated
+        """
+        # Generate embedding for the query (cached across requests)
+        query_embedding = embedding_service.embed_query(query)
         
-        # Fetch candidates
-        candidates = base_query.all()
+        if query_embedding is None:
+            logger.error("Failed to generate query embedding")
+            return None
         
-        if not candidates:
-            logger.info("No candidates found for semantic search")
-            return []
+        if self.use_pgvector:
+            return self._pgvector_ranking(query_embedding, user_id, limit, offset, filters)
         
-        # Calculate similarity scores
-        results = []
-        for media in candidates:
-            try:
-                # Parse embedding from JSON
-                if isinstance(media.embedding, str):
-                    media_embedding = json.loads(media.embedding)
-                else:
-                    media_embedding = media.embedding
-                
-                # Calculate similarity
-                similarity = cosine_similarity(query_embedding, media_embedding)
-                
-                results.append({
-                    "media": media,
-                    "score": similarity,
-                    "match_type": "semantic"
-                })
-                
-            except Exception as e:
-                logger.error(f"Error processing media {media.id}: {str(e)}")
-                continue
+        if user_id is not None and index_shards.enabled:
+            # The owner's shard holds exactly the searchable items and
+            # their filter attributes - no candidate query needed
+            shard = self._owner_shard(user_id)
+            candidate_ids, filters = self._shard_filters(shard, user_id, filters)
+            if candidate_ids == []:
+                return []
+            return shard.search(
+                query_embedding,
+                limit=limit,
+                offset=offset,
+                candidate_ids=candidate_ids,
+                filters=filters
+            )
         
-        # Sort by similarity score (descending)
-        results.sort(key=lambda x: x["score"], reverse=True)
+        # Candidate ids only - embeddings come from the in-memory index
+        candidate_ids = self._candidate_ids(user_id, filters)
         
-        # Apply pagination
-        paginated_results = results[offset:offset + limit]
+        if not candidate_ids:
+            logger.info("No candidates found for semantic search")
+            return []
         
-        logger.info(f"Semantic search returned {len(paginated_results)} results")
-        return paginated_results
+        self._ensure_indexed(candidate_ids)
+        
+        # Score every candidate with one matrix-vector product
+        return vector_index.search(
+            query_embedding,
+            limit=limit,
+            offset=offset,
+            candidate_ids=candidate_ids
+        )
     
     def text_search(
         self,
@@ -147,9 +240,14 @@ class SearchService:
         filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Fallback text-based search using LIKE queries.
+        Keyword search over captions, search text and tags.
         Used when embeddings are not available.
         
+        On SQLite this queries the FTS5 index with tokenized, prefix-aware
+        matching and ranks by field-weighted BM25, normalized so the best
+        match scores 1.0. Other databases fall back to a LIKE substring
+        scan with a fixed score.
+        
         Args:
             query: Search query
             user_id: Filter by user
@@ -160,8 +258,69 @@ class SearchService:
         Returns:
             List of media items
         """
+        ranked = self._text_ranking(query, user_id, limit, offset, filters)
+        formatted_results = self.hydrate(ranked, "text")
+        
+        logger.info(f"Text search returned {len(formatted_results)} results")
+        return formatted_results
+    
+    def _text_ranking(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        offset: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Tuple[int, float]]:
+        """Rank media ids by text relevance; see text_search."""
+        if not self.use_fts:
+            return self._like_ranking(query, user_id, limit, offset, filters)
+        
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+        
+        matches = ranked_matches(match_query)
+        best = func.max(matches.c.relevance).over()
+        
+        base_query = self.db.query(Media.id, matches.c.relevance, best).join(
+            matches, matches.c.media_id == Media.id
+        ).filter(
+            Media.status == ProcessingStatus.DONE
+        )
+        
+        # Apply user filter
+        if user_id is not None:
+            base_query = base_query.filter(Media.owner_id == user_id)
+        
+        # Apply additional filters
+        if filters:
+            base_query = self._apply_filters(base_query, filters)
+        
+        # Most relevant first, newest first among ties
+        base_query = base_query.order_by(
+            matches.c.relevance.desc(),
+            Media.created_at.desc()
+        )
+        
+        rows = base_query.limit(limit).offset(offset).all()
+        
+        return [
+            (media_id, relevance / best_relevance if best_relevance else 0.0)
+            for media_id, relevance, best_relevance in rows
+        ]
+    
+    def _like_ranking(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        offset: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Tuple[int, float]]:
+        """LIKE substring search for databases without the FTS index."""
         # Build base query
-        base_query = self.db.query(Media).filter(
+        base_query = self.db.query(Media.id).filter(
             Media.status == ProcessingStatus.DONE
         )
         
@@ -170,13 +329,7 @@ class SearchService:
             base_query = base_query.filter(Media.owner_id == user_id)
         
         # Apply text search
-        search_pattern = f"%{query}%"
-        base_query = base_query.filter(
-            or_(
-                func.lower(Media.caption).like(func.lower(search_pattern)),
-                func.lower(Media.search_text).like(func.lower(search_pattern))
-            )
-        )
+        base_query = base_query.filter(self._like_condition(query))
         
         # Apply additional filters
         if filters:
@@ -186,20 +339,210 @@ class SearchService:
         base_query = base_query.order_by(Media.created_at.desc())
         
         # Pagination
-        results = base_query.limit(limit).offset(offset).all()
-        
-        # Format results
-        formatted_results = [
-            {
-                "media": media,
-                "score": 0.5,  # Fixed score for text search
-                "match_type": "text"
-            }
-            for media in results
-        ]
+        rows = base_query.limit(limit).offset(offset).all()
         
-        logger.info(f"Text search returned {len(formatted_results)} results")
-        return formatted_results
+        return [(media_id, LIKE_MATCH_SCORE) for media_id, in rows]
+    
+    def rank(
+        self,
+        query: str,
+        search_type: str = "hybrid",
+        user_id: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 1000,
+        fusion: str = "linear",
+        offset: int = 0
+    ) -> Tuple[List[Tuple[int, float]], str]:
+        """
+        Rank media ids for a search without loading any Media rows.
+        
+        Used to snapshot a result list once and serve later pages from
+        it (see search_snapshots.py).
+        
+        Args:
+            query: Search query
+            search_type: "semantic", "text" or "hybrid"
+            user_id: Filter by user
+            filters: Additional filters
+            limit: Maximum number of ranked ids
+            fusion: Hybrid fusion method ("linear" or "rrf")
+            offset: Ranked ids to skip
+            
+        Returns:
+            Tuple of ((media_id, score) list, match type)
+        """
+        if not query or not query.strip():
+            return [], search_type
+        
+        if search_type == "semantic":
+            ranked = self._semantic_ranking(query, user_id, limit, offset, filters)
+            if ranked is not None:
+                return ranked, "semantic"
+            search_type = "text"
+        
+        if search_type == "text":
+            return self._text_ranking(query, user_id, limit, offset, filters), "text"
+        
+        ids, fused, _, _ = self._hybrid_scores(query, user_id, filters, 0.7, 0.3, fusion)
+        order = top_k(fused, offset + limit)[offset:]
+        return [(int(ids[i]), float(fused[i])) for i in order], "hybrid"
+    
+    def rank_many(
+        self,
+        queries: List[str],
+        search_type: str = "hybrid",
+        user_id: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 1000,
+        fusion: str = "linear"
+    ) -> List[Tuple[List[Tuple[int, float]], str]]:
+        """
+        Rank several searches that share a scope and filters.
+        
+        All query embeddings come from one API call, candidates are
+        loaded once and every query is scored against them in a single
+        matrix-matrix product. Results match calling `rank` per query.
+        
+        Args:
+            queries: Search queries
+            search_type: "semantic", "text" or "hybrid"
+            user_id: Filter by user
+            filters: Additional filters
+            limit: Maximum number of ranked ids per query
+            fusion: Hybrid fusion method ("linear" or "rrf")
+            
+        Returns:
+            One ((media_id, score) list, match type) tuple per query
+        """
+        results = [([], search_type) for _ in queries]
+        active = [i for i, query in enumerate(queries) if query and query.strip()]
+        
+        if search_type == "text" or not active:
+            for i in active:
+                results[i] = (self._text_ranking(queries[i], user_id, limit, 0, filters), "text")
+            return results
+        
+        embeddings = embedding_service.embed_queries([queries[i] for i in active])
+        
+        if self.use_pgvector:
+            # Similarity is ranked inside PostgreSQL per query; the
+            # embeddings above are now cached, so this makes no API calls
+            for i in active:
+                results[i] = self.rank(queries[i], search_type, user_id, filters, limit, fusion)
+            return results
+        
+        if search_type == "semantic":
+            embedded = [(i, e) for i, e in zip(active, embeddings) if e is not None]
+            rankings = self._semantic_rankings([e for _, e in embedded], user_id, limit, filters)
+            for (i, _), ranked in zip(embedded, rankings):
+                results[i] = (ranked, "semantic")
+            for i, embedding in zip(active, embeddings):
+                if embedding is None:
+                    results[i] = (self._text_ranking(queries[i], user_id, limit, 0, filters), "text")
+            return results
+        
+        ids, semantic_scores, text_scores = self._hybrid_signals_many(
+            [queries[i] for i in active], embeddings, user_id, filters
+        )
+        for row, i in enumerate(active):
+            # Candidates with neither signal for this query are not results
+            keep = ~(np.isnan(semantic_scores[row]) & np.isnan(text_scores[row]))
+            row_ids = ids[keep]
+            fused = _fuse(semantic_scores[row][keep], text_scores[row][keep], 0.7, 0.3, fusion)
+            results[i] = ([(int(row_ids[j]), float(fused[j])) for j in top_k(fused, limit)], "hybrid")
+        return results
+    
+    def _semantic_rankings(
+        self,
+        query_embeddings: List[np.ndarray],
+        user_id: Optional[int],
+        limit: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[List[Tuple[int, float]]]:
+        """In-process semantic ranking of several queries over one candidate set."""
+        if not query_embeddings:
+            return []
+        
+        if user_id is not None and index_shards.enabled:
+            shard = self._owner_shard(user_id)
+            candidate_ids, filters = self._shard_filters(shard, user_id, filters)
+            if candidate_ids == []:
+                return [[] for _ in query_embeddings]
+            return shard.search_many(
+                query_embeddings, limit=limit, candidate_ids=candidate_ids, filters=filters
+            )
+        
+        candidate_ids = self._candidate_ids(user_id, filters)
+        if not candidate_ids:
+            return [[] for _ in query_embeddings]
+        
+        self._ensure_indexed(candidate_ids)
+        return vector_index.search_many(query_embeddings, limit=limit, candidate_ids=candidate_ids)
+    
+    def hydrate(
+        self,
+        ranked: List[Tuple[int, float]],
+        match_type: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Load Media rows for ranked ids, preserving rank order.
+        
+        Only the media card columns are loaded; vectors and search text
+        stay in the database.
+        
+        Args:
+            ranked: List of (media_id, score) tuples
+            match_type: Match type label for the results
+            
+        Returns:
+            List of result dicts with media, score and match_type
+        """
+        return self.hydrate_many([(ranked, match_type)])[0]
+    
+    def hydrate_many(
+        self,
+        rankings: List[Tuple[List[Tuple[int, float]], str]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Hydrate several ranked lists with a single row load; see hydrate.
+        
+        Args:
+            rankings: (ranked, match_type) tuples
+            
+        Returns:
+            One list of result dicts per ranking
+        """
+        wanted = {media_id for ranked, _ in rankings for media_id, _ in ranked}
+        if not wanted:
+            return [[] for _ in rankings]
+        
+        media_by_id = {
+            media.id: media
+            for media in self.db.query(Media).options(media_card_columns()).filter(
+                Media.id.in_(wanted)
+            ).all()
+        }
+        
+        return [
+            [
+                {
+                    "media": media_by_id[media_id],
+                    "score": score,
+                    "match_type": match_type
+                }
+                for media_id, score in ranked
+                if media_id in media_by_id
+            ]
+            for ranked, match_type in rankings
+        ]
+    
+    def _like_condition(self, query: str):
+        """Case-insensitive substring match on caption or search text."""
+        search_pattern = f"%{query}%"
+        return or_(
+            func.lower(Media.caption).like(func.lower(search_pattern)),
+            func.lower(Media.search_text).like(func.lower(search_pattern))
+        )
     
     def hybrid_search(
         self,
@@ -209,11 +552,18 @@ class SearchService:
         offset: int = 0,
         filters: Optional[Dict[str, Any]] = None,
         semantic_weight: float = 0.7,
-        text_weight: float = 0.3
+        text_weight: float = 0.3,
+        fusion: str = "linear"
     ) -> List[Dict[str, Any]]:
         """
         Hybrid search combining semantic and text-based search.
         
+        A single filtered candidate query returns every searchable item
+        with its text relevance, semantic similarity is scored for the
+        same candidates, and the fused ranking covers all of them - so
+        any page, however deep, is exact. Only the returned page is
+        loaded as Media rows.
+        
         Args:
             query: Search query
             user_id: Filter by user
@@ -222,68 +572,260 @@ class SearchService:
             filters: Additional filters
             semantic_weight: Weight for semantic similarity (0-1)
             text_weight: Weight for text match (0-1)
+            fusion: "linear" blends the weighted scores; "rrf" uses
+                reciprocal-rank fusion (weights are ignored)
             
         Returns:
             Combined and ranked results
         """
-        # Get semantic results
-        semantic_results = self.semantic_search(
-            query, user_id, limit * 2, 0, filters  # Get more candidates
+        if not query or not query.strip():
+            logger.warning("Empty search query provided")
+            return []
+        
+        ids, fused, semantic_scores, text_scores = self._hybrid_scores(
+            query, user_id, filters, semantic_weight, text_weight, fusion
+        )
+        
+        # Ties keep the newest-first candidate order
+        page = top_k(fused, offset + limit)[offset:]
+        
+        paginated_results = self.hydrate(
+            [(int(ids[i]), float(fused[i])) for i in page], "hybrid"
+        )
+        
+        position = {int(ids[i]): i for i in page}
+        for result in paginated_results:
+            i = position[result["media"].id]
+            result["semantic_score"] = float(np.nan_to_num(semantic_scores[i]))
+            result["text_score"] = float(np.nan_to_num(text_scores[i]))
+        
+        logger.info(f"Hybrid search returned {len(paginated_results)} results")
+        return paginated_results
+    
+    def _hybrid_scores(
+        self,
+        query: str,
+        user_id: Optional[int],
+        filters: Optional[Dict[str, Any]],
+        semantic_weight: float,
+        text_weight: float,
+        fusion: str
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Fused hybrid scores for every candidate; see hybrid_search.
+        
+        Returns:
+            Tuple of (media ids, fused scores, semantic scores, text scores)
+            as parallel arrays
+        """
+        query_embedding = embedding_service.embed_query(query)
+        if query_embedding is None:
+            logger.error("Failed to generate query embedding - ranking by text only")
+        
+        ids, semantic_scores, text_scores = self._hybrid_signals(
+            query, query_embedding, user_id, filters
         )
         
-        # Get text results
-        text_results = self.text_search(
-            query, user_id, limit * 2, 0, filters
+        fused = _fuse(semantic_scores, text_scores, semantic_weight, text_weight, fusion)
+        return ids, fused, semantic_scores, text_scores
+    
+    def _hybrid_signals(
+        self,
+        query: str,
+        query_embedding: Optional[np.ndarray],
+        user_id: Optional[int],
+        filters: Optional[Dict[str, Any]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score every hybrid search candidate on both signals.
+        
+        One query selects the filtered candidates together with their text
+        relevance (and, on pgvector, their cosine similarity). Otherwise
+        similarity comes from the vector index for the same ids, rescored
+        from full vectors for the best matches when the index is
+        approximate.
+        
+        Args:
+            query: Search query
+            query_embedding: Query vector (None to rank by text only)
+            user_id: Filter by user
+            filters: Additional filters
+            
+        Returns:
+            Tuple of (media ids, semantic scores, text scores) as parallel
+            arrays, newest first; scores are NaN where a signal is missing
+        """
+        has_embedding = Media.embedding.isnot(None)
+        
+        if query_embedding is None:
+            semantic_column = None
+        elif self.use_pgvector:
+            semantic_column = 1.0 - Media.embedding.cosine_distance(query_embedding)
+        else:
+            semantic_column = has_embedding
+        
+        matches = None
+        if self.use_fts:
+            match_query = build_match_query(query)
+            if match_query:
+                matches = ranked_matches(match_query)
+            text_column = matches.c.relevance if matches is not None else None
+        else:
+            text_column = case((self._like_condition(query), LIKE_MATCH_SCORE), else_=None)
+        
+        signals = []
+        if semantic_column is not None:
+            signals.append(has_embedding)
+        if text_column is not None:
+            signals.append(text_column.isnot(None))
+        if not signals:
+            empty = np.zeros(0)
+            return np.zeros(0, dtype=np.int64), empty, empty
+        
+        candidates = self.db.query(
+            Media.id,
+            semantic_column if semantic_column is not None else null(),
+            text_column if text_column is not None else null()
         )
+        if matches is not None:
+            candidates = candidates.outerjoin(matches, matches.c.media_id == Media.id)
         
-        # Combine results
-        combined = {}
-        
-        # Add semantic results
-        for result in semantic_results:
-            media_id = result["media"].id
-            combined[media_id] = {
-                "media": result["media"],
-                "semantic_score": result["score"],
-                "text_score": 0.0
-            }
-        
-        # Add/merge text results
-        for result in text_results:
-            media_id = result["media"].id
-            if media_id in combined:
-                combined[media_id]["text_score"] = result["score"]
+        candidates = candidates.filter(
+            Media.status == ProcessingStatus.DONE,
+            or_(*signals)
+        )
+        
+        if user_id is not None:
+            candidates = candidates.filter(Media.owner_id == user_id)
+        
+        if filters:
+            candidates = self._apply_filters(candidates, filters)
+        
+        rows = candidates.order_by(Media.created_at.desc()).all()
+        
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        semantic_scores = np.full(len(rows), np.nan)
+        text_scores = np.array(
+            [np.nan if row[2] is None else row[2] for row in rows], dtype=np.float64
+        )
+        
+        # BM25 relevance is normalized by the best match, as in text_search
+        if matches is not None and not np.isnan(text_scores).all():
+            text_scores /= np.nanmax(text_scores)
+        
+        if semantic_column is None or not rows:
+            pass
+        elif self.use_pgvector:
+            semantic_scores[:] = [np.nan if row[1] is None else row[1] for row in rows]
+        else:
+            embedded = [row[0] for row in rows if row[1]]
+            if user_id is not None and index_shards.enabled:
+                index = self._owner_shard(user_id)
             else:
-                combined[media_id] = {
-                    "media": result["media"],
-                    "semantic_score": 0.0,
-                    "text_score": result["score"]
-                }
+                self._ensure_indexed(embedded)
+                index = vector_index
+            scored_ids, scores = index.score(query_embedding, embedded)
+            # Exact for the best matches, as in semantic search
+            scores = index.rescore([query_embedding], scored_ids, scores[np.newaxis])[0]
+            order = np.argsort(ids)
+            semantic_scores[order[np.searchsorted(ids[order], scored_ids)]] = scores
         
-        # Calculate hybrid scores
-        hybrid_results = []
-        for media_id, data in combined.items():
-            hybrid_score = (
-                semantic_weight * data["semantic_score"] +
-                text_weight * data["text_score"]
-            )
+        return ids, semantic_scores, text_scores
+    
+    def _hybrid_signals_many(
+        self,
+        queries: List[str],
+        query_embeddings: List[Optional[np.ndarray]],
+        user_id: Optional[int],
+        filters: Optional[Dict[str, Any]]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Both hybrid signals for several queries over one candidate load.
+        
+        Not used on pgvector (see rank_many).
+        
+        Args:
+            queries: Search queries
+            query_embeddings: Query vectors, parallel to `queries` (None to
+                rank that query by text only)
+            user_id: Filter by user
+            filters: Additional filters
             
-            hybrid_results.append({
-                "media": data["media"],
-                "score": hybrid_score,
-                "match_type": "hybrid",
-                "semantic_score": data["semantic_score"],
-                "text_score": data["text_score"]
-            })
+        Returns:
+            Tuple of (media ids, semantic scores, text scores): ids are the
+            filtered candidates, newest first; scores have one row per query
+            and are NaN where a signal is missing
+        """
+        def scoped(query):
+            """Restrict a query over Media to the hybrid search candidates."""
+            query = query.filter(Media.status == ProcessingStatus.DONE)
+            if user_id is not None:
+                query = query.filter(Media.owner_id == user_id)
+            if filters:
+                query = self._apply_filters(query, filters)
+            return query
         
-        # Sort by hybrid score
-        hybrid_results.sort(key=lambda x: x["score"], reverse=True)
+        rows = scoped(
+            self.db.query(Media.id, Media.embedding.isnot(None))
+        ).order_by(Media.created_at.desc()).all()
         
-        # Apply pagination
-        paginated_results = hybrid_results[offset:offset + limit]
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        has_embedding = np.fromiter((bool(row[1]) for row in rows), dtype=bool, count=len(rows))
+        semantic_scores = np.full((len(queries), len(ids)), np.nan)
+        text_scores = np.full((len(queries), len(ids)), np.nan)
+        if not rows:
+            return ids, semantic_scores, text_scores
         
-        logger.info(f"Hybrid search returned {len(paginated_results)} results")
-        return paginated_results
+        order = np.argsort(ids)
+        sorted_ids = ids[order]
+        
+        def locate(found_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            """Candidate positions of the found ids that are candidates."""
+            found_ids = np.asarray(found_ids, dtype=np.int64)
+            slots = np.minimum(np.searchsorted(sorted_ids, found_ids), len(sorted_ids) - 1)
+            hit = sorted_ids[slots] == found_ids
+            return order[slots[hit]], hit
+        
+        # Text relevance: one match query per search over the candidates only
+        for row, query in enumerate(queries):
+            if self.use_fts:
+                match_query = build_match_query(query)
+                if not match_query:
+                    continue
+                matches = ranked_matches(match_query)
+                found = scoped(
+                    self.db.query(matches.c.media_id, matches.c.relevance).join(
+                        Media, Media.id == matches.c.media_id
+                    )
+                ).all()
+            else:
+                like = scoped(self.db.query(Media.id).filter(self._like_condition(query)))
+                found = [(media_id, LIKE_MATCH_SCORE) for media_id, in like.all()]
+            if not found:
+                continue
+            
+            positions, hit = locate([media_id for media_id, _ in found])
+            text_scores[row, positions] = np.asarray([score for _, score in found], dtype=np.float64)[hit]
+            # BM25 relevance is normalized by the best match, as in text_search
+            if self.use_fts and len(positions):
+                text_scores[row] /= np.nanmax(text_scores[row])
+        
+        # Similarity: every embedded query against every embedded candidate at once
+        embedded_rows = [row for row, embedding in enumerate(query_embeddings) if embedding is not None]
+        embedded_ids = ids[has_embedding].tolist()
+        if embedded_rows and embedded_ids:
+            if user_id is not None and index_shards.enabled:
+                index = self._owner_shard(user_id)
+            else:
+                self._ensure_indexed(embedded_ids)
+                index = vector_index
+            embedded_queries = [query_embeddings[row] for row in embedded_rows]
+            scored_ids, scores = index.score_many(embedded_queries, embedded_ids)
+            scores = index.rescore(embedded_queries, scored_ids, scores)
+            positions, hit = locate(scored_ids)
+            semantic_scores[np.ix_(embedded_rows, positions)] = scores[:, hit]
+        
+        return ids, semantic_scores, text_scores
     
     def _apply_filters(self, query, filters: Dict[str, Any]):
         """
@@ -307,16 +849,10 @@ class SearchService:
         if "date_to" in filters:
             query = query.filter(Media.created_at <= filters["date_to"])
         
-        # Filter by tags (if tags contain specific keywords)
+        # Filter by tags (items having any of them, case-insensitive)
         if "tags" in filters and filters["tags"]:
-            tag_filters = []
-            for tag in filters["tags"]:
-                # JSON search in SQLite (checking if tag exists in JSON array)
-                tag_filters.append(
-                    func.json_extract(Media.tags, '$').like(f'%{tag}%')
-                )
-            if tag_filters:
-                query = query.filter(or_(*tag_filters))
+            tagged = select(MediaTag.media_id).where(MediaTag.tag.in_(normalize_tags(filters["tags"])))
+            query = query.filter(Media.id.in_(tagged))
         
         return query
     
@@ -329,63 +865,351 @@ class SearchService:
         """
         Get similar media items based on a given media item.
         
+        Served from the precomputed neighbour list when it is fresh and
+        ranked for the same library; otherwise ranked live (and stored
+        when the request is scoped to the item's owner).
+        
         Args:
             media_id: ID of the reference media
-            user_id: Filter by user
+            user_id: Filter by user (None: the reference item's owner)
             limit: Maximum results
             
         Returns:
             List of similar media items
         """
-        # Get reference media
-        reference = self.db.query(Media).filter(Media.id == media_id).first()
+        ranked = neighbor_graph.lookup(self.db, media_id, user_id, limit)
         
-        if not reference or not reference.embedding:
-            logger.warning(f"Media {media_id} not found or has no embedding")
-            return []
+        if ranked is None:
+            owner_id = self.db.query(Media.owner_id).filter(Media.id == media_id).scalar()
+            scope = owner_id if user_id is None else user_id
+            if neighbor_graph.enabled and limit <= neighbor_graph.k and owner_id == scope:
+                ranked = self.refresh_neighbors(media_id, owner_id)
+            else:
+                ranked = self.similar_ranking(media_id, scope, limit)
+            
+            if ranked is None:
+                logger.warning(f"Media {media_id} not found or has no embedding")
+                return []
         
-        # Parse reference embedding
-        if isinstance(reference.embedding, str):
-            reference_embedding = json.loads(reference.embedding)
-        else:
-            reference_embedding = reference.embedding
+        results = self.hydrate(ranked[:limit], "similar")
+        
+        logger.info(f"Found {len(results)} similar items to media {media_id}")
+        return results
+    
+    def similar_ranking(
+        self,
+        media_id: int,
+        user_id: Optional[int],
+        limit: int,
+        shard: Optional[VectorIndex] = None
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Rank media by similarity to a reference item with a live scan.
+        
+        Args:
+            media_id: ID of the reference media
+            user_id: Filter by user (None for all users)
+            limit: Maximum results
+            shard: Index of `user_id`'s library to rank in instead of
+                their cached shard
+            
+        Returns:
+            (media_id, score) tuples, most similar first, or None if the
+            reference is missing or has no embedding
+        """
+        if self.use_pgvector:
+            reference = self.db.query(Media.id).filter(
+                Media.id == media_id,
+                Media.embedding.isnot(None)
+            ).first()
+            if not reference:
+                return None
+            
+            # Compare against the stored vector without fetching it
+            reference_embedding = select(Media.embedding).where(
+                Media.id == media_id
+            ).scalar_subquery()
+            return self._pgvector_ranking(
+                reference_embedding, user_id, limit, 0, exclude_id=media_id
+            )
+        
+        if user_id is not None and index_shards.enabled:
+            shard = shard if shard is not None else self._owner_shard(user_id)
+            reference_embedding = self._reference_embedding(media_id, shard)
+            
+            if reference_embedding is None:
+                return None
+            
+            return shard.search(reference_embedding, limit=limit, exclude_ids=[media_id])
+        
+        # Reference vector comes from the index (loaded on demand)
+        if not vector_index.approximate:
+            self._ensure_indexed([media_id])
+        reference_embedding = self._reference_embedding(media_id, vector_index)
+        
+        if reference_embedding is None:
+            return None
+        
+        candidate_ids = self._candidate_ids(user_id)
+        self._ensure_indexed(candidate_ids)
+        
+        return vector_index.search(
+            reference_embedding,
+            limit=limit,
+            candidate_ids=candidate_ids,
+            exclude_ids=[media_id]  # Exclude the reference itself
+        )
+    
+    def refresh_neighbors(
+        self,
+        media_id: int,
+        owner_id: Optional[int] = None,
+        shard: Optional[VectorIndex] = None
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Rank an item's neighbours within its owner's library and store them.
+        
+        Args:
+            media_id: ID of the reference media
+            owner_id: Its owner, if already known
+            shard: Index of the owner's library, if already built
+            
+        Returns:
+            The stored ranking, or None if the item has no embedding
+        """
+        if owner_id is None:
+            owner_id = self.db.query(Media.owner_id).filter(Media.id == media_id).scalar()
+        
+        ranked = self.similar_ranking(media_id, owner_id, neighbor_graph.k, shard)
+        if ranked is not None:
+            neighbor_graph.store(self.db, media_id, owner_id, ranked)
+        return ranked
+    
+    def refresh_neighbors_many(self, media_ids: List[int]) -> None:
+        """
+        Rank and store the neighbour lists of many items (the sweep).
         
-        # Get candidates
-        base_query = self.db.query(Media).filter(
+        Items are grouped by owner. An owner whose shard is not loaded is
+        ranked in an index built for this call and then dropped, so batch
+        work never loads shards into (or evicts them from) the search
+        cache.
+        """
+        owners = dict(
+            self.db.query(Media.id, Media.owner_id).filter(Media.id.in_(media_ids)).all()
+        ) if media_ids else {}
+        
+        by_owner: Dict[Optional[int], List[int]] = {}
+        for media_id in media_ids:
+            if media_id in owners:
+                by_owner.setdefault(owners[media_id], []).append(media_id)
+        
+        for owner_id, owner_media_ids in by_owner.items():
+            shard = None
+            if owner_id is not None and index_shards.enabled and owner_id not in index_shards:
+                shard = index_shards.build(self._owner_rows(owner_id))
+            for media_id in owner_media_ids:
+                self.refresh_neighbors(media_id, owner_id, shard)
+    
+    def index_neighbors(self, media_id: int) -> None:
+        """
+        Update the neighbour graph for a new or re-embedded item: drop the
+        lists it appeared in, rank its own and merge it into its
+        neighbours' lists.
+        """
+        if not neighbor_graph.enabled:
+            return
+        
+        neighbor_graph.forget(self.db, media_id)
+        ranked = self.refresh_neighbors(media_id)
+        if ranked:
+            neighbor_graph.merge(self.db, media_id, ranked)
+    
+    def changed_since(self, media_ids: List[int], since: float) -> List[int]:
+        """
+        Ids among `media_ids` whose embedding was changed or removed after
+        `since` - the entries a search index saved at that time holds
+        stale (see VectorIndex.load_ann).
+        
+        Args:
+            media_ids: Media IDs held by the saved index
+            since: When the index was saved (epoch seconds)
+            
+        Returns:
+            IDs that were deleted, lost their embedding or were updated
+        """
+        # A second of slack because database clocks may only keep whole seconds
+        cutoff = datetime.fromtimestamp(since, timezone.utc) - timedelta(seconds=1)
+        unchanged = set()
+        for start in range(0, len(media_ids), INDEX_LOAD_CHUNK):
+            chunk = media_ids[start:start + INDEX_LOAD_CHUNK]
+            unchanged.update(media_id for media_id, in self.db.query(Media.id).filter(
+                Media.id.in_(chunk),
+                Media.embedding.isnot(None),
+                Media.updated_at < cutoff
+            ))
+        return [media_id for media_id in media_ids if media_id not in unchanged]
+    
+    def _pgvector_ranking(
+        self,
+        reference,
+        user_id: Optional[int],
+        limit: int,
+        offset: int,
+        filters: Optional[Dict[str, Any]] = None,
+        exclude_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank media by cosine distance inside PostgreSQL.
+        
+        Args:
+            reference: Query vector, or a scalar subquery selecting one
+            user_id: Filter by user (None for all users)
+            limit: Maximum number of results
+            offset: Pagination offset
+            filters: Optional filters
+            exclude_id: Media ID to leave out (the reference item)
+            
+        Returns:
+            List of (media_id, score) tuples, best match first
+        """
+        distance = Media.embedding.cosine_distance(reference)
+        query = self.db.query(Media.id, distance.label("distance")).filter(
             Media.status == ProcessingStatus.DONE,
-            Media.embedding.isnot(None),
-            Media.id != media_id  # Exclude the reference itself
+            Media.embedding.isnot(None)
         )
         
         if user_id is not None:
-            base_query = base_query.filter(Media.owner_id == user_id)
+            query = query.filter(Media.owner_id == user_id)
         
-        candidates = base_query.all()
-        
-        # Calculate similarities
-        results = []
-        for media in candidates:
-            try:
-                if isinstance(media.embedding, str):
-                    media_embedding = json.loads(media.embedding)
-                else:
-                    media_embedding = media.embedding
-                
-                similarity = cosine_similarity(reference_embedding, media_embedding)
-                
-                results.append({
-                    "media": media,
-                    "score": similarity,
-                    "match_type": "similar"
-                })
-                
-            except Exception as e:
-                logger.error(f"Error processing media {media.id}: {str(e)}")
-                continue
+        if exclude_id is not None:
+            query = query.filter(Media.id != exclude_id)
         
-        # Sort and limit
-        results.sort(key=lambda x: x["score"], reverse=True)
-        results = results[:limit]
+        if filters:
+            query = self._apply_filters(query, filters)
         
-        logger.info(f"Found {len(results)} similar items to media {media_id}")
-        return results
+        rows = query.order_by(distance).limit(limit).offset(offset).all()
+        
+        return [
+            (media_id, 1.0 - float(media_distance))
+            for media_id, media_distance in rows
+        ]
+    
+    def _candidate_ids(
+        self,
+        user_id: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[int]:
+        """
+        Get ids of searchable media matching the user and filters.
+        
+        Args:
+            user_id: Filter by user (None for all users)
+            filters: Optional filters
+            
+        Returns:
+            List of media IDs with embeddings
+        """
+        query = self.db.query(Media.id).filter(
+            Media.status == ProcessingStatus.DONE,
+            Media.embedding.isnot(None)  # Only items with embeddings
+        )
+        
+        if user_id is not None:
+            query = query.filter(Media.owner_id == user_id)
+        
+        if filters:
+            query = self._apply_filters(query, filters)
+        
+        return [row[0] for row in query.all()]
+    
+    def _shard_filters(
+        self,
+        shard,
+        user_id: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> Tuple[Optional[List[int]], Optional[Dict[str, Any]]]:
+        """
+        How to apply search filters to a user's shard.
+        
+        Returns:
+            (candidate_ids, filters) for shard.search: the filters as a row
+            mask when the shard can evaluate them, otherwise candidate ids
+            from the database
+        """
+        if not filters:
+            return None, None
+        if shard.filterable(filters):
+            return None, filters
+        return self._candidate_ids(user_id, filters), None
+    
+    def _reference_embedding(self, media_id: int, index) -> Optional[Any]:
+        """
+        Full-precision vector of a recommendation's reference item.
+        
+        Taken from `index` when it stores exact vectors, otherwise (or
+        when the item is not in it) read from the database.
+        """
+        if not index.approximate:
+            reference = index.get(media_id)
+            if reference is not None:
+                return reference
+        return self.db.query(Media.embedding).filter(Media.id == media_id).scalar()
+    
+    def _owner_rows(self, user_id: int):
+        """
+        Loader of the user's searchable (media_id, vector, attributes)
+        rows; extra criteria narrow it (e.g. to recently changed rows).
+        """
+        def load(*criteria):
+            rows = self.db.query(Media.id, _index_vector_column(), *ATTRIBUTE_COLUMNS).filter(
+                *_searchable(user_id), *criteria
+            ).yield_per(INDEX_LOAD_CHUNK)
+            return (
+                (media_id, embedding, MediaAttributes.from_row(*attributes))
+                for media_id, embedding, *attributes in rows
+            )
+        
+        return load
+    
+    def _owner_shard(self, user_id: int):
+        """The user's search shard, loaded from the database on first use."""
+        searchable = _searchable(user_id)
+        load = self._owner_rows(user_id)
+        
+        def watermark():
+            count, latest = self.db.query(func.count(Media.id), func.max(Media.updated_at)).filter(
+                *searchable
+            ).one()
+            return count, latest
+        
+        return index_shards.shard(
+            user_id,
+            load,
+            watermark=watermark,
+            # Other workers' ingests and edits since the last check; a second
+            # of slack because database clocks may only keep whole seconds
+            load_changed=lambda since: load(Media.updated_at >= since - timedelta(seconds=1))
+        )
+    
+    def _ensure_indexed(self, media_ids: List[int]) -> None:
+        """
+        Load embeddings that are not yet in the vector index.
+        
+        Args:
+            media_ids: Media IDs that are about to be scored
+        """
+        missing = vector_index.missing(media_ids)
+        if not missing:
+            return
+        
+        loaded = 0
+        for start in range(0, len(missing), INDEX_LOAD_CHUNK):
+            chunk = missing[start:start + INDEX_LOAD_CHUNK]
+            rows = self.db.query(Media.id, _index_vector_column()).filter(
+                Media.id.in_(chunk),
+                Media.embedding.isnot(None)
+            ).all()
+            # Vectors already in a graph restored by load_ann stay as they are
+            loaded += vector_index.load_many(rows)
+        
+        logger.info(f"Loaded {loaded} embeddings into vector index ({len(vector_index)} total)")
@@ -0,0 +1,256 @@
+"""
+Search Snapshots - Server-side ranked result lists behind pagination
+cursors.
+
+The first page of a search ranks the library once and stores the ranked
+ids under an opaque cursor. Later pages slice that list and load only
+their own rows - no query embedding, no rescan, no re-sort.
+
+A snapshot holds the results up to the page asked for plus `window` more,
+not the whole ranking: a page past its end ranks again, deeper, and
+extends it (up to `max_results`). Deeper pages than that are ranked
+directly without a snapshot.
+
+Snapshots are grouped by client: the signed-in user, or for anonymous
+callers a client token minted with their first cursor and carried in
+every cursor after it. The caller-supplied `user_id` only scopes the
+search; it never picks whose snapshots are used.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class SearchSnapshot:
+    """Ranked ids and scores for one search, best match first."""
+
+    def __init__(
+        self,
+        key: Tuple,
+        ranked: List[Tuple[int, float]],
+        match_type: str,
+        complete: bool = True
+    ):
+        self.key = key
+        self.match_type = match_type
+        self.created_at = time.time()
+        # False when the ranking was cut off at the depth asked for
+        self.complete = complete
+        self.ids = np.fromiter((media_id for media_id, _ in ranked), dtype=np.int64, count=len(ranked))
+        self.scores = np.fromiter((score for _, score in ranked), dtype=np.float32, count=len(ranked))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def covers(self, end: int) -> bool:
+        """Whether the results up to index `end` are all stored."""
+        return self.complete or end <= len(self)
+
+    def extend(self, ranked: List[Tuple[int, float]], depth: int) -> None:
+        """
+        Append a deeper ranking of the same search.
+
+        Pages already served keep their order; only ids not yet stored
+        are added, so paging never repeats a result.
+
+        Args:
+            ranked: (media_id, score) tuples, best first
+            depth: Number of results that were asked for
+        """
+        seen = set(self.ids.tolist())
+        added = [(media_id, score) for media_id, score in ranked if media_id not in seen]
+        # Assigned in one step each, so concurrent pages read a valid prefix
+        self.scores = np.concatenate([self.scores, np.asarray([score for _, score in added], dtype=np.float32)])
+        self.ids = np.concatenate([self.ids, np.asarray([media_id for media_id, _ in added], dtype=np.int64)])
+        self.complete = len(ranked) < depth
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, float]]:
+        """(media_id, score) tuples for one page."""
+        return [
+            (int(media_id), float(score))
+            for media_id, score in zip(self.ids[offset:offset + limit], self.scores[offset:offset + limit])
+        ]
+
+
+class SearchSnapshotStore:
+    """
+    Thread-safe cursor -> snapshot map.
+
+    Each client keeps at most `max_per_user` snapshots, or one batch if
+    that is larger (least recently used are dropped first), of at most
+    `max_results` ids each, and at most `max_clients` clients are kept,
+    so memory is bounded. Snapshots expire `ttl_seconds` after creation.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 600,
+        max_per_user: int = 8,
+        max_results: int = 1000,
+        window: int = 100,
+        max_clients: int = 1000
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_per_user = max_per_user
+        self.max_results = max_results
+        self.window = window
+        self.max_clients = max_clients
+        self._snapshots: "OrderedDict[str, OrderedDict[str, SearchSnapshot]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def client_for(user_id: Optional[int], cursor: Optional[str] = None) -> str:
+        """
+        Snapshot group of a request.
+
+        Args:
+            user_id: Authenticated user, or None for anonymous requests
+            cursor: Cursor sent with the request, if any
+
+        Returns:
+            The user's group; for anonymous requests the client token in
+            `cursor`, or a new one
+        """
+        if user_id is not None:
+            return f"user-{user_id}"
+        if cursor and cursor.startswith("anon-") and "." in cursor:
+            return cursor.split(".", 1)[0]
+        return f"anon-{secrets.token_urlsafe(12)}"
+
+    @staticmethod
+    def make_key(
+        query: str,
+        search_type: str,
+        user_id: Optional[int],
+        filters: Optional[Dict[str, Any]],
+        fusion: str = "linear"
+    ) -> Tuple:
+        """Identity of a search; a cursor only serves the search it was made for."""
+        frozen_filters = tuple(sorted((filters or {}).items()))
+        return (query.strip(), search_type, user_id, frozen_filters, fusion)
+
+    def depth(self, end: int) -> int:
+        """Results to rank for a page ending at index `end`: the page plus a window."""
+        return min(self.max_results, end + self.window)
+
+    def create(
+        self,
+        key: Tuple,
+        client: str,
+        ranked: List[Tuple[int, float]],
+        match_type: str,
+        depth: Optional[int] = None
+    ) -> Tuple[str, SearchSnapshot]:
+        """
+        Store a ranked result list.
+
+        Args:
+            key: Search identity from make_key
+            client: Snapshot group from client_for
+            ranked: (media_id, score) tuples, best first
+            match_type: Match type label for the results
+            depth: Number of results that were asked for (None: `ranked`
+                is the whole ranking)
+
+        Returns:
+            Tuple of (cursor, snapshot)
+        """
+        return self.create_many([(key, ranked, match_type)], client, depth)[0]
+
+    def create_many(
+        self,
+        searches: List[Tuple[Tuple, List[Tuple[int, float]], str]],
+        client: str,
+        depth: Optional[int] = None
+    ) -> List[Tuple[str, SearchSnapshot]]:
+        """
+        Store the rankings of one batch request together.
+
+        The batch is one eviction unit: the client's cap grows to fit it, so
+        a batch larger than `max_per_user` only evicts older snapshots and
+        every cursor it returns can still be paged.
+
+        Args:
+            searches: (key, ranked, match_type) per search, as for create
+            client: Snapshot group from client_for
+            depth: Number of results that were asked for per search
+
+        Returns:
+            List of (cursor, snapshot), in the order of `searches`
+        """
+        created = []
+        for key, ranked, match_type in searches:
+            complete = len(ranked) < depth if depth is not None else len(ranked) <= self.max_results
+            snapshot = SearchSnapshot(key, ranked[:self.max_results], match_type, complete)
+            # The client token rides along so anonymous callers keep theirs
+            created.append((f"{client}.{secrets.token_urlsafe(16)}", snapshot))
+
+        with self._lock:
+            self._expire()
+            client_snapshots = self._snapshots.setdefault(client, OrderedDict())
+            self._snapshots.move_to_end(client)
+            client_snapshots.update(created)
+            while len(client_snapshots) > max(self.max_per_user, len(created)):
+                client_snapshots.popitem(last=False)
+            while len(self._snapshots) > self.max_clients:
+                self._snapshots.popitem(last=False)
+
+        return created
+
+    def get(self, cursor: str, key: Tuple, client: str) -> Optional[SearchSnapshot]:
+        """
+        Look up a snapshot.
+
+        Args:
+            cursor: Cursor returned by create
+            key: Identity of the search being paged
+            client: Snapshot group of the request paging the search
+
+        Returns:
+            The snapshot, or None if it expired, was evicted, belongs to
+            another client or was made for a different search
+        """
+        with self._lock:
+            client_snapshots = self._snapshots.get(client)
+            snapshot = client_snapshots.get(cursor) if client_snapshots else None
+            if snapshot is None:
+                return None
+            if time.time() - snapshot.created_at >= self.ttl_seconds:
+                del client_snapshots[cursor]
+                return None
+            if snapshot.key != key:
+                return None
+            client_snapshots.move_to_end(cursor)
+            self._snapshots.move_to_end(client)
+            return snapshot
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+
+    def _expire(self) -> None:
+        """Drop expired snapshots; caller holds the lock."""
+        cutoff = time.time() - self.ttl_seconds
+        for client in list(self._snapshots):
+            client_snapshots = self._snapshots[client]
+            for cursor in [c for c, snap in client_snapshots.items() if snap.created_at <= cutoff]:
+                del client_snapshots[cursor]
+            if not client_snapshots:
+                del self._snapshots[client]
+
+
+# Singleton instance
+search_snapshots = SearchSnapshotStore(
+    ttl_seconds=settings.search_snapshot_ttl_seconds,
+    max_per_user=settings.search_snapshots_per_user,
+    max_results=settings.search_snapshot_max_results,
+    window=settings.search_snapshot_window,
+    max_clients=settings.search_snapshot_clients
+)
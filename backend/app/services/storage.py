@@ -1,16 +1,19 @@
 from pathlib import Path
+from typing import Tuple
+import hashlib
 import uuid
 import json
 
 UPLOAD_DIR = Path("Uploads")
 
-def save_upload(file, contents: bytes, owner_id: int) -> Path:
+def save_upload(file, contents: bytes, owner_id: int) -> Tuple[Path, str]:
+    """Write an upload to disk; returns its path and the SHA-256 of its bytes."""
     ext = Path(file.filename).suffix
     filename = f"{owner_id}_{uuid.uuid4().hex}{ext}"
     dest = UPLOAD_DIR / filename
     with open(dest, "wb") as f:
         f.write(contents)
-    return dest
+    return dest, hashlib.sha256(contents).hexdigest()
 
 def extract_metadata(file_path: Path) -> dict:
     return {
@@ -0,0 +1,1070 @@
+"""
+Vector Index - In-memory matrix of pre-normalized embeddings so that
+similarity search is a single NumPy matrix-vector product instead of a
+Python loop over every candidate.
+
+Large libraries additionally get an HNSW graph (see ann_index.py) so a
+query visits a small part of the library instead of scanning all of it.
+
+Optionally rows are stored as int8 codes with a per-vector scale (about a
+quarter of the memory) and/or truncated to a short Matryoshka prefix of
+the embedding; the best candidates of that approximate scan are then
+rescored against the full float vectors loaded from the database.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.core.config import settings
+from app.database.models_media import Media
+from app.database.session import USE_PGVECTOR, SessionLocal
+from app.services.ann_index import HNSWIndex, ann_available
+from app.services.media_attributes import AttributeColumns, MediaAttributes
+from app.services.vector_store import SegmentStore
+
+
+def normalize_vector(vector, dimension: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Convert an embedding to a unit-length float32 array.
+
+    Args:
+        vector: Embedding as a list, JSON string or NumPy array
+        dimension: Expected dimension (None to accept any)
+
+    Returns:
+        Normalized float32 array, or None if the vector is empty,
+        has the wrong dimension or has zero magnitude
+    """
+    if vector is None:
+        return None
+
+    if isinstance(vector, str):
+        vector = json.loads(vector)
+
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    if array.size == 0:
+        return None
+
+    if dimension is not None and array.size != dimension:
+        return None
+
+    norm = float(np.linalg.norm(array))
+    if norm == 0.0 or not np.isfinite(norm):
+        return None
+
+    return array / norm
+
+
+# Rows converted to float32 at a time when scanning int8 codes; small
+# enough that the conversion buffer stays in cache
+QUANTIZED_SCAN_CHUNK = 256
+
+VectorLoader = Callable[[Sequence[int]], Iterable[Tuple[int, object]]]
+
+
+def quantize_vector(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Symmetric int8 quantization of a normalized vector.
+
+    Args:
+        vector: Float32 vector
+
+    Returns:
+        Tuple of (int8 codes, scale) with vector ~= codes * scale
+    """
+    peak = float(np.abs(vector).max())
+    scale = peak / 127.0 if peak > 0 else 1.0
+    codes = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def load_embeddings(media_ids: Sequence[int]) -> List[Tuple[int, object]]:
+    """Read float embeddings for re-ranking from the application database."""
+    with SessionLocal() as db:
+        return db.query(Media.id, Media.embedding).filter(
+            Media.id.in_(list(media_ids)),
+            Media.embedding.isnot(None)
+        ).all()
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the `k` highest scores, best first.
+
+    Uses a linear-time partition instead of sorting every score; only the
+    winners are sorted. Ties keep array order, so the result equals the
+    first `k` of a stable descending sort.
+
+    Args:
+        scores: Score array
+        k: Number of positions to select
+
+    Returns:
+        Array of at most `k` positions into `scores`
+    """
+    size = len(scores)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= size:
+        return np.argsort(-scores, kind="stable")
+
+    threshold = np.partition(scores, size - k)[size - k]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    winners = np.concatenate([above, ties])
+    return winners[np.lexsort((winners, -scores[winners]))]
+
+
+class VectorIndex:
+    """
+    Per-process index of media embeddings.
+
+    Embeddings are stored row-wise in a contiguous float32 matrix with a
+    parallel array of media ids. Rows are normalized on insert, so the
+    cosine similarity for every row is one matrix-vector product.
+
+    Once at least `ann_min_items` vectors are indexed, an HNSW graph is
+    built in the background and used for searches over that many
+    candidates or more; smaller searches stay exact.
+
+    With `quantize`, rows are int8 codes times a per-row scale. With
+    `scan_dimension`, rows keep only the first `scan_dimension` values of
+    each embedding, renormalized (text-embedding-3 vectors are trained so
+    that prefixes remain good embeddings). Scores from either scan are
+    approximate; `search` rescores its best `rerank_depth` candidates
+    exactly with full vectors from `vector_loader`, when one is given.
+
+    With `attributes`, each row also carries its MediaAttributes (given
+    as a third item to upsert/load) so searches can take `filters`,
+    evaluated as a row mask before scoring.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 1536,
+        initial_capacity: int = 1024,
+        ann_min_items: Optional[int] = None,
+        ann_m: int = 16,
+        ann_ef_construction: int = 200,
+        ann_ef_search: int = 64,
+        persist_dir: Optional[Path] = None,
+        enabled: bool = True,
+        quantize: bool = False,
+        rerank_depth: int = 200,
+        vector_loader: Optional[VectorLoader] = None,
+        scan_dimension: Optional[int] = None,
+        attributes: bool = False
+    ):
+        self.dimension = dimension
+        self.scan_dimension = scan_dimension if scan_dimension and scan_dimension < dimension else dimension
+        # Disabled when vector search runs in the database (pgvector)
+        self.enabled = enabled
+        self.quantize = quantize
+        self.rerank_depth = rerank_depth
+        self.vector_loader = vector_loader
+        self._matrix = np.zeros(
+            (initial_capacity, self.scan_dimension), dtype=np.int8 if quantize else np.float32
+        )
+        self._scales = np.ones(initial_capacity, dtype=np.float32) if quantize else None
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._positions: Dict[int, int] = {}
+        self._size = 0
+        self._attributes = AttributeColumns(initial_capacity) if attributes else None
+        self._lock = threading.RLock()
+
+        # HNSW graph (None until built or loaded; disabled if ann_min_items is None)
+        self.ann_min_items = ann_min_items if ann_available() else None
+        self.ann_m = ann_m
+        self.ann_ef_construction = ann_ef_construction
+        self.ann_ef_search = ann_ef_search
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self._ann: Optional[HNSWIndex] = None
+        self._ann_building = False
+        self._ann_pending: List[Tuple[str, int, Optional[np.ndarray]]] = []
+        self._ann_generation = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, media_id: int) -> bool:
+        return media_id in self._positions
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Media ids of the indexed rows (view, do not modify)."""
+        return self._ids[:self._size]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Normalized embedding rows (a dequantized copy when quantized)."""
+        return self._rows(slice(0, self._size))
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the backing arrays (excluding any HNSW graph)."""
+        scales = self._scales.nbytes if self._scales is not None else 0
+        attributes = self._attributes.nbytes if self._attributes is not None else 0
+        return self._matrix.nbytes + self._ids.nbytes + scales + attributes
+
+    @property
+    def approximate(self) -> bool:
+        """Whether scan scores are approximate (quantized or truncated rows)."""
+        return self.quantize or self.scan_dimension < self.dimension
+
+    def filterable(self, filters: Dict) -> bool:
+        """Whether `filters` can be passed to search instead of candidate ids."""
+        return self._attributes is not None and AttributeColumns.supports(filters)
+
+    def _scan_vector(self, vector) -> Optional[np.ndarray]:
+        """
+        Normalize a full embedding (or an already truncated prefix) into
+        the space the rows are stored in.
+        """
+        if self.scan_dimension == self.dimension:
+            return normalize_vector(vector, self.dimension)
+        if vector is None:
+            return None
+        if isinstance(vector, str):
+            vector = json.loads(vector)
+        array = np.asarray(vector, dtype=np.float32).ravel()
+        if array.size not in (self.dimension, self.scan_dimension):
+            return None
+        return normalize_vector(array[:self.scan_dimension])
+
+    def _rows(self, rows) -> np.ndarray:
+        """Float32 vectors for a slice or array of row positions."""
+        if not self.quantize:
+            return self._matrix[rows]
+        return self._matrix[rows].astype(np.float32) * self._scales[rows, None]
+
+    def _write_row(self, position: int, vector: np.ndarray) -> None:
+        if self.quantize:
+            self._matrix[position], self._scales[position] = quantize_vector(vector)
+        else:
+            self._matrix[position] = vector
+
+    def _dot(self, rows, query: np.ndarray) -> np.ndarray:
+        """
+        Scores of the rows at `rows` (slice or positions) against a query
+        vector (dim,), or against several queries at once as a (dim, Q)
+        matrix, giving (rows, Q) scores.
+        """
+        matrix = self._matrix[rows]
+        if not self.quantize:
+            return matrix @ query
+
+        # Convert the int8 codes in chunks so no full float copy is made
+        scores = np.empty((len(matrix),) + query.shape[1:], dtype=np.float32)
+        buffer = np.empty((min(len(matrix), QUANTIZED_SCAN_CHUNK), self.scan_dimension), dtype=np.float32)
+        for start in range(0, len(matrix), QUANTIZED_SCAN_CHUNK):
+            chunk = matrix[start:start + QUANTIZED_SCAN_CHUNK]
+            converted = buffer[:len(chunk)]
+            np.copyto(converted, chunk, casting="unsafe")
+            scores[start:start + len(chunk)] = converted @ query
+        scales = self._scales[rows]
+        return scores * (scales if query.ndim == 1 else scales[:, None])
+
+    def _grow(self, required: int) -> None:
+        """Grow the backing arrays so that at least `required` rows fit."""
+        capacity = self._matrix.shape[0]
+        if required <= capacity:
+            return
+
+        new_capacity = max(required, capacity * 2)
+        matrix = np.zeros((new_capacity, self.scan_dimension), dtype=self._matrix.dtype)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix = matrix
+        self._ids = ids
+        if self._scales is not None:
+            scales = np.ones(new_capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._scales = scales
+        if self._attributes is not None:
+            self._attributes.grow(new_capacity)
+
+    def upsert(self, media_id: int, embedding, attributes: Optional[MediaAttributes] = None) -> bool:
+        """
+        Insert or replace the embedding for a media item.
+
+        Args:
+            media_id: Media ID
+            embedding: Embedding vector (list, JSON string or array)
+            attributes: Filterable attributes (kept if None and the item
+                is already indexed)
+
+        Returns:
+            True if the vector was stored
+        """
+        return self._store(media_id, embedding, replace_ann=True, attributes=attributes)
+
+    def _store(
+        self,
+        media_id: int,
+        embedding,
+        replace_ann: bool,
+        attributes: Optional[MediaAttributes] = None
+    ) -> bool:
+        """Write one vector to the matrix and, if present, the HNSW graph."""
+        if not self.enabled:
+            return False
+
+        vector = self._scan_vector(embedding)
+        if vector is None:
+            logger.warning(f"Skipping invalid embedding for media {media_id}")
+            self.remove(media_id)
+            return False
+
+        with self._lock:
+            position = self._positions.get(media_id)
+            if position is None:
+                self._grow(self._size + 1)
+                position = self._size
+                self._positions[media_id] = position
+                self._ids[position] = media_id
+                self._size += 1
+                if self._attributes is not None and attributes is None:
+                    self._attributes.clear_row(position)
+            self._write_row(position, vector)
+            if self._attributes is not None and attributes is not None:
+                self._attributes.write(position, attributes)
+
+            if self._ann_building:
+                self._ann_pending.append(("add", media_id, vector))
+            elif self._ann is not None and (replace_ann or media_id not in self._ann):
+                self._ann.add([media_id], vector[None, :])
+        return True
+
+    def upsert_many(self, items: Iterable[Tuple[int, object]]) -> int:
+        """
+        Insert or replace several embeddings.
+
+        Args:
+            items: Iterable of (media_id, embedding) pairs, or
+                (media_id, embedding, attributes) triples
+
+        Returns:
+            Number of vectors stored
+        """
+        stored = 0
+        with self._lock:
+            for media_id, embedding, *attributes in items:
+                if self._store(media_id, embedding, True, *attributes):
+                    stored += 1
+        return stored
+
+    def load_many(self, items: Iterable[Tuple[int, object]]) -> int:
+        """
+        Index vectors read back from the database.
+
+        Unlike `upsert_many`, entries already present in a graph restored
+        from disk are kept rather than re-inserted.
+
+        Args:
+            items: Iterable of (media_id, embedding) pairs, or
+                (media_id, embedding, attributes) triples
+
+        Returns:
+            Number of vectors stored
+        """
+        stored = 0
+        with self._lock:
+            for media_id, embedding, *attributes in items:
+                if self._store(media_id, embedding, False, *attributes):
+                    stored += 1
+        return stored
+
+    def remove(self, media_id: int) -> bool:
+        """
+        Remove a media item from the index.
+
+        The last row is moved into the freed slot so the matrix stays dense.
+
+        Args:
+            media_id: Media ID
+
+        Returns:
+            True if the item was indexed
+        """
+        with self._lock:
+            # The graph may hold ids restored from disk that are not loaded yet
+            if self._ann_building:
+                self._ann_pending.append(("remove", media_id, None))
+            elif self._ann is not None:
+                self._ann.remove(media_id)
+
+            position = self._positions.pop(media_id, None)
+            if position is None:
+                return False
+
+            last = self._size - 1
+            if position != last:
+                moved_id = int(self._ids[last])
+                self._matrix[position] = self._matrix[last]
+                if self._scales is not None:
+                    self._scales[position] = self._scales[last]
+                self._ids[position] = moved_id
+                self._positions[moved_id] = position
+                if self._attributes is not None:
+                    self._attributes.move(last, position)
+            elif self._attributes is not None:
+                self._attributes.clear_row(last)
+            self._size = last
+        return True
+
+    def clear(self) -> None:
+        """Drop every indexed vector (including the HNSW graph)."""
+        with self._lock:
+            self._positions.clear()
+            self._size = 0
+            if self._attributes is not None:
+                self._attributes.clear()
+            self._ann = None
+            self._ann_pending = []
+            self._ann_generation += 1
+
+    def get(self, media_id: int) -> Optional[np.ndarray]:
+        """Return a copy of the normalized vector for a media item, if indexed."""
+        with self._lock:
+            position = self._positions.get(media_id)
+            if position is None:
+                return None
+            return np.array(self._rows(position))
+
+    def missing(self, media_ids: Iterable[int]) -> List[int]:
+        """Return the ids from `media_ids` that are not indexed yet."""
+        positions = self._positions
+        return [media_id for media_id in media_ids if media_id not in positions]
+
+    def score(
+        self,
+        query,
+        candidate_ids: Optional[Sequence[int]] = None,
+        filters: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute cosine similarity between a query and indexed vectors.
+
+        Args:
+            query: Query embedding
+            candidate_ids: Restrict scoring to these media ids
+                (None scores every indexed vector)
+            filters: Search filters evaluated on the row attributes
+                (see `filterable`)
+
+        Returns:
+            Tuple of (media ids, similarity scores) as parallel arrays
+        """
+        query_vector = self._scan_vector(query)
+        if query_vector is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return self._score(query_vector, candidate_ids, filters)
+
+    def score_many(
+        self,
+        queries: Sequence,
+        candidate_ids: Optional[Sequence[int]] = None,
+        filters: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score several queries against the same vectors with one
+        matrix-matrix product.
+
+        Args:
+            queries: Query embeddings
+            candidate_ids: Restrict scoring to these media ids
+                (None scores every indexed vector)
+            filters: Search filters evaluated on the row attributes
+
+        Returns:
+            Tuple of (media ids, scores) where scores has one row per
+            query (all NaN for queries that are not valid vectors)
+        """
+        vectors = [self._scan_vector(query) for query in queries]
+        valid = [i for i, vector in enumerate(vectors) if vector is not None]
+        if not valid:
+            ids, _ = self._score(np.zeros((self.scan_dimension, 0), dtype=np.float32), candidate_ids, filters)
+            return ids, np.full((len(queries), len(ids)), np.nan, dtype=np.float32)
+
+        query_matrix = np.stack([vectors[i] for i in valid], axis=1)
+        ids, scores = self._score(query_matrix, candidate_ids, filters)
+        if len(valid) == len(queries):
+            return ids, np.ascontiguousarray(scores.T)
+
+        all_scores = np.full((len(queries), len(ids)), np.nan, dtype=np.float32)
+        all_scores[valid] = scores.T
+        return ids, all_scores
+
+    def rescore(self, queries: Sequence, ids: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """
+        Replace each query's best `rerank_depth` scores with exact ones.
+
+        For callers that rank by `score`/`score_many` output themselves
+        (hybrid search): the shortlist gets the full-precision scores
+        `search` would return. Exact indexes, or ones without a
+        vector_loader, return `scores` unchanged.
+
+        Args:
+            queries: Query embeddings
+            ids: Scored media ids
+            scores: One row of scores per query, parallel to `ids`
+
+        Returns:
+            The scores, exact for every query's shortlist
+        """
+        if not self.approximate or self.vector_loader is None or not len(ids):
+            return scores
+
+        shortlists = [
+            None if np.isnan(row).all() else top_k(row, self.rerank_depth)
+            for row in scores
+        ]
+        wanted = {int(media_id) for rows in shortlists if rows is not None for media_id in ids[rows]}
+        vectors = self._load_vectors(sorted(wanted)) if wanted else None
+        if vectors is None:
+            return scores
+
+        scores = scores.copy()
+        for query, row, shortlist in zip(queries, scores, shortlists):
+            if shortlist is not None:
+                row[shortlist] = self._rerank(query, ids[shortlist], row[shortlist], vectors)
+        return scores
+
+    def _score(
+        self,
+        query: np.ndarray,
+        candidate_ids: Optional[Sequence[int]],
+        filters: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, scores) of the candidate rows for a scan-space query vector or matrix."""
+        with self._lock:
+            if candidate_ids is None and not filters:
+                ids = self._ids[:self._size].copy()
+                scores = self._dot(slice(0, self._size), query)
+            else:
+                rows = self._candidate_rows(candidate_ids, filters)
+                ids = self._ids[rows]
+                if len(rows) * 4 >= self._size:
+                    # Large candidate sets: scoring every row and picking
+                    # ours is cheaper than copying the rows out first
+                    scores = self._dot(slice(0, self._size), query)[rows]
+                else:
+                    scores = self._dot(rows, query)
+
+        return ids, scores
+
+    def _candidate_rows(self, candidate_ids: Optional[Sequence[int]], filters: Optional[Dict]) -> np.ndarray:
+        """Row positions of the candidates that pass the filters."""
+        if filters:
+            if not self.filterable(filters):
+                raise ValueError(f"Filters not supported by this index: {sorted(filters)}")
+            mask = self._attributes.mask(filters, self._size)
+            if candidate_ids is not None:
+                mask &= np.isin(self._ids[:self._size], np.fromiter(candidate_ids, dtype=np.int64))
+            return np.flatnonzero(mask)
+
+        positions = self._positions
+        return np.fromiter(
+            (positions[i] for i in candidate_ids if i in positions),
+            dtype=np.int64
+        )
+
+    def search(
+        self,
+        query,
+        limit: int = 20,
+        offset: int = 0,
+        candidate_ids: Optional[Sequence[int]] = None,
+        exclude_ids: Optional[Iterable[int]] = None,
+        filters: Optional[Dict] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank indexed vectors by similarity to a query.
+
+        Args:
+            query: Query embedding
+            limit: Maximum number of results
+            offset: Pagination offset
+            candidate_ids: Restrict ranking to these media ids
+            exclude_ids: Media ids to leave out of the results
+            filters: Search filters evaluated on the row attributes
+                (see `filterable`)
+
+        Returns:
+            List of (media_id, score) tuples, best match first
+        """
+        self._maybe_build_ann()
+        if self._ann is not None:
+            if filters:
+                # The graph filters by id
+                with self._lock:
+                    candidate_ids = self._ids[self._candidate_rows(candidate_ids, filters)].tolist()
+                filters = None
+            candidate_count = self._size if candidate_ids is None else len(candidate_ids)
+            if candidate_count >= self.ann_min_items:
+                ranked = self._search_ann(query, limit, offset, candidate_ids, exclude_ids)
+                if ranked is not None:
+                    return ranked
+
+        ids, scores = self.score(query, candidate_ids, filters)
+
+        if exclude_ids:
+            keep = ~np.isin(ids, np.fromiter(exclude_ids, dtype=np.int64))
+            ids, scores = ids[keep], scores[keep]
+
+        if self.approximate and self.vector_loader is not None:
+            coarse = top_k(scores, max(self.rerank_depth, offset + limit))
+            ids, scores = ids[coarse], self._rerank(query, ids[coarse], scores[coarse])
+
+        order = top_k(scores, offset + limit)[offset:]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def search_many(
+        self,
+        queries: Sequence,
+        limit: int = 20,
+        offset: int = 0,
+        candidate_ids: Optional[Sequence[int]] = None,
+        filters: Optional[Dict] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Rank indexed vectors for several queries at once.
+
+        All queries are scored in one pass (see score_many); approximate
+        indexes re-rank every query's shortlist from a single vector load.
+
+        Args:
+            queries: Query embeddings
+            limit: Maximum number of results per query
+            offset: Pagination offset
+            candidate_ids: Restrict ranking to these media ids
+            filters: Search filters evaluated on the row attributes
+
+        Returns:
+            One list of (media_id, score) tuples per query, best match first
+            (empty for queries that are not valid vectors)
+        """
+        ids, scores = self.score_many(queries, candidate_ids, filters)
+        depth = offset + limit
+
+        shortlists = []
+        for row in scores:
+            if not len(row) or np.isnan(row).all():
+                shortlists.append(None)
+            elif self.approximate and self.vector_loader is not None:
+                shortlists.append(top_k(row, max(self.rerank_depth, depth)))
+            else:
+                shortlists.append(top_k(row, depth))
+
+        vectors = None
+        if self.approximate and self.vector_loader is not None:
+            wanted = {int(media_id) for rows in shortlists if rows is not None for media_id in ids[rows]}
+            vectors = self._load_vectors(sorted(wanted)) if wanted else {}
+
+        results = []
+        for query, row, shortlist in zip(queries, scores, shortlists):
+            if shortlist is None:
+                results.append([])
+                continue
+            row_ids, row_scores = ids[shortlist], row[shortlist]
+            if vectors is not None:
+                row_scores = self._rerank(query, row_ids, row_scores, vectors)
+            order = top_k(row_scores, depth)[offset:]
+            results.append([(int(row_ids[i]), float(row_scores[i])) for i in order])
+        return results
+
+    def _load_vectors(self, media_ids: List[int]) -> Optional[Dict[int, object]]:
+        """Full-precision vectors from vector_loader (None if loading fails)."""
+        try:
+            return dict(self.vector_loader(media_ids))
+        except Exception as e:
+            logger.warning(f"Re-ranking skipped - could not load vectors: {str(e)}")
+            return None
+
+    def _rerank(
+        self,
+        query,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        vectors: Optional[Dict[int, object]] = None
+    ) -> np.ndarray:
+        """
+        Exact scores for `ids` from full-precision vectors (approximate ones
+        kept if unavailable). `vectors` are loaded when not given.
+        """
+        query_vector = normalize_vector(query, self.dimension)
+        exact = scores.astype(np.float32, copy=True)
+        if query_vector is None:
+            # Query is itself a truncated vector - nothing better to compare
+            return exact
+        if vectors is None:
+            vectors = self._load_vectors(ids.tolist())
+            if vectors is None:
+                return exact
+
+        for i, media_id in enumerate(ids.tolist()):
+            vector = normalize_vector(vectors.get(media_id), self.dimension)
+            if vector is not None:
+                exact[i] = vector @ query_vector
+        return exact
+
+    def _search_ann(
+        self,
+        query,
+        limit: int,
+        offset: int,
+        candidate_ids: Optional[Sequence[int]],
+        exclude_ids: Optional[Iterable[int]]
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        Rank with the HNSW graph; returns None to fall back to the exact scan.
+
+        The graph holds the approximate (quantized or truncated) rows, so
+        with a vector_loader its best `rerank_depth` matches are rescored
+        with full vectors, as the exact scan does.
+        """
+        query_vector = self._scan_vector(query)
+        if query_vector is None:
+            return []
+
+        excluded = set(exclude_ids or ())
+        allowed = None
+        if candidate_ids is not None or excluded:
+            allowed_ids = set(candidate_ids) if candidate_ids is not None else None
+
+            def allowed(media_id: int) -> bool:
+                if media_id in excluded:
+                    return False
+                return allowed_ids is None or media_id in allowed_ids
+
+        rerank = self.approximate and self.vector_loader is not None
+        depth = max(self.rerank_depth, offset + limit) if rerank else offset + limit
+        with self._lock:
+            if self._ann is None:
+                return None
+            try:
+                ids, scores = self._ann.search(query_vector, depth, allowed)
+            except RuntimeError as e:
+                # hnswlib raises when the filter leaves fewer than k reachable items
+                logger.debug(f"HNSW search fell back to exact scan: {str(e)}")
+                return None
+
+        if rerank:
+            scores = self._rerank(query, ids, scores)
+        order = top_k(scores, offset + limit)[offset:]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def _maybe_build_ann(self) -> None:
+        """Start a background graph build once the index is large enough."""
+        if (
+            self.ann_min_items is None
+            or self._ann is not None
+            or self._ann_building
+            or self._size < self.ann_min_items
+        ):
+            return
+        self.build_ann(background=True)
+
+    def build_ann(self, background: bool = False) -> None:
+        """
+        Build the HNSW graph from the indexed vectors.
+
+        While a background build runs, searches use the exact scan and
+        inserts/removals are queued and replayed onto the new graph.
+
+        Args:
+            background: Build in a daemon thread instead of blocking
+        """
+        if not ann_available():
+            logger.warning("hnswlib not installed - approximate search disabled")
+            return
+
+        with self._lock:
+            if self._ann_building:
+                return
+            self._ann_building = True
+            self._ann_pending = []
+            generation = self._ann_generation
+            ids = self._ids[:self._size].copy()
+            matrix = np.array(self._rows(slice(0, self._size)))
+
+        def build():
+            try:
+                logger.info(f"Building HNSW index over {len(ids)} vectors")
+                graph = HNSWIndex(
+                    self.scan_dimension,
+                    m=self.ann_m,
+                    ef_construction=self.ann_ef_construction,
+                    ef_search=self.ann_ef_search,
+                    initial_capacity=len(ids)
+                )
+                graph.add(ids, matrix)
+            except Exception as e:
+                logger.error(f"HNSW index build failed: {str(e)}")
+                with self._lock:
+                    self._ann_building = False
+                    self._ann_pending = []
+                return
+
+            with self._lock:
+                if generation != self._ann_generation:
+                    # Index was cleared while building - discard the graph
+                    self._ann_building = False
+                    return
+                for op, media_id, vector in self._ann_pending:
+                    if op == "add":
+                        graph.add([media_id], vector[None, :])
+                    else:
+                        graph.remove(media_id)
+                self._ann = graph
+                self._ann_pending = []
+                self._ann_building = False
+            logger.info(f"HNSW index ready ({len(graph)} vectors)")
+            self.save_ann()
+
+        if background:
+            threading.Thread(target=build, name="hnsw-build", daemon=True).start()
+        else:
+            build()
+
+    def save_ann(self) -> None:
+        """Persist the HNSW graph to `persist_dir` (no-op if either is missing)."""
+        if self.persist_dir is None:
+            return
+        with self._lock:
+            if self._ann is None:
+                return
+            try:
+                self._ann.save(self.persist_dir)
+            except Exception as e:
+                logger.error(f"Failed to save HNSW index: {str(e)}")
+
+    def load_ann(self, stale: Optional[Callable[[List[int], float], Iterable[int]]] = None) -> bool:
+        """
+        Restore a graph saved by `save_ann`.
+
+        Args:
+            stale: Given the graph's ids and when it was saved, returns
+                the ids whose vectors were changed or deleted since. They
+                are dropped from the graph; a changed vector goes back in
+                when it is next loaded. With a check, a graph saved
+                without a timestamp is not restored.
+
+        Returns:
+            True if a graph was loaded
+        """
+        if not self.enabled or self.ann_min_items is None or self.persist_dir is None:
+            return False
+        graph = HNSWIndex.load(self.persist_dir, self.scan_dimension, ef_search=self.ann_ef_search)
+        if graph is None:
+            return False
+
+        if stale is not None:
+            if graph.saved_at is None:
+                logger.warning("Stored HNSW index has no save time - rebuilding it instead")
+                return False
+            dropped = sum(graph.remove(media_id) for media_id in stale(graph.ids(), graph.saved_at))
+            if dropped:
+                logger.info(f"Dropped {dropped} vectors changed since the HNSW index was saved")
+
+        with self._lock:
+            self._ann = graph
+        return True
+
+
+class MappedVectorIndex(VectorIndex):
+    """
+    VectorIndex whose rows live in a shared, memory-mapped SegmentStore
+    (see vector_store.py) instead of the process heap.
+
+    Every worker maps the same files, so the vectors are held once in the
+    OS page cache however many workers run. Writes append a segment that
+    the other workers pick up on their next query. Rows are always float32
+    (optionally truncated to `scan_dimension`); there is no HNSW graph.
+
+    Vectors loaded on demand for a search (`load_many`) are not written to
+    the store: request paths never append or fsync a segment. They are
+    kept in this process's heap rows (the inherited VectorIndex storage)
+    and scored alongside the store until `vector_store build` (or an
+    upsert) persists them.
+    """
+
+    def __init__(
+        self,
+        directory,
+        dimension: int = 1536,
+        enabled: bool = True,
+        rerank_depth: int = 200,
+        vector_loader: Optional[VectorLoader] = None,
+        scan_dimension: Optional[int] = None
+    ):
+        super().__init__(
+            dimension=dimension,
+            initial_capacity=0,
+            enabled=enabled,
+            rerank_depth=rerank_depth,
+            vector_loader=vector_loader,
+            scan_dimension=scan_dimension
+        )
+        self.store = SegmentStore(directory, self.scan_dimension)
+
+    def __len__(self) -> int:
+        return len(self.store) + self._size
+
+    def __contains__(self, media_id: int) -> bool:
+        return media_id in self._positions or bool(self.store.view.lookup([media_id])[0] >= 0)
+
+    @property
+    def ids(self) -> np.ndarray:
+        view = self.store.view
+        return np.concatenate([view.all_ids[np.sort(view.live_rows)], super().ids])
+
+    @property
+    def matrix(self) -> np.ndarray:
+        view = self.store.view
+        return np.concatenate([view.vectors(np.sort(view.live_rows)), super().matrix])
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes mapped from the store (shared between processes) plus heap rows."""
+        return self.store.nbytes + super().nbytes
+
+    def _store(
+        self,
+        media_id: int,
+        embedding,
+        replace_ann: bool,
+        attributes: Optional[MediaAttributes] = None
+    ) -> bool:
+        return self.upsert_many([(media_id, embedding)]) == 1
+
+    def upsert_many(self, items: Iterable[Tuple[int, object]]) -> int:
+        """
+        Append several embeddings to the store as one segment.
+
+        Args:
+            items: Iterable of (media_id, embedding) pairs
+
+        Returns:
+            Number of vectors stored
+        """
+        if not self.enabled:
+            return 0
+
+        ids, vectors, invalid = [], [], []
+        # Attributes (a third item) are not stored; see `filterable`
+        for media_id, embedding, *_ in items:
+            vector = self._scan_vector(embedding)
+            if vector is None:
+                logger.warning(f"Skipping invalid embedding for media {media_id}")
+                invalid.append(media_id)
+            else:
+                ids.append(media_id)
+                vectors.append(vector)
+
+        if vectors:
+            self.store.append(ids, np.stack(vectors))
+        if invalid:
+            self.store.delete(invalid)
+        with self._lock:
+            for media_id in ids + invalid:
+                super().remove(media_id)
+        return len(ids)
+
+    def load_many(self, items: Iterable[Tuple[int, object]]) -> int:
+        """Keep vectors read back for a search in heap rows, without writing the store."""
+        stored = 0
+        with self._lock:
+            for media_id, embedding, *_ in items:
+                if super()._store(media_id, embedding, False):
+                    stored += 1
+        return stored
+
+    def remove(self, media_id: int) -> bool:
+        in_heap = super().remove(media_id)
+        if not bool(self.store.view.lookup([media_id])[0] >= 0):
+            return in_heap
+        self.store.delete([media_id])
+        return True
+
+    def clear(self) -> None:
+        """Drop every stored vector - for all processes sharing the store."""
+        self.store.truncate()
+        super().clear()
+
+    def get(self, media_id: int) -> Optional[np.ndarray]:
+        view = self.store.view
+        rows = view.lookup([media_id])
+        if rows[0] < 0:
+            return super().get(media_id)
+        return view.vectors(rows)[0]
+
+    def missing(self, media_ids: Iterable[int]) -> List[int]:
+        media_ids = list(media_ids)
+        rows = self.store.view.lookup(media_ids)
+        positions = self._positions
+        return [
+            media_id for media_id, row in zip(media_ids, rows)
+            if row < 0 and media_id not in positions
+        ]
+
+    def _score(
+        self,
+        query: np.ndarray,
+        candidate_ids: Optional[Sequence[int]],
+        filters: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if filters:
+            raise ValueError("The shared vector store does not hold filter attributes")
+        view = self.store.view
+        if candidate_ids is None:
+            rows = np.sort(view.live_rows)
+        else:
+            rows = view.lookup(candidate_ids)
+            rows = rows[rows >= 0]
+        ids, scores = view.all_ids[rows], view.score(query, rows)
+        if not self._size:
+            return ids, scores
+
+        # Heap rows another worker has since written to the store are
+        # scored from the store only
+        heap_ids, heap_scores = super()._score(query, candidate_ids)
+        unstored = view.lookup(heap_ids) < 0
+        return (
+            np.concatenate([ids, heap_ids[unstored]]),
+            np.concatenate([scores, heap_scores[unstored]])
+        )
+
+
+# Per-process index shared by all search requests (or, with
+# vector_store_dir set, one memory-mapped store shared by all workers)
+if settings.vector_store_dir and not USE_PGVECTOR:
+    if settings.vector_quantization:
+        logger.warning("vector_quantization is ignored with vector_store_dir; mapped rows stay float32")
+    vector_index = MappedVectorIndex(
+        settings.vector_store_dir,
+        dimension=settings.embedding_dimension,
+        rerank_depth=settings.quantized_rerank_depth,
+        vector_loader=load_embeddings,
+        scan_dimension=settings.coarse_embedding_dimension or None
+    )
+else:
+    vector_index = VectorIndex(
+        dimension=settings.embedding_dimension,
+        ann_min_items=settings.ann_min_items if settings.ann_enabled else None,
+        ann_m=settings.ann_m,
+        ann_ef_construction=settings.ann_ef_construction,
+        ann_ef_search=settings.ann_ef_search,
+        persist_dir=settings.vector_index_dir,
+        enabled=not USE_PGVECTOR,
+        quantize=settings.vector_quantization,
+        rerank_depth=settings.quantized_rerank_depth,
+        vector_loader=load_embeddings,
+        scan_dimension=settings.coarse_embedding_dimension or None
+    )
@@ -0,0 +1,413 @@
+"""
+Vector Store - Append-only, memory-mapped vector segments on disk.
+
+Every uvicorn worker maps the same files read-only, so the OS page cache
+holds one copy of the vectors instead of one copy per worker heap.
+
+Layout of the store directory:
+    MANIFEST.json     segment list, deletions and a generation counter
+    seg-000001.ids.npy  int64 media ids
+    seg-000001.vec.npy  float32 rows (normalized), one per id
+    LOCK              writers hold an exclusive lock on it
+
+Writers (the ingest pipeline, or the offline `build` command) append a
+new segment and then rewrite the manifest atomically. Searches never
+write: vectors they find missing stay in that worker's heap until the
+next build.
+Readers notice the manifest change on their next query and map only the
+new segments. A media id's latest entry wins; deletions are recorded in
+the manifest. Many small segments slow scans down, so the store is
+compacted offline:
+
+    python -m app.services.vector_store compact
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+MANIFEST = "MANIFEST.json"
+MANIFEST_VERSION = 1
+
+# Log a compaction hint once a store has this many segments
+COMPACT_HINT_SEGMENTS = 64
+
+
+@contextmanager
+def _exclusive_lock(path: Path):
+    """Cross-process exclusive lock on `path` (created if missing)."""
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _save_atomic(path: Path, array: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as handle:
+        np.save(handle, array)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp, path)
+
+
+class _View:
+    """
+    Immutable snapshot of the store: mapped segments plus the lookup
+    arrays of the live rows. Rows are numbered across segments in
+    manifest order.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        generation: int,
+        segments: List[Tuple[str, np.ndarray, np.ndarray]],
+        deleted: List[Tuple[int, List[np.ndarray]]]
+    ):
+        self.dimension = dimension
+        self.generation = generation
+        self.segments = segments
+        counts = [len(ids) for _, ids, _ in segments]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.all_ids = np.concatenate([ids for _, ids, _ in segments]) if segments else np.zeros(0, dtype=np.int64)
+
+        # Replay segments and deletions in manifest order; the last event
+        # for an id decides whether (and where) it is live
+        events_ids, events_rows = [], []
+        deletions = dict(deleted)
+        for position, (_, ids, _) in enumerate(segments):
+            for deleted_ids in deletions.get(position, []):
+                events_ids.append(deleted_ids)
+                events_rows.append(np.full(len(deleted_ids), -1, dtype=np.int64))
+            events_ids.append(ids)
+            events_rows.append(np.arange(self.offsets[position], self.offsets[position + 1]))
+        for deleted_ids in deletions.get(len(segments), []):
+            events_ids.append(deleted_ids)
+            events_rows.append(np.full(len(deleted_ids), -1, dtype=np.int64))
+
+        if events_ids:
+            ids = np.concatenate(events_ids)[::-1]
+            rows = np.concatenate(events_rows)[::-1]
+            unique_ids, last = np.unique(ids, return_index=True)
+            last_rows = rows[last]
+            live = last_rows >= 0
+            self.live_ids = unique_ids[live]
+            self.live_rows = last_rows[live]
+        else:
+            self.live_ids = np.zeros(0, dtype=np.int64)
+            self.live_rows = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.live_ids)
+
+    def lookup(self, media_ids: Iterable[int]) -> np.ndarray:
+        """Row of each id, -1 where not live."""
+        wanted = np.fromiter(media_ids, dtype=np.int64)
+        if not len(self.live_ids) or not len(wanted):
+            return np.full(len(wanted), -1, dtype=np.int64)
+        slots = np.minimum(np.searchsorted(self.live_ids, wanted), len(self.live_ids) - 1)
+        return np.where(self.live_ids[slots] == wanted, self.live_rows[slots], -1)
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Copy of the vectors at `rows` (in that order)."""
+        out = np.empty((len(rows), self.dimension), dtype=np.float32)
+        for position, selection, local in self._by_segment(rows):
+            out[selection] = self.segments[position][2][local]
+        return out
+
+    def score(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Dot products of the rows with a query vector (dim,) or matrix (dim, Q)."""
+        scores = np.empty((len(rows),) + query.shape[1:], dtype=np.float32)
+        for position, selection, local in self._by_segment(rows):
+            matrix = self.segments[position][2]
+            if len(local) * 4 >= len(matrix):
+                # Most of the segment: scan it and pick, rather than gather
+                scores[selection] = np.asarray(matrix @ query)[local]
+            else:
+                scores[selection] = matrix[local] @ query
+        return scores
+
+    def _by_segment(self, rows: np.ndarray):
+        """(segment position, positions within `rows`, rows within the segment) groups."""
+        order = np.argsort(rows, kind="stable")
+        sorted_rows = rows[order]
+        bounds = np.searchsorted(sorted_rows, self.offsets)
+        for position in range(len(self.segments)):
+            start, end = bounds[position], bounds[position + 1]
+            if start < end:
+                yield position, order[start:end], sorted_rows[start:end] - self.offsets[position]
+
+
+class SegmentStore:
+    """
+    Shared on-disk vector store; see the module docstring.
+
+    Thread-safe within a process and safe for several processes reading
+    and appending to the same directory.
+    """
+
+    def __init__(self, directory, dimension: int):
+        self.directory = Path(directory).expanduser()
+        self.dimension = dimension
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._maps: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._manifest_stat: Optional[Tuple[int, int, int]] = None
+        self._view = _View(dimension, -1, [], [])
+
+        manifest = self._read_manifest()
+        if manifest["dimension"] != dimension:
+            raise ValueError(
+                f"Vector store {self.directory} holds {manifest['dimension']}-dim vectors, "
+                f"expected {dimension}; point VECTOR_STORE_DIR elsewhere or delete it"
+            )
+        self.refresh()
+
+    @property
+    def view(self) -> _View:
+        """Current snapshot, refreshed first if the manifest changed."""
+        self.refresh()
+        return self._view
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.view.segments)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of vector data mapped (shared page cache, not heap)."""
+        return sum(matrix.nbytes for _, _, matrix in self.view.segments)
+
+    def refresh(self) -> bool:
+        """
+        Pick up segments appended (or compacted) by other processes.
+
+        Cheap when nothing changed: one stat of the manifest.
+
+        Returns:
+            True if the view changed
+        """
+        stat = self._stat_manifest()
+        if stat == self._manifest_stat:
+            return False
+
+        with self._lock:
+            if stat == self._manifest_stat:
+                return False
+            for attempt in range(3):
+                manifest = self._read_manifest()
+                try:
+                    view = self._build_view(manifest)
+                    break
+                except FileNotFoundError:
+                    # Compacted away between reading the manifest and mapping
+                    if attempt == 2:
+                        raise
+            self._view = view
+            self._manifest_stat = stat
+            if len(view.segments) >= COMPACT_HINT_SEGMENTS:
+                logger.info(
+                    f"Vector store has {len(view.segments)} segments - "
+                    "run `python -m app.services.vector_store compact`"
+                )
+        return True
+
+    def append(self, media_ids: Sequence[int], vectors: np.ndarray) -> None:
+        """
+        Write a new segment.
+
+        Args:
+            media_ids: Media ids, one per row
+            vectors: Normalized float32 rows, shape (len(media_ids), dimension)
+        """
+        if not len(media_ids):
+            return
+        ids = np.asarray(media_ids, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        with self._writing() as manifest:
+            name = f"seg-{manifest['next_segment']:06d}"
+            _save_atomic(self.directory / f"{name}.ids.npy", ids)
+            _save_atomic(self.directory / f"{name}.vec.npy", vectors)
+            manifest["next_segment"] += 1
+            manifest["entries"].append({"segment": name})
+        self.refresh()
+
+    def delete(self, media_ids: Iterable[int]) -> None:
+        """Record deletions (rows stay on disk until compaction)."""
+        ids = [int(media_id) for media_id in media_ids]
+        if not ids:
+            return
+        with self._writing() as manifest:
+            manifest["entries"].append({"deleted": ids})
+        self.refresh()
+
+    def truncate(self) -> None:
+        """Drop every vector."""
+        with self._writing() as manifest:
+            old = [entry["segment"] for entry in manifest["entries"] if "segment" in entry]
+            manifest["entries"] = []
+        self._remove_segments(old)
+        self.refresh()
+
+    def compact(self) -> int:
+        """
+        Rewrite the live rows into a single segment and drop the rest.
+
+        Readers keep their old maps until they next refresh, so this is
+        safe while workers run (on POSIX, unlinked files stay readable
+        while mapped).
+
+        Returns:
+            Number of live rows written
+        """
+        with self._writing() as manifest:
+            view = self._build_view(manifest)
+            old = [entry["segment"] for entry in manifest["entries"] if "segment" in entry]
+            rows = np.sort(view.live_rows)
+            name = f"seg-{manifest['next_segment']:06d}"
+
+            vec_path = self.directory / f"{name}.vec.npy"
+            tmp = vec_path.with_name(vec_path.name + ".tmp")
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(rows), self.dimension))
+            for start in range(0, len(rows), 65536):
+                chunk = rows[start:start + 65536]
+                out[start:start + len(chunk)] = view.vectors(chunk)
+            out.flush()
+            del out
+            os.replace(tmp, vec_path)
+            _save_atomic(self.directory / f"{name}.ids.npy", view.all_ids[rows])
+
+            manifest["next_segment"] += 1
+            manifest["entries"] = [{"segment": name}]
+        self._remove_segments(old)
+        self.refresh()
+        logger.info(f"Compacted vector store to {len(rows)} rows ({len(old)} segments merged)")
+        return len(rows)
+
+    @contextmanager
+    def _writing(self):
+        """Hold the writer lock and yield the manifest, saved on exit."""
+        with self._lock, _exclusive_lock(self.directory / "LOCK"):
+            manifest = self._read_manifest()
+            yield manifest
+            manifest["generation"] += 1
+            tmp = self.directory / (MANIFEST + ".tmp")
+            tmp.write_text(json.dumps(manifest))
+            os.replace(tmp, self.directory / MANIFEST)
+
+    def _stat_manifest(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = (self.directory / MANIFEST).stat()
+        except FileNotFoundError:
+            return None
+        # os.replace gives every manifest version a new inode
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_manifest(self) -> dict:
+        path = self.directory / MANIFEST
+        if not path.exists():
+            return {
+                "version": MANIFEST_VERSION,
+                "dimension": self.dimension,
+                "generation": 0,
+                "next_segment": 1,
+                "entries": [],
+            }
+        return json.loads(path.read_text())
+
+    def _build_view(self, manifest: dict) -> _View:
+        segments = []
+        deleted: List[Tuple[int, np.ndarray]] = []
+        for entry in manifest["entries"]:
+            if "deleted" in entry:
+                # Applies after the segments listed so far
+                deleted.append((len(segments), np.asarray(entry["deleted"], dtype=np.int64)))
+                continue
+            name = entry["segment"]
+            mapped = self._maps.get(name)
+            if mapped is None:
+                mapped = (
+                    np.load(self.directory / f"{name}.ids.npy"),
+                    np.load(self.directory / f"{name}.vec.npy", mmap_mode="r"),
+                )
+            segments.append((name, mapped[0], mapped[1]))
+
+        self._maps = {name: (ids, matrix) for name, ids, matrix in segments}
+        grouped: Dict[int, List[np.ndarray]] = {}
+        for position, ids in deleted:
+            grouped.setdefault(position, []).append(ids)
+        return _View(self.dimension, manifest["generation"], segments, list(grouped.items()))
+
+    def _remove_segments(self, names: List[str]) -> None:
+        for name in names:
+            for suffix in (".ids.npy", ".vec.npy"):
+                try:
+                    (self.directory / f"{name}{suffix}").unlink()
+                except OSError as e:
+                    # Still mapped elsewhere on Windows; harmless leftover
+                    logger.debug(f"Could not remove {name}{suffix}: {str(e)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.services.vector_index import MappedVectorIndex, vector_index
+
+    parser = argparse.ArgumentParser(description="Maintain the memory-mapped vector store.")
+    parser.add_argument("command", choices=["stats", "build", "compact"],
+                        help="build: load every stored embedding; compact: merge segments")
+    args = parser.parse_args()
+
+    if not isinstance(vector_index, MappedVectorIndex):
+        parser.error("VECTOR_STORE_DIR is not set (or vector search runs in PostgreSQL)")
+    store = vector_index.store
+
+    if args.command == "build":
+        from app.database.models_media import Media
+        from app.database.models_user import User  # noqa: F401 - mapper dependency
+        from app.database.session import SessionLocal
+
+        with SessionLocal() as db:
+            rows = db.query(Media.id, Media.embedding).filter(
+                Media.embedding.isnot(None)
+            ).execution_options(yield_per=5000)
+            batch = []
+            for row in rows:
+                batch.append(tuple(row))
+                if len(batch) == 5000:
+                    vector_index.upsert_many(batch)
+                    batch = []
+            vector_index.upsert_many(batch)
+        store.compact()
+    elif args.command == "compact":
+        store.compact()
+
+    print(f"{store.directory}: {len(store)} vectors in {store.segment_count} segments, "
+          f"{store.nbytes / 2**20:.1f} MB mapped")
@@ -25,16 +25,25 @@ from loguru import logger
 from pathlib import Path
 from dotenv import load_dotenv
 
+from app.utils.http_session import PooledHTTP
+
 # Load environment variables
 env_path = Path(__file__).parent.parent.parent / ".env"
 if env_path.exists():
     load_dotenv(env_path)
 
+# Only request attributes that don't require Limited Access
+DETECT_PARAMS = {
+    "returnFaceId": "true",
+    "returnFaceLandmarks": "false",
+    "returnFaceAttributes": "smile,glasses,accessories"
+}
+
 
 class AzureFaceAPI:
     """Handles Azure Face API calls for face detection and smile analysis."""
     
-    def __init__(self):
+    def __init__(self, http: Optional[PooledHTTP] = None):
         self.api_key = os.getenv("AZURE_FACE_KEY")
         self.endpoint = os.getenv("AZURE_FACE_ENDPOINT")
         
@@ -44,6 +53,13 @@ class AzureFaceAPI:
         # Remove trailing slash from endpoint if present
         if self.endpoint and self.endpoint.endswith("/"):
             self.endpoint = self.endpoint[:-1]
+        
+        # Keep-alive connections reused across images
+        self.http = http or PooledHTTP()
+    
+    @property
+    def detect_url(self) -> str:
+        return f"{self.endpoint}/face/v1.0/detect"
     
     def detect_emotion(self, image_url: str) -> Dict:
         """
@@ -64,15 +80,6 @@ class AzureFaceAPI:
             }
         
         try:
-            detect_url = f"{self.endpoint}/face/v1.0/detect"
-            
-            # Only request attributes that don't require Limited Access
-            params = {
-                "returnFaceId": "true",
-                "returnFaceLandmarks": "false",
-                "returnFaceAttributes": "smile,glasses,accessories"
-            }
-            
             headers = {
                 "Ocp-Apim-Subscription-Key": self.api_key,
                 "Content-Type": "application/json"
@@ -83,78 +90,15 @@ class AzureFaceAPI:
             }
             
             logger.info(f"Detecting faces: {image_url}")
-            response = requests.post(
-                detect_url,
-                params=params,
+            response = self.http.post(
+                self.detect_url,
+                params=DETECT_PARAMS,
                 headers=headers,
-                json=body,
-                timeout=30
+                json=body
             )
             
             response.raise_for_status()
-            faces = response.json()
-            
-            if not faces:
-                logger.info("No faces detected in image")
-                return {
-                    "faces": [],
-                    "emotions": {},
-                    "face_count": 0
-                }
-            
-            # Process faces and derive mood from smile
-            face_details = []
-            smile_values = []
-            
-            for face in faces:
-                attributes = face.get("faceAttributes", {})
-                smile_value = attributes.get("smile", 0)
-                
-                # Derive mood from smile intensity
-                if smile_value > 0.6:
-                    mood = "happy"
-                elif smile_value > 0.3:
-                    mood = "pleasant"
-                else:
-                    mood = "neutral"
-                
-                face_info = {
-                    "smile": smile_value,
-                    "mood": mood,
-                    "glasses": attributes.get("glasses"),
-                    "accessories": attributes.get("accessories", [])
-                }
-                
-                face_details.append(face_info)
-                smile_values.append(smile_value)
-            
-            # Calculate average smile across all faces
-            avg_smile = sum(smile_values) / len(smile_values) if smile_values else 0
-            
-            # Determine overall mood
-            if avg_smile > 0.6:
-                overall_mood = "joyful"
-            elif avg_smile > 0.3:
-                overall_mood = "cheerful"
-            else:
-                overall_mood = "calm"
-            
-            # Format emotions dict to be compatible with existing code
-            emotions = {
-                "smile_intensity": avg_smile,
-                "overall_mood": overall_mood,
-                "happiness": avg_smile,  # Map smile to happiness for compatibility
-            }
-            
-            result = {
-                "faces": face_details,
-                "emotions": emotions,
-                "dominant_emotion": overall_mood,
-                "face_count": len(faces),
-            }
-            
-            logger.info(f"Successfully detected {len(faces)} face(s), mood: {overall_mood}")
-            return result
+            return self._summarize_faces(response.json())
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Azure Face API request failed: {str(e)}")
@@ -190,95 +134,19 @@ class AzureFaceAPI:
             }
         
         try:
-            detect_url = f"{self.endpoint}/face/v1.0/detect"
-            
-            # Only request attributes that don't require Limited Access
-            params = {
-                "returnFaceId": "true",
-                "returnFaceLandmarks": "false",
-                "returnFaceAttributes": "smile,glasses,accessories"
-            }
-            
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.api_key,
-                "Content-Type": "application/octet-stream"
-            }
-            
             with open(file_path, "rb") as image_file:
                 image_data = image_file.read()
             
             logger.info(f"Detecting faces in local image: {file_path}")
-            response = requests.post(
-                detect_url,
-                params=params,
-                headers=headers,
-                data=image_data,
-                timeout=30
+            response = self.http.post(
+                self.detect_url,
+                params=DETECT_PARAMS,
+                headers=self._file_headers(),
+                data=image_data
             )
             
             response.raise_for_status()
-            faces = response.json()
-            
-            if not faces:
-                return {
-                    "faces": [],
-                    "emotions": {},
-                    "face_count": 0
-                }
-            
-            # Process faces and derive mood from smile
-            face_details = []
-            smile_values = []
-            
-            for face in faces:
-                attributes = face.get("faceAttributes", {})
-                smile_value = attributes.get("smile", 0)
-                
-                # Derive mood from smile intensity
-                if smile_value > 0.6:
-                    mood = "happy"
-                elif smile_value > 0.3:
-                    mood = "pleasant"
-                else:
-                    mood = "neutral"
-                
-                face_info = {
-                    "smile": smile_value,
-                    "mood": mood,
-                    "glasses": attributes.get("glasses"),
-                    "accessories": attributes.get("accessories", [])
-                }
-                
-                face_details.append(face_info)
-                smile_values.append(smile_value)
-            
-            # Calculate average smile across all faces
-            avg_smile = sum(smile_values) / len(smile_values) if smile_values else 0
-            
-            # Determine overall mood
-            if avg_smile > 0.6:
-                overall_mood = "joyful"
-            elif avg_smile > 0.3:
-                overall_mood = "cheerful"
-            else:
-                overall_mood = "calm"
-            
-            # Format emotions dict to be compatible with existing code
-            emotions = {
-                "smile_intensity": avg_smile,
-                "overall_mood": overall_mood,
-                "happiness": avg_smile,  # Map smile to happiness for compatibility
-            }
-            
-            result = {
-                "faces": face_details,
-                "emotions": emotions,
-                "dominant_emotion": overall_mood,
-                "face_count": len(faces),
-            }
-            
-            logger.info(f"Successfully detected {len(faces)} face(s), mood: {overall_mood}")
-            return result
+            return self._summarize_faces(response.json())
             
         except Exception as e:
             logger.error(f"Error detecting faces in file: {str(e)}")
@@ -287,6 +155,76 @@ class AzureFaceAPI:
                 "emotions": {},
                 "error": f"Error: {str(e)}"
             }
+    
+    def _file_headers(self) -> Dict[str, str]:
+        return {
+            "Ocp-Apim-Subscription-Key": self.api_key,
+            "Content-Type": "application/octet-stream"
+        }
+    
+    @staticmethod
+    def _summarize_faces(faces: List[Dict]) -> Dict:
+        """Per-face moods and the overall mood derived from smile intensity."""
+        if not faces:
+            return {
+                "faces": [],
+                "emotions": {},
+                "face_count": 0
+            }
+        
+        # Process faces and derive mood from smile
+        face_details = []
+        smile_values = []
+        
+        for face in faces:
+            attributes = face.get("faceAttributes", {})
+            smile_value = attributes.get("smile", 0)
+            
+            # Derive mood from smile intensity
+            if smile_value > 0.6:
+                mood = "happy"
+            elif smile_value > 0.3:
+                mood = "pleasant"
+            else:
+                mood = "neutral"
+            
+            face_info = {
+                "smile": smile_value,
+                "mood": mood,
+                "glasses": attributes.get("glasses"),
+                "accessories": attributes.get("accessories", [])
+            }
+            
+            face_details.append(face_info)
+            smile_values.append(smile_value)
+        
+        # Calculate average smile across all faces
+        avg_smile = sum(smile_values) / len(smile_values) if smile_values else 0
+        
+        # Determine overall mood
+        if avg_smile > 0.6:
+            overall_mood = "joyful"
+        elif avg_smile > 0.3:
+            overall_mood = "cheerful"
+        else:
+            overall_mood = "calm"
+        
+        # Format emotions dict to be compatible with existing code
+        emotions = {
+            "smile_intensity": avg_smile,
+            "overall_mood": overall_mood,
+            "happiness": avg_smile,  # Map smile to happiness for compatibility
+        }
+        
+        result = {
+            "faces": face_details,
+            "emotions": emotions,
+            "dominant_emotion": overall_mood,
+            "face_count": len(faces),
+        }
+        
+        logger.info(f"Successfully detected {len(faces)} face(s), mood: {overall_mood}")
+        return result
 
 
 # Singleton instance
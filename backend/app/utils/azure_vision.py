@@ -8,11 +8,20 @@ import requests
 from typing import Dict, List, Optional
 from loguru import logger
 
+from app.utils.http_session import PooledHTTP
+
+# Visual features requested for every image
+ANALYZE_PARAMS = {
+    "visualFeatures": "Tags,Description,Categories,Color,Objects",
+    "details": "Landmarks",
+    "language": "en"
+}
+
 
 class AzureVisionAPI:
     """Handles Azure Computer Vision API calls for image analysis."""
     
-    def __init__(self):
+    def __init__(self, http: Optional[PooledHTTP] = None):
         self.api_key = os.getenv("AZURE_VISION_KEY")
         self.endpoint = os.getenv("AZURE_VISION_ENDPOINT")
         
@@ -22,6 +31,13 @@ class AzureVisionAPI:
         # Remove trailing slash from endpoint if present
         if self.endpoint and self.endpoint.endswith("/"):
             self.endpoint = self.endpoint[:-1]
+        
+        # Keep-alive connections reused across images
+        self.http = http or PooledHTTP()
+    
+    @property
+    def analyze_url(self) -> str:
+        return f"{self.endpoint}/vision/v3.2/analyze"
     
     def analyze_image(self, image_url: str) -> Dict:
         """
@@ -42,16 +58,6 @@ class AzureVisionAPI:
             }
         
         try:
-            # Build the analyze endpoint
-            analyze_url = f"{self.endpoint}/vision/v3.2/analyze"
-            
-            # Define visual features to extract
-            params = {
-                "visualFeatures": "Tags,Description,Categories,Color,Objects",
-                "details": "Landmarks",
-                "language": "en"
-            }
-            
             headers = {
                 "Ocp-Apim-Subscription-Key": self.api_key,
                 "Content-Type": "application/json"
@@ -62,45 +68,15 @@ class AzureVisionAPI:
             }
             
             logger.info(f"Analyzing image with Azure Vision: {image_url}")
-            response = requests.post(
-                analyze_url,
-                params=params,
+            response = self.http.post(
+                self.analyze_url,
+                params=ANALYZE_PARAMS,
                 headers=headers,
-                json=body,
-                timeout=30
+                json=body
             )
             
             response.raise_for_status()
-            data = response.json()
-            
-            # Extract tags
-            tags = [tag["name"] for tag in data.get("tags", [])]
-            
-            # Extract description
-            descriptions = data.get("description", {}).get("captions", [])
-            description = descriptions[0]["text"] if descriptions else None
-            
-            # Extract categories
-            categories = [cat["name"] for cat in data.get("categories", [])]
-            
-            # Extract color info
-            color_info = data.get("color", {})
-            dominant_colors = color_info.get("dominantColors", [])
-            
-            # Extract objects
-            objects = [obj["object"] for obj in data.get("objects", [])]
-            
-            result = {
-                "tags": tags[:10],  # Top 10 tags
-                "description": description,
-                "categories": categories,
-                "dominant_colors": dominant_colors,
-                "objects": objects,
-                "raw_response": data
-            }
-            
-            logger.info(f"Successfully analyzed image: {len(tags)} tags found")
-            return result
+            return self._parse_analysis(response.json())
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Azure Vision API request failed: {str(e)}")
@@ -136,54 +112,19 @@ class AzureVisionAPI:
             }
         
         try:
-            analyze_url = f"{self.endpoint}/vision/v3.2/analyze"
-            
-            params = {
-                "visualFeatures": "Tags,Description,Categories,Color,Objects",
-                "details": "Landmarks",
-                "language": "en"
-            }
-            
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.api_key,
-                "Content-Type": "application/octet-stream"
-            }
-            
             with open(file_path, "rb") as image_file:
                 image_data = image_file.read()
             
             logger.info(f"Analyzing local image with Azure Vision: {file_path}")
-            response = requests.post(
-                analyze_url,
-                params=params,
-                headers=headers,
-                data=image_data,
-                timeout=30
+            response = self.http.post(
+                self.analyze_url,
+                params=ANALYZE_PARAMS,
+                headers=self._file_headers(),
+                data=image_data
             )
             
             response.raise_for_status()
-            data = response.json()
-            
-            # Extract same information as URL method
-            tags = [tag["name"] for tag in data.get("tags", [])]
-            descriptions = data.get("description", {}).get("captions", [])
-            description = descriptions[0]["text"] if descriptions else None
-            categories = [cat["name"] for cat in data.get("categories", [])]
-            color_info = data.get("color", {})
-            dominant_colors = color_info.get("dominantColors", [])
-            objects = [obj["object"] for obj in data.get("objects", [])]
-            
-            result = {
-                "tags": tags[:10],
-                "description": description,
-                "categories": categories,
-                "dominant_colors": dominant_colors,
-                "objects": objects,
-                "raw_response": data
-            }
-            
-            logger.info(f"Successfully analyzed image: {len(tags)} tags found")
-            return result
+            return self._parse_analysis(response.json())
             
         except Exception as e:
             logger.error(f"Error analyzing image file: {str(e)}")
@@ -192,6 +133,35 @@ class AzureVisionAPI:
                 "description": None,
                 "error": f"Error: {str(e)}"
             }
+    
+    def _file_headers(self) -> Dict[str, str]:
+        return {
+            "Ocp-Apim-Subscription-Key": self.api_key,
+            "Content-Type": "application/octet-stream"
+        }
+    
+    @staticmethod
+    def _parse_analysis(data: Dict) -> Dict:
+        """Extract tags, description, categories, colors and objects."""
+        tags = [tag["name"] for tag in data.get("tags", [])]
+        descriptions = data.get("description", {}).get("captions", [])
+        description = descriptions[0]["text"] if descriptions else None
+        categories = [cat["name"] for cat in data.get("categories", [])]
+        color_info = data.get("color", {})
+        dominant_colors = color_info.get("dominantColors", [])
+        objects = [obj["object"] for obj in data.get("objects", [])]
+        
+        result = {
+            "tags": tags[:10],  # Top 10 tags
+            "description": description,
+            "categories": categories,
+            "dominant_colors": dominant_colors,
+            "objects": objects,
+            "raw_response": data
+        }
+        
+        logger.info(f"Successfully analyzed image: {len(tags)} tags found")
+        return result
 
 
 # Singleton instance
@@ -0,0 +1,142 @@
+"""
+Embedding Batcher - Combines embedding requests from concurrent callers
+into one batch API call.
+
+Each processed photo needs one document embedding. Pipeline runs in the
+same process (and reindex) submit their texts here; a dispatcher thread
+waits up to `max_wait_ms` for more to arrive, sends up to `max_batch_size`
+texts in one call and resolves each caller's future with its own vector.
+
+A failed batch is retried one text at a time, so one bad input (e.g. too
+long for the model) fails only its own request.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+Embedding = Optional[List[float]]
+
+
+class EmbeddingBatcher:
+    """Micro-batches single-text embedding requests."""
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[Embedding]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 20.0
+    ):
+        """
+        Args:
+            embed_batch: Embeds a list of texts in one call, None per failed text
+            max_batch_size: Most texts sent in one call
+            max_wait_ms: Longest a request waits for others to join its batch
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._pending: List[Tuple[str, Future]] = []
+        self._oldest = 0.0  # Arrival time of the first pending request
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+        # Round trips made and texts sent, for logs and benchmarks
+        self.calls = 0
+        self.texts = 0
+
+    def submit(self, text: str) -> "Future[Embedding]":
+        """Queue a text; the future resolves to its embedding (None on failure)."""
+        future: Future = Future()
+        with self._cond:
+            self._ensure_dispatcher()
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((text, future))
+            self._cond.notify()
+        return future
+
+    def embed(self, text: str) -> Embedding:
+        """Embedding of one text, batched with concurrent requests."""
+        return self.submit(text).result()
+
+    def embed_many(self, texts: List[str]) -> List[Embedding]:
+        """Embeddings of several texts, in order."""
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def _ensure_dispatcher(self) -> None:
+        # Threads do not survive a fork (Celery prefork): start one per process
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        if self._pid != pid:
+            self._pending = []
+        self._pid = pid
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        """Wait for a full batch or for the oldest request's deadline."""
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                remaining = self._oldest + self.max_wait - time.monotonic()
+                if len(self._pending) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            # Requests left over have waited since before this batch was sent
+            self._oldest = time.monotonic() - self.max_wait if self._pending else 0.0
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                logger.error(f"Embedding batch failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+
+    def _dispatch(self, batch: List[Tuple[str, Future]]) -> None:
+        # Identical texts (e.g. re-uploads) are embedded once
+        positions: Dict[str, List[Future]] = {}
+        for text, future in batch:
+            positions.setdefault(text, []).append(future)
+        texts = list(positions)
+
+        embeddings = self._call(texts)
+        if len(texts) > 1 and all(embedding is None for embedding in embeddings):
+            logger.warning(f"Embedding batch of {len(texts)} failed, retrying texts one by one")
+            embeddings = [self._call([text])[0] for text in texts]
+
+        for text, embedding in zip(texts, embeddings):
+            for future in positions[text]:
+                future.set_result(embedding)
+        logger.debug(f"Embedded {len(batch)} requests ({len(texts)} texts) in one call")
+
+    def _call(self, texts: List[str]) -> List[Embedding]:
+        self.calls += 1
+        self.texts += len(texts)
+        try:
+            embeddings = list(self.embed_batch(texts))
+        except Exception as e:
+            logger.error(f"Embedding call failed: {str(e)}")
+            return [None] * len(texts)
+        if len(embeddings) != len(texts):
+            logger.error(f"Embedding call returned {len(embeddings)} vectors for {len(texts)} texts")
+            return [None] * len(texts)
+        return embeddings
@@ -0,0 +1,222 @@
+"""
+Embedding Cache - Bounded LRU + TTL cache for query embeddings, with an
+optional SQLite file tier that survives restarts.
+
+Search queries repeat constantly ("beach", "family") and hybrid search and
+pagination re-embed the same string, so caching saves a network round trip
+to the embeddings API on most requests.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.database.types import pack_embedding, unpack_embedding
+
+# The file tier is trimmed (expired rows, then the oldest beyond its bound)
+# on open and once every this many writes
+DISK_TRIM_EVERY = 100
+
+
+def normalize_query_text(text: str) -> str:
+    """Cache key form of a query: case-folded with whitespace collapsed."""
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache of embeddings keyed by (model, normalized text).
+
+    Entries expire `ttl_seconds` after they were stored. When `persist_path`
+    is set, entries are also written to a SQLite file and read back on a
+    memory miss, so a restart does not start cold. The file keeps at most
+    `disk_max_entries` rows, newest first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 86400,
+        persist_path: Optional[str] = None,
+        disk_max_entries: int = 100_000
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.disk_max_entries = disk_max_entries
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+
+        if persist_path:
+            self._open_disk(persist_path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _open_disk(self, path: str):
+        try:
+            Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+            self._disk = sqlite3.connect(str(Path(path).expanduser()), check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (model, text))"
+            )
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS ix_query_embeddings_created_at "
+                "ON query_embeddings (created_at)"
+            )
+            self._disk.commit()
+            self._trim_disk(time.time())
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache file unavailable - memory only: {str(e)}")
+            self._disk = None
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """
+        Look up a cached embedding.
+
+        Args:
+            model: Embedding model name
+            text: Query text (normalized internally)
+
+        Returns:
+            Read-only float32 vector, or None on a miss
+        """
+        key = (model, normalize_query_text(text))
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, vector = entry
+                if now - created_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+            vector = self._disk_get(key, now)
+            if vector is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, embedding) -> np.ndarray:
+        """
+        Store an embedding.
+
+        Args:
+            model: Embedding model name
+            text: Query text (normalized internally)
+            embedding: Vector as a list of floats or NumPy array
+
+        Returns:
+            The cached read-only float32 vector
+        """
+        key = (model, normalize_query_text(text))
+        vector = np.array(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, vector)
+            if self._disk is not None:
+                try:
+                    self._disk.execute(
+                        "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                        (key[0], key[1], pack_embedding(vector), now)
+                    )
+                    self._disk.commit()
+                    self._disk_writes += 1
+                    if self._disk_writes % DISK_TRIM_EVERY == 0:
+                        self._trim_disk(now)
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist query embedding: {str(e)}")
+        return vector
+
+    def _trim_disk(self, now: float):
+        """Delete expired file rows, then the oldest beyond disk_max_entries."""
+        expired = self._disk.execute(
+            "DELETE FROM query_embeddings WHERE created_at <= ?", (now - self.ttl_seconds,)
+        ).rowcount
+        overflow = self._disk.execute(
+            "DELETE FROM query_embeddings WHERE rowid IN ("
+            "SELECT rowid FROM query_embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (max(0, self.disk_max_entries),)
+        ).rowcount
+        self._disk.commit()
+        if expired or overflow:
+            logger.debug(f"Trimmed query embedding cache file: {expired} expired, {overflow} over the limit")
+
+    def _remember(self, key: Tuple[str, str], created_at: float, vector: np.ndarray):
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key: Tuple[str, str], now: float) -> Optional[np.ndarray]:
+        if self._disk is None:
+            return None
+        try:
+            row = self._disk.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE model = ? AND text = ?",
+                key
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read query embedding cache: {str(e)}")
+            return None
+
+        if row is None:
+            return None
+        blob, created_at = row
+        if now - created_at >= self.ttl_seconds:
+            try:
+                self._disk.execute(
+                    "DELETE FROM query_embeddings WHERE model = ? AND text = ?", key
+                )
+                self._disk.commit()
+            except sqlite3.Error as e:
+                # Still a miss; the row is trimmed on a later write
+                logger.warning(f"Failed to expire query embedding cache entry: {str(e)}")
+            return None
+
+        vector = unpack_embedding(blob)
+        self._remember(key, created_at, vector)
+        return vector
+
+    def clear(self):
+        """Drop every entry (memory and file) and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM query_embeddings")
+                self._disk.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
@@ -4,11 +4,17 @@ for semantic search capabilities.
 """
 
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional
 from loguru import logger
+import numpy as np
 import openai
 from dotenv import load_dotenv
 
+from app.core.config import settings
+from app.database.types import truncate_embedding
+from app.utils.embedding_batcher import EmbeddingBatcher
+from app.utils.embedding_cache import EmbeddingCache, normalize_query_text
+
 # Load environment variables
 load_dotenv()
 
@@ -27,6 +33,23 @@ class EmbeddingService:
         # Dimension: 1536 (default for text-embedding-3-small)
         self.model = "text-embedding-3-small"
         self.dimension = 1536
+        # Short prefix stored alongside for the first search pass (0 = off)
+        self.coarse_dimension = settings.coarse_embedding_dimension
+        
+        # Search queries repeat a lot - cache their embeddings
+        self.query_cache = EmbeddingCache(
+            max_entries=settings.embedding_cache_size,
+            ttl_seconds=settings.embedding_cache_ttl_seconds,
+            persist_path=settings.embedding_cache_path or None,
+            disk_max_entries=settings.embedding_cache_disk_entries
+        )
+        
+        # Document embeddings requested around the same time share one API call
+        self.batcher = EmbeddingBatcher(
+            lambda texts: self.generate_embeddings_batch(texts),
+            max_batch_size=settings.embedding_batch_size,
+            max_wait_ms=settings.embedding_batch_wait_ms
+        )
     
     def generate_embedding(self, text: str) -> Optional[List[float]]:
         """
@@ -64,6 +87,122 @@ class EmbeddingService:
             logger.error(f"Failed to generate embedding: {str(e)}")
             return None
     
+    def embed_document(self, text: str) -> Optional[List[float]]:
+        """
+        Embedding for a media item's search text, batched with concurrent
+        requests (see EmbeddingBatcher).
+        
+        Args:
+            text: Search text of the item
+            
+        Returns:
+            Embedding vector, or None if generation fails
+        """
+        if not text or not text.strip():
+            logger.warning("Empty text provided for embedding")
+            return None
+        if self.batcher.max_batch_size == 1:
+            return self.generate_embedding(text)
+        return self.batcher.embed(text.strip())
+    
+    def embed_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embeddings for several search texts, sent in batches of
+        settings.embedding_batch_size together with concurrent requests.
+        
+        Args:
+            texts: Search texts
+            
+        Returns:
+            Embedding vector per text (None where empty or failed)
+        """
+        if self.batcher.max_batch_size == 1:
+            return [self.generate_embedding(text) if text and text.strip() else None for text in texts]
+        futures = [
+            self.batcher.submit(text.strip()) if text and text.strip() else None
+            for text in texts
+        ]
+        return [future.result() if future is not None else None for future in futures]
+    
+    def embed_query(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embedding for a search query, served from the query cache when
+        possible.
+        
+        Args:
+            text: Search query
+            
+        Returns:
+            Read-only float32 vector, or None if generation fails
+        """
+        if not text or not text.strip():
+            logger.warning("Empty text provided for embedding")
+            return None
+        
+        cached = self.query_cache.get(self.model, text)
+        if cached is not None:
+            logger.debug("Query embedding cache hit")
+            return cached
+        
+        embedding = self.generate_embedding(text)
+        if embedding is None:
+            return None
+        return self.query_cache.put(self.model, text, embedding)
+    
+    def embed_queries(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Embeddings for several search queries; cache misses are embedded
+        together in one API call.
+        
+        Args:
+            texts: Search queries
+            
+        Returns:
+            Read-only float32 vector per query (None where empty or failed)
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        # Normalized text -> positions, so repeated queries are embedded once
+        missing: Dict[str, List[int]] = {}
+        
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            cached = self.query_cache.get(self.model, text)
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.setdefault(normalize_query_text(text), []).append(i)
+        
+        if not missing:
+            return results
+        
+        pending = [texts[positions[0]] for positions in missing.values()]
+        embeddings = self.generate_embeddings_batch(pending)
+        for text, positions, embedding in zip(pending, missing.values(), embeddings):
+            if embedding is None:
+                continue
+            vector = self.query_cache.put(self.model, text, embedding)
+            for i in positions:
+                results[i] = vector
+        
+        logger.debug(f"Embedded {len(pending)} of {len(texts)} queries in one batch")
+        return results
+    
+    def coarse_embedding(self, embedding) -> Optional[np.ndarray]:
+        """
+        Short vector for the first search pass, derived from a full
+        embedding without another API call.
+        
+        Args:
+            embedding: Full embedding vector
+            
+        Returns:
+            Truncated, renormalized vector, or None if disabled
+        """
+        if not self.coarse_dimension or embedding is None:
+            return None
+        return truncate_embedding(embedding, self.coarse_dimension)
+    
     def generate_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
         """
         Generate embeddings for multiple texts in a single API call.
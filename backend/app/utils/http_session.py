@@ -0,0 +1,78 @@
+"""
+Pooled HTTP sessions for the Azure API clients.
+
+Each client owns one PooledHTTP wrapping a requests.Session that keeps
+connections alive, so consecutive images reuse an open TCP+TLS
+connection instead of paying a new handshake per call.
+"""
+
+import os
+import threading
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+
+
+class PooledHTTP:
+    """Keep-alive connection pool for one API client."""
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            pool_size: Connections kept open per host (default: settings.azure_http_pool_size)
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait for a response
+        """
+        self.pool_size = max(1, pool_size or settings.azure_http_pool_size)
+        self.connect_timeout = connect_timeout or settings.azure_http_connect_timeout
+        self.read_timeout = read_timeout or settings.azure_http_read_timeout
+
+        self._session: Optional[requests.Session] = None
+        self._session_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeout for requests."""
+        return (self.connect_timeout, self.read_timeout)
+
+    @property
+    def session(self) -> requests.Session:
+        """The process's pooled session, created on first use."""
+        # A forked worker (Celery prefork) must not share its parent's sockets
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    self._session = self._new_session()
+                    self._session_pid = pid
+        return self._session
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST through the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(url, **kwargs)
+
+    def close(self) -> None:
+        """Close the session's connections."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        # No retries: callers fall back on errors rather than waiting longer
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Connection"] = "keep-alive"
+        return session
@@ -20,12 +20,15 @@ class OpenAICaptionGenerator:
             self.client = OpenAI(api_key=self.api_key)
         else:
             logger.warning("OpenAI API key not configured")
+        
+        self.model = "gpt-4"
     
     def generate_caption(
         self, 
         tags: List[str], 
         emotions: Dict[str, float],
-        description: Optional[str] = None
+        description: Optional[str] = None,
+        strict: bool = False
     ) -> str:
         """
         Generate a natural language caption using GPT-4.
@@ -34,12 +37,15 @@ class OpenAICaptionGenerator:
             tags: List of image tags from Azure Vision
             emotions: Dictionary of emotions from Azure Face
             description: Optional description from Azure Vision
+            strict: Raise on errors instead of returning a fallback caption
             
         Returns:
             Generated caption string
         """
         if not self.client:
             logger.error("OpenAI API not configured")
+            if strict:
+                raise RuntimeError("OpenAI API not configured")
             return "Unable to generate caption: API not configured"
         
         try:
@@ -74,7 +80,7 @@ class OpenAICaptionGenerator:
             logger.info("Generating caption with OpenAI GPT-4")
             
             response = self.client.chat.completions.create(
-                model="gpt-4",
+                model=self.model,
                 messages=[
                     {
                         "role": "system",
@@ -97,14 +103,27 @@ class OpenAICaptionGenerator:
             
         except Exception as e:
             logger.error(f"Error generating caption with OpenAI: {str(e)}")
+            if strict:
+                raise
+            return self.fallback_caption(tags, description)
+    
+    def fallback_caption(self, tags: List[str], description: Optional[str] = None) -> str:
+        """
+        Basic caption from tags or the Vision description, without an API call.
+        
+        Args:
+            tags: List of image tags
+            description: Optional description from Azure Vision
             
-            # Fallback: create basic caption from tags
-            if tags:
-                return f"A photo featuring {', '.join(tags[:3])}."
-            elif description:
-                return description
-            else:
-                return "A memorable moment."
+        Returns:
+            Caption string
+        """
+        if tags:
+            return f"A photo featuring {', '.join(tags[:3])}."
+        elif description:
+            return description
+        else:
+            return "A memorable moment."
     
     def generate_caption_simple(self, tags: List[str]) -> str:
         """
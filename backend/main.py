@@ -5,6 +5,10 @@ from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import os
 from app.database.init_database import init_db
+from app.database.session import SessionLocal
+from app.services.neighbor_graph import neighbor_graph
+from app.services.search_service import SearchService
+from app.services.vector_index import vector_index
 from app.api.routes.health import router as health_router
 from app.api.routes.uploads import router as uploads_router
 from app.api.routes.users import router as users_router
@@ -24,6 +28,21 @@ app = FastAPI(
 def ensure_schema() -> None:
     # Create tables if this is the first run; safe to call repeatedly.
     init_db()
+    # Restore the approximate-search graph saved by the previous run, if any,
+    # minus media edited or deleted while the server was down.
+    db = SessionLocal()
+    try:
+        vector_index.load_ann(stale=SearchService(db).changed_since)
+    finally:
+        db.close()
+    # Keep "more like this" lists fresh in the background.
+    neighbor_graph.start_sweeper()
+
+
+@app.on_event("shutdown")
+def persist_search_index() -> None:
+    vector_index.save_ann()
+    neighbor_graph.stop_sweeper()
 
 # CORS configuration - Production ready
 FRONTEND_ORIGINS = [
@@ -0,0 +1,94 @@
+"""
+Benchmark: HNSW approximate search vs. exact scan
+
+Builds an HNSW graph over a synthetic clustered corpus (photo captions
+embed into topical clusters, so uniform random vectors would be an
+unrealistically hard case) and reports recall@k and per-query latency
+against the exact VectorIndex scan for several ef values.
+
+Usage (from backend/):
+    python tests/bench_ann_index.py
+    python tests/bench_ann_index.py --rows 100000 --m 16 --ef 16 32 64 128 256
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.ann_index import HNSWIndex, ann_available  # noqa: E402
+from app.services.vector_index import VectorIndex  # noqa: E402
+
+DIMENSION = 1536
+
+
+def clustered_corpus(rng, rows, clusters, spread):
+    """Unit vectors scattered around `clusters` random centroids."""
+    centroids = rng.standard_normal((clusters, DIMENSION)).astype(np.float32)
+    assignment = rng.integers(0, clusters, rows)
+    vectors = centroids[assignment] + spread * rng.standard_normal((rows, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", type=int, nargs="+", default=[20, 40, 80, 160, 320])
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not ann_available():
+        print("hnswlib is not installed - pip install hnswlib")
+        return
+
+    rng = np.random.default_rng(args.seed)
+    corpus = clustered_corpus(rng, args.rows + args.queries, args.clusters, args.spread)
+    vectors, queries = corpus[:args.rows], corpus[args.rows:]
+    ids = np.arange(1, args.rows + 1)
+
+    exact = VectorIndex(dimension=DIMENSION, initial_capacity=args.rows)
+    exact.upsert_many(zip(ids.tolist(), vectors))
+
+    start = time.perf_counter()
+    graph = HNSWIndex(
+        DIMENSION, m=args.m, ef_construction=args.ef_construction, initial_capacity=args.rows
+    )
+    graph.add(ids, vectors)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    truth = [
+        {media_id for media_id, _ in exact.search(q, limit=args.k)}
+        for q in queries
+    ]
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+
+    print(f"{args.rows} rows x {DIMENSION} dims, M={args.m}, "
+          f"ef_construction={args.ef_construction}, build {build_seconds:.1f}s")
+    print(f"{'method':>12} | {f'recall@{args.k}':>10} | {'ms/query':>9} | {'speedup':>8}")
+    print("-" * 50)
+    print(f"{'exact scan':>12} | {1.0:>10.3f} | {exact_ms:>9.2f} | {1.0:>7.1f}x")
+
+    for ef in args.ef:
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            found, _ = graph.search(q, args.k, ef=ef)
+            hits += len(expected.intersection(found.tolist()))
+        ann_ms = (time.perf_counter() - start) / args.queries * 1000
+        recall = hits / (args.k * args.queries)
+        print(f"{f'hnsw ef={ef}':>12} | {recall:>10.3f} | {ann_ms:>9.2f} | {exact_ms / ann_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
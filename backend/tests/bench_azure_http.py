@@ -0,0 +1,189 @@
+"""
+Benchmark: per-call HTTP overhead of the Azure clients, fresh connection
+per call vs. pooled keep-alive sessions
+
+Runs a local stub of the Vision analyze endpoint (optionally over TLS with
+a throwaway self-signed certificate) and times posting the same image:
+
+    requests.post    a new TCP (+TLS) connection per call - the old client
+    pooled session   AzureVisionAPI on its keep-alive requests.Session
+
+The stub answers immediately, so the times are almost entirely connection
+and request overhead. Reports latency and connections the server accepted.
+
+Usage (from backend/):
+    python tests/bench_azure_http.py
+    python tests/bench_azure_http.py --tls --calls 500
+"""
+
+import argparse
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import requests
+from loguru import logger
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.azure_vision import ANALYZE_PARAMS, AzureVisionAPI  # noqa: E402
+from app.utils.http_session import PooledHTTP  # noqa: E402
+
+RESPONSE = json.dumps({
+    "tags": [{"name": "beach", "confidence": 0.99}, {"name": "sky", "confidence": 0.95}],
+    "description": {"captions": [{"text": "a sandy beach", "confidence": 0.9}]},
+    "categories": [{"name": "outdoor_"}],
+    "color": {"dominantColors": ["Blue"]},
+    "objects": [],
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY a
+    # kept-alive connection waits on delayed ACKs (~40 ms per call)
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def self_signed_cert(directory):
+    """Write a certificate for 127.0.0.1; returns (certfile, keyfile)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName(
+            [x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    certfile, keyfile = Path(directory) / "cert.pem", Path(directory) / "key.pem"
+    certfile.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    keyfile.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ))
+    return str(certfile), str(keyfile)
+
+
+def start_server(certs=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.lock = threading.Lock()
+    scheme = "http"
+    if certs:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certs)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def summarize(samples):
+    samples = np.asarray(samples) * 1000
+    return np.median(samples), np.percentile(samples, 95)
+
+
+def report(name, server, samples, elapsed, calls):
+    median, p95 = summarize(samples)
+    print(f"{name:>16} | {median:>8.3f} ms | p95 {p95:>8.3f} ms | "
+          f"{calls / elapsed:>8.0f} calls/s | {server.connections:>5} connections")
+    server.connections = 0
+
+
+def bench_fresh_connections(server, url, image, calls):
+    headers = {"Ocp-Apim-Subscription-Key": "key", "Content-Type": "application/octet-stream"}
+    samples = []
+    start = time.perf_counter()
+    for _ in range(calls):
+        begin = time.perf_counter()
+        response = requests.post(url, params=ANALYZE_PARAMS, headers=headers, data=image, timeout=30)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - begin)
+    report("requests.post", server, samples, time.perf_counter() - start, calls)
+
+
+def bench_pooled(server, vision, image_path, calls):
+    samples = []
+    start = time.perf_counter()
+    for _ in range(calls):
+        begin = time.perf_counter()
+        assert "error" not in vision.analyze_image_from_file(image_path)
+        samples.append(time.perf_counter() - begin)
+    report("pooled session", server, samples, time.perf_counter() - start, calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--image-kb", type=int, default=200, help="size of the posted image")
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a self-signed certificate")
+    args = parser.parse_args()
+    # Per-call info logs would dominate the timings
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        certs = None
+        if args.tls:
+            certs = self_signed_cert(tmp)
+            os.environ["REQUESTS_CA_BUNDLE"] = certs[0]
+        server, endpoint = start_server(certs)
+
+        image_path = Path(tmp) / "photo.jpg"
+        image_path.write_bytes(os.urandom(args.image_kb * 1024))
+        image = image_path.read_bytes()
+
+        vision = AzureVisionAPI(http=PooledHTTP(pool_size=1))
+        vision.api_key = "key"
+        vision.endpoint = endpoint
+
+        print(f"{args.calls} calls, {args.image_kb} KB image, "
+              f"{'HTTPS' if args.tls else 'HTTP'} stub at {endpoint}")
+        print(f"{'client':>16} | {'median':>11} | {'p95':>12} | {'throughput':>15} | connections")
+        print("-" * 80)
+        bench_fresh_connections(server, vision.analyze_url, image, args.calls)
+        bench_pooled(server, vision, str(image_path), args.calls)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: one embedding API call per photo vs. micro-batched calls
+
+Simulates a bulk import: --workers pipeline runs in parallel, each
+embedding the search text of its photos, against a stub embeddings API
+with a fixed round-trip latency plus a small per-text cost. Also times a
+reindex of the whole library through embed_documents.
+
+Reports API round trips and wall-clock time for each mode.
+
+Usage (from backend/):
+    python tests/bench_embedding_batcher.py
+    python tests/bench_embedding_batcher.py --photos 2000 --workers 32 --latency-ms 300
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger  # noqa: E402
+
+from app.utils.embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+
+class StubEmbeddingsAPI:
+    """Sleeps like a remote call; counts round trips."""
+
+    def __init__(self, latency_ms, per_text_ms, dimension):
+        self.latency = latency_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dimension = dimension
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def embed_batch(self, texts):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency + self.per_text * len(texts))
+        return [[float(len(text))] * self.dimension for text in texts]
+
+    def embed_one(self, text):
+        return self.embed_batch([text])[0]
+
+
+def photo_texts(count):
+    return [f"Caption of photo {i} | Tags: beach, family, sunset {i % 7}" for i in range(count)]
+
+
+def run_import(embed, texts, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(embed, texts))
+    assert all(result is not None for result in results)
+    return time.perf_counter() - start
+
+
+def report(name, api, elapsed, photos):
+    print(f"{name:>28} | {api.calls:>6} calls | {elapsed:>7.2f} s | "
+          f"{photos / elapsed:>7.1f} photos/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--photos", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=16, help="concurrent pipeline runs")
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="API round-trip time")
+    parser.add_argument("--per-text-ms", type=float, default=0.5, help="extra API time per text")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--wait-ms", type=float, default=20.0)
+    parser.add_argument("--dimension", type=int, default=8)
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    texts = photo_texts(args.photos)
+    print(f"{args.photos} photos, {args.workers} concurrent pipeline runs, "
+          f"{args.latency_ms:.0f} ms API latency")
+    print(f"{'mode':>28} | {'round trips':>12} | {'wall':>9} | throughput")
+    print("-" * 72)
+
+    api = StubEmbeddingsAPI(args.latency_ms, args.per_text_ms, args.dimension)
+    report("import, one call per photo", api, run_import(api.embed_one, texts, args.workers), args.photos)
+
+    api = StubEmbeddingsAPI(args.latency_ms, args.per_text_ms, args.dimension)
+    batcher = EmbeddingBatcher(api.embed_batch, args.batch_size, args.wait_ms)
+    report("import, micro-batched", api, run_import(batcher.embed, texts, args.workers), args.photos)
+
+    api = StubEmbeddingsAPI(args.latency_ms, args.per_text_ms, args.dimension)
+    start = time.perf_counter()
+    for text in texts:
+        api.embed_one(text)
+    report("reindex, one call per photo", api, time.perf_counter() - start, args.photos)
+
+    api = StubEmbeddingsAPI(args.latency_ms, args.per_text_ms, args.dimension)
+    batcher = EmbeddingBatcher(api.embed_batch, args.batch_size, args.wait_ms)
+    start = time.perf_counter()
+    batcher.embed_many(texts)
+    report("reindex, micro-batched", api, time.perf_counter() - start, args.photos)
+
+
+if __name__ == "__main__":
+    main()
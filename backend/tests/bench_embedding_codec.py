@@ -0,0 +1,84 @@
+"""
+Benchmark: JSON text vs. binary float32 embedding storage
+
+Reports the per-row and on-disk SQLite size of both formats and the time
+to deserialize every row of a library, mirroring what a search pays when
+it loads embeddings from the media table.
+
+Usage (from backend/):
+    python tests/bench_embedding_codec.py
+    python tests/bench_embedding_codec.py --rows 10000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database.types import pack_embedding, unpack_embedding  # noqa: E402
+
+DIMENSION = 1536
+
+
+def build_db(path, payloads):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE media (id INTEGER PRIMARY KEY, embedding)")
+    conn.executemany("INSERT INTO media (id, embedding) VALUES (?, ?)", enumerate(payloads, 1))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    return os.path.getsize(path)
+
+
+def time_load(path, decode):
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    for (raw,) in conn.execute("SELECT embedding FROM media"):
+        decode(raw)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.rows, DIMENSION)).astype(np.float32)
+    # OpenAI returns Python floats, which json.dumps writes at full repr precision
+    json_payloads = [json.dumps([float(x) for x in v]) for v in vectors]
+    blob_payloads = [pack_embedding(v) for v in vectors]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_db = build_db(os.path.join(tmp, "json.db"), json_payloads)
+        blob_db = build_db(os.path.join(tmp, "blob.db"), blob_payloads)
+        json_seconds = time_load(os.path.join(tmp, "json.db"), json.loads)
+        blob_seconds = time_load(os.path.join(tmp, "blob.db"), unpack_embedding)
+
+    json_row = sum(map(len, json_payloads)) / args.rows
+    blob_row = sum(map(len, blob_payloads)) / args.rows
+
+    print(f"{args.rows} rows x {DIMENSION} dims")
+    print(f"{'':>16} | {'JSON text':>12} | {'float32 BLOB':>12} | {'ratio':>6}")
+    print("-" * 56)
+    print(f"{'bytes per row':>16} | {json_row:>12,.0f} | {blob_row:>12,.0f} | {json_row / blob_row:>5.1f}x")
+    print(f"{'database size':>16} | {json_db / 1e6:>9.1f} MB | {blob_db / 1e6:>9.1f} MB | {json_db / blob_db:>5.1f}x")
+    print(f"{'load + decode':>16} | {json_seconds * 1000:>9.0f} ms | {blob_seconds * 1000:>9.0f} ms | "
+          f"{json_seconds / blob_seconds:>5.1f}x")
+    print(f"{'per row':>16} | {json_seconds / args.rows * 1e6:>9.0f} us | "
+          f"{blob_seconds / args.rows * 1e6:>9.1f} us |")
+
+
+if __name__ == "__main__":
+    main()
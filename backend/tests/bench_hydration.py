@@ -0,0 +1,115 @@
+"""
+Benchmark: hydrating a result page with full rows vs. media card columns
+
+Loads a 100-item page of Media rows two ways - every column (the old
+behaviour, embedding and search text included) and only the media card
+columns - and renders each row as a MediaCard. Reports Python memory
+allocated per request (tracemalloc peak) and time per page.
+
+Usage (from backend/):
+    python tests/bench_hydration.py
+    python tests/bench_hydration.py --rows 20000 --page 100 --dimension 1536
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, undefer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database.init_database import Base  # noqa: E402
+from app.database.models_media import Media, ProcessingStatus, media_card_columns  # noqa: E402
+from app.database.models_user import User  # noqa: E402,F401 - mapper dependency
+from app.schemas.media import MediaCard  # noqa: E402
+
+FULL_ROWS = [undefer(Media.embedding), undefer(Media.coarse_embedding), undefer(Media.search_text)]
+
+
+def build_library(session, rows, dimension, rng):
+    caption = "A group of friends playing volleyball on a sunny beach at sunset"
+    tags = ["beach", "volleyball", "people", "sunset", "outdoor", "sand", "sky"]
+    session.bulk_insert_mappings(Media, [
+        {
+            "filename": f"IMG_{i:06d}.jpg",
+            "stored_path": f"uploads/{i}.jpg",
+            "mime_type": "image/jpeg",
+            "size_bytes": 2_000_000,
+            "status": ProcessingStatus.DONE,
+            "caption": caption,
+            "tags": tags,
+            "has_people": True,
+            "search_text": " ".join([caption] + tags) * 4,
+            "embedding": rng.standard_normal(dimension).astype(np.float32),
+        }
+        for i in range(1, rows + 1)
+    ])
+    session.commit()
+
+
+def render_page(Session, page_ids, options):
+    session = Session()
+    try:
+        media = session.query(Media).options(*options).filter(Media.id.in_(page_ids)).all()
+        return [MediaCard.from_media(m, "http://localhost:8000") for m in media]
+    finally:
+        session.close()
+
+
+def measure(Session, pages, options):
+    """Mean tracemalloc peak (KB) and ms per page."""
+    peaks = []
+    for page_ids in pages:
+        tracemalloc.start()
+        render_page(Session, page_ids, options)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    # Timed separately - tracing slows allocation down
+    start = time.perf_counter()
+    for page_ids in pages:
+        render_page(Session, page_ids, options)
+    ms = (time.perf_counter() - start) / len(pages) * 1000
+    return np.mean(peaks) / 1024, ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        build_library(session, args.rows, args.dimension, rng)
+
+    pages = [
+        rng.choice(np.arange(1, args.rows + 1), args.page, replace=False).tolist()
+        for _ in range(args.pages)
+    ]
+    render_page(Session, pages[0], FULL_ROWS)  # warm up
+
+    full_kb, full_ms = measure(Session, pages, FULL_ROWS)
+    card_kb, card_ms = measure(Session, pages, [media_card_columns()])
+
+    print(f"{args.rows} rows, {args.page}-item pages, {args.dimension}-dim embeddings")
+    print(f"{'load':>14} | {'allocated':>10} | {'ms/page':>8}")
+    print("-" * 40)
+    print(f"{'full rows':>14} | {full_kb:>7.0f} KB | {full_ms:>8.2f}")
+    print(f"{'card columns':>14} | {card_kb:>7.0f} KB | {card_ms:>8.2f}")
+    print(f"allocation drop: {1 - card_kb / full_kb:.0%}")
+
+
+if __name__ == "__main__":
+    main()
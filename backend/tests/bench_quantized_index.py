@@ -0,0 +1,89 @@
+"""
+Benchmark: int8 quantized vector index vs. float32
+
+Indexes a synthetic clustered corpus three ways - float32 (exact), int8
+codes alone, and int8 codes with the best --rerank-depth candidates
+rescored against float vectors - and reports index memory, per-query
+latency and recall@k against the exact ranking.
+
+The float vectors for rescoring come from an in-memory dict here; in the
+app they are read from the database for just those candidates.
+
+Usage (from backend/):
+    python tests/bench_quantized_index.py
+    python tests/bench_quantized_index.py --rows 200000 --rerank-depth 100 200 400
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.vector_index import VectorIndex  # noqa: E402
+
+DIMENSION = 1536
+
+
+def clustered_corpus(rng, rows, clusters, spread):
+    """Unit vectors scattered around `clusters` random centroids."""
+    centroids = rng.standard_normal((clusters, DIMENSION)).astype(np.float32)
+    assignment = rng.integers(0, clusters, rows)
+    vectors = centroids[assignment] + spread * rng.standard_normal((rows, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run(index, queries, k):
+    """Mean ms/query and the ranked id sets."""
+    start = time.perf_counter()
+    found = [{media_id for media_id, _ in index.search(q, limit=k)} for q in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--rerank-depth", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    corpus = clustered_corpus(rng, args.rows + args.queries, args.clusters, args.spread)
+    vectors, queries = corpus[:args.rows], corpus[args.rows:]
+    ids = np.arange(1, args.rows + 1)
+    stored = dict(zip(ids.tolist(), vectors))
+
+    exact = VectorIndex(dimension=DIMENSION, initial_capacity=args.rows)
+    exact.upsert_many(zip(ids.tolist(), vectors))
+    exact_ms, truth = run(exact, queries, args.k)
+
+    variants = [("int8 only", 0, None)] + [
+        (f"int8 + rerank {depth}", depth, lambda wanted: [(i, stored[i]) for i in wanted])
+        for depth in args.rerank_depth
+    ]
+
+    print(f"{args.rows} rows x {DIMENSION} dims, {args.queries} queries")
+    print(f"{'index':>20} | {'memory':>9} | {'ms/query':>9} | {f'recall@{args.k}':>10}")
+    print("-" * 58)
+    print(f"{'float32':>20} | {exact.nbytes / 2**20:>6.0f} MB | {exact_ms:>9.2f} | {1.0:>10.3f}")
+
+    for name, depth, loader in variants:
+        index = VectorIndex(
+            dimension=DIMENSION, initial_capacity=args.rows,
+            quantize=True, rerank_depth=depth, vector_loader=loader
+        )
+        index.upsert_many(zip(ids.tolist(), vectors))
+        ms, found = run(index, queries, args.k)
+        recall = sum(len(t & f) for t, f in zip(truth, found)) / (args.k * args.queries)
+        print(f"{name:>20} | {index.nbytes / 2**20:>6.0f} MB | {ms:>9.2f} | {recall:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmark suite: search latency on a seeded synthetic library
+
+Builds libraries of 1k / 10k (/ 100k) media rows - users, captions, tags,
+dates, people flags and random unit embeddings, all from one seed - and
+times the SearchService entry points on each:
+
+    semantic / semantic_unscoped / text / hybrid  under several filter sets
+    apply_filters                                 the SQL candidate query
+    recommendations / similar_ranking             stored lists vs. live scan
+
+Runs offline: query embeddings come from a deterministic stub instead of
+the OpenAI API. Results are written as JSON so two runs (e.g. before and
+after a change) can be compared case by case.
+
+Usage (from backend/):
+    python tests/bench_search_suite.py
+    python tests/bench_search_suite.py --scales 1000,10000,100000 --output before.json
+    python tests/bench_search_suite.py --output after.json --compare before.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database.init_database import Base  # noqa: E402
+from app.database.migrations import backfill_media_tags, run_migrations  # noqa: E402
+from app.database.models_media import Media, ProcessingStatus  # noqa: E402
+from app.database.models_user import User  # noqa: E402
+from app.services import search_service as search_module  # noqa: E402
+from app.services.index_shards import IndexShards  # noqa: E402
+from app.services.search_service import SearchService  # noqa: E402
+from app.services.vector_index import VectorIndex  # noqa: E402
+from app.utils.embeddings import embedding_service  # noqa: E402
+
+SUBJECTS = ["family", "friends", "kids", "dog", "cat", "couple", "grandparents", "team"]
+PLACES = ["beach", "mountain", "park", "kitchen", "city", "forest", "lake", "garden", "stadium"]
+ACTIVITIES = ["playing", "hiking", "eating dinner", "laughing", "swimming", "celebrating", "posing"]
+EXTRAS = ["at sunset", "in the snow", "on a sunny day", "at night", "during a birthday party"]
+TAGS = SUBJECTS + PLACES + [
+    "outdoor", "indoor", "people", "nature", "water", "sky", "food", "animal", "tree",
+    "sand", "snow", "sunset", "party", "cake", "grass", "building", "car", "boat",
+]
+
+QUERIES = ["beach", "sunset", "dog playing", "birthday party", "grandparents garden", "zebra"]
+
+FILTER_SETS = {
+    "none": None,
+    "people": {"has_people": True},
+    "tags": {"tags": ["beach", "dog"]},
+    "dates": {"date_from": datetime(2022, 1, 1), "date_to": datetime(2022, 12, 31)},
+    "combined": {"has_people": True, "tags": ["beach", "dog"], "date_from": datetime(2021, 1, 1)},
+}
+
+FIRST_DAY = datetime(2019, 1, 1)
+
+
+class StubEmbeddings:
+    """Deterministic unit vectors per text, standing in for the embedding API."""
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def install(self):
+        embedding_service.generate_embedding = self.vector
+        embedding_service.generate_embeddings_batch = lambda texts: [self.vector(t) for t in texts]
+        embedding_service.query_cache.clear()
+
+
+def make_rows(rng, nprng, count, owner_ids, dimension):
+    """Synthetic media rows; half belong to the first (benchmarked) user."""
+    days = (datetime(2024, 12, 31) - FIRST_DAY).days
+    for i in range(count):
+        owner_id = owner_ids[0] if i % 2 == 0 else rng.choice(owner_ids[1:])
+        subject, place = rng.choice(SUBJECTS), rng.choice(PLACES)
+        caption = (
+            f"{subject.title()} {rng.choice(ACTIVITIES)} "
+            f"at the {place} {rng.choice(EXTRAS)}."
+        )
+        tags = [subject, place] + rng.sample(TAGS, rng.randint(2, 5))
+        embedding = nprng.standard_normal(dimension).astype(np.float32)
+        yield {
+            "owner_id": owner_id,
+            "filename": f"img_{i}.jpg",
+            "stored_path": f"uploads/{owner_id}_{i}.jpg",
+            "mime_type": "image/jpeg",
+            "size_bytes": 1000,
+            "status": ProcessingStatus.DONE,
+            "caption": caption,
+            "tags": tags,
+            "has_people": subject not in ("dog", "cat"),
+            "search_text": f"{caption} | Tags: {', '.join(tags)}",
+            "embedding": embedding / np.linalg.norm(embedding),
+            "created_at": FIRST_DAY + timedelta(days=rng.randrange(days), seconds=rng.randrange(86400)),
+        }
+
+
+def build_library(db, engine, rows, users, dimension, seed):
+    """Insert users and `rows` media rows; returns the benchmarked user's id."""
+    rng = random.Random(seed)
+    nprng = np.random.default_rng(seed)
+    owners = [User(email=f"bench{i}@example.com", hashed_password="x") for i in range(users)]
+    db.add_all(owners)
+    db.commit()
+    owner_ids = [owner.id for owner in owners]
+
+    batch = []
+    for row in make_rows(rng, nprng, rows, owner_ids, dimension):
+        batch.append(row)
+        if len(batch) == 10000:
+            db.execute(insert(Media), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Media), batch)
+    db.commit()
+    # Core inserts skip the ORM hook that writes media_tags
+    backfill_media_tags(engine)
+    return owner_ids[0]
+
+
+def summarize(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "median_ms": round(float(np.median(samples)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "mean_ms": round(float(samples.mean()), 3),
+        "samples": len(samples),
+    }
+
+
+def time_case(call, inputs, runs):
+    """Warm up once per input, then time `runs` passes over all inputs."""
+    for value in inputs:
+        call(value)
+    samples = []
+    for _ in range(runs):
+        for value in inputs:
+            start = time.perf_counter()
+            call(value)
+            samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def cases(service, user_id, reference_ids):
+    """(name, filter set, callable, inputs) for every timed case."""
+    for filter_name, filters in FILTER_SETS.items():
+        yield "semantic", filter_name, lambda q, f=filters: service.semantic_search(
+            q, user_id=user_id, limit=20, filters=f), QUERIES
+        yield "semantic_unscoped", filter_name, lambda q, f=filters: service.semantic_search(
+            q, limit=20, filters=f), QUERIES
+        yield "text", filter_name, lambda q, f=filters: service.text_search(
+            q, user_id=user_id, limit=20, filters=f), QUERIES
+        yield "hybrid", filter_name, lambda q, f=filters: service.hybrid_search(
+            q, user_id=user_id, limit=20, filters=f), QUERIES
+        if filters:
+            yield "apply_filters", filter_name, lambda _, f=filters: service._candidate_ids(
+                user_id, f), [None]
+    yield "recommendations", "none", lambda media_id: service.get_recommendations(
+        media_id, user_id=user_id, limit=10), reference_ids
+    yield "similar_ranking", "none", lambda media_id: service.similar_ranking(
+        media_id, user_id, 10), reference_ids
+
+
+def run_scale(rows, args):
+    search_module.vector_index = VectorIndex(dimension=args.dimension)
+    search_module.index_shards = IndexShards(dimension=args.dimension, memory_budget=2**40)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            start = time.perf_counter()
+            user_id = build_library(db, engine, rows, args.users, args.dimension, args.seed)
+            print(f"\n{rows} rows generated in {time.perf_counter() - start:.1f}s")
+
+            reference_ids = [
+                media_id for media_id, in db.query(Media.id).filter(
+                    Media.owner_id == user_id
+                ).order_by(Media.id).limit(args.references)
+            ]
+            service = SearchService(db)
+            results = []
+            for name, filter_name, call, inputs in cases(service, user_id, reference_ids):
+                stats = time_case(call, inputs, args.runs)
+                results.append({"scale": rows, "case": name, "filters": filter_name, **stats})
+                print(f"{name:>18} {filter_name:>9} | {stats['median_ms']:>9.2f} ms | "
+                      f"p95 {stats['p95_ms']:>9.2f} ms")
+            return results
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    """Print median latency changes against a previous JSON report."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    before = {(r["scale"], r["case"], r["filters"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('revision')})")
+    print(f"{'scale':>7} {'case':>18} {'filters':>9} | {'before':>9} | {'after':>9} | {'change':>7}")
+    print("-" * 72)
+    for result in results:
+        old = before.get((result["scale"], result["case"], result["filters"]))
+        if old is None:
+            continue
+        change = result["median_ms"] / old["median_ms"] - 1 if old["median_ms"] else 0.0
+        print(f"{result['scale']:>7} {result['case']:>18} {result['filters']:>9} | "
+              f"{old['median_ms']:>6.2f} ms | {result['median_ms']:>6.2f} ms | {change:>+7.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", default="1000,10000",
+                        help="comma-separated library sizes, e.g. 1000,10000,100000")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--references", type=int, default=5,
+                        help="reference items for the recommendation cases")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare with")
+    args = parser.parse_args()
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+
+    StubEmbeddings(args.dimension).install()
+    results = []
+    for rows in (int(scale) for scale in args.scales.split(",")):
+        results.extend(run_scale(rows, args))
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: FTS5 full-text index vs. LIKE scanning in text_search
+
+Generates a synthetic library (default 100k media rows with captions,
+tags and search text), then times SearchService.text_search through the
+FTS5 index and through the legacy LIKE '%q%' scan.
+
+Usage (from backend/):
+    python tests/bench_text_search.py
+    python tests/bench_text_search.py --rows 10000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database.init_database import Base  # noqa: E402
+from app.database.migrations import run_migrations  # noqa: E402
+from app.database.models_media import Media, ProcessingStatus  # noqa: E402
+from app.database.models_user import User  # noqa: E402
+from app.services.search_service import SearchService  # noqa: E402
+
+SUBJECTS = ["family", "friends", "kids", "dog", "cat", "couple", "grandparents", "team"]
+PLACES = ["beach", "mountain", "park", "kitchen", "city", "forest", "lake", "garden", "stadium"]
+ACTIVITIES = ["playing", "hiking", "eating dinner", "laughing", "swimming", "celebrating", "posing"]
+EXTRAS = ["at sunset", "in the snow", "on a sunny day", "at night", "during a birthday party"]
+TAGS = ["outdoor", "indoor", "people", "nature", "water", "sky", "food", "animal", "tree", "sand"]
+
+QUERIES = ["beach", "sunset", "dog playing", "birthday party", "grandparents garden", "zebra"]
+
+
+def make_rows(rng, count, owner_id):
+    for i in range(count):
+        caption = (
+            f"{rng.choice(SUBJECTS).title()} {rng.choice(ACTIVITIES)} "
+            f"at the {rng.choice(PLACES)} {rng.choice(EXTRAS)}."
+        )
+        tags = rng.sample(TAGS, 4)
+        yield {
+            "owner_id": owner_id,
+            "filename": f"img_{i}.jpg",
+            "stored_path": f"uploads/{owner_id}_{i}.jpg",
+            "mime_type": "image/jpeg",
+            "size_bytes": 1000,
+            "status": ProcessingStatus.DONE,
+            "caption": caption,
+            "tags": tags,
+            "search_text": f"{caption} | Tags: {', '.join(tags)}",
+        }
+
+
+def time_queries(service, runs):
+    timings = {}
+    for query in QUERIES:
+        best = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            service.text_search(query, limit=20)
+            best = min(best, time.perf_counter() - start)
+        timings[query] = best
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        db = sessionmaker(bind=engine)()
+
+        owner = User(email="bench@example.com", hashed_password="x")
+        db.add(owner)
+        db.commit()
+
+        start = time.perf_counter()
+        rows = list(make_rows(rng, args.rows, owner.id))
+        for chunk in range(0, len(rows), 10000):
+            db.execute(insert(Media), rows[chunk:chunk + 10000])
+        db.commit()
+        print(f"Inserted {args.rows} rows (FTS triggers on) in {time.perf_counter() - start:.1f}s")
+
+        service = SearchService(db)
+        fts = time_queries(service, args.runs)
+        service.use_fts = False
+        like = time_queries(service, args.runs)
+        db.close()
+        engine.dispose()
+
+    print(f"{'query':>22} | {'LIKE scan':>10} | {'FTS5':>9} | {'speedup':>8}")
+    print("-" * 60)
+    for query in QUERIES:
+        print(
+            f"{query:>22} | {like[query] * 1000:>7.1f} ms | {fts[query] * 1000:>6.1f} ms | "
+            f"{like[query] / fts[query]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
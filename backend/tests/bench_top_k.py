@@ -0,0 +1,70 @@
+"""
+Benchmark: top-k selection vs. sorting every scored candidate
+
+Times picking the best k results out of a score array three ways: the
+old path (a dict per candidate, then list.sort), a full NumPy argsort,
+and top_k (argpartition, then sorting only the winners).
+
+Usage (from backend/):
+    python tests/bench_top_k.py
+    python tests/bench_top_k.py --candidates 1000000 --k 20 100
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.vector_index import top_k  # noqa: E402
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def dict_sort(ids, scores, k):
+    """Old path: one result dict per candidate, full sort, slice."""
+    results = [{"media_id": i, "score": s} for i, s in zip(ids.tolist(), scores.tolist())]
+    results.sort(key=lambda x: x["score"], reverse=True)
+    return results[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--candidates", type=int, default=100000)
+    parser.add_argument("--k", type=int, nargs="+", default=[20])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    ids = np.arange(1, args.candidates + 1)
+    scores = rng.uniform(-1, 1, args.candidates).astype(np.float32)
+
+    print(f"{args.candidates} candidates")
+    print(f"{'k':>6} | {'dicts + sort':>12} | {'argsort':>9} | {'top_k':>9} | {'vs argsort':>10}")
+    print("-" * 60)
+
+    for k in args.k:
+        assert np.array_equal(top_k(scores, k), np.argsort(-scores, kind="stable")[:k])
+
+        old = best_of(max(1, args.repeat // 10), lambda: dict_sort(ids, scores, k))
+        full = best_of(args.repeat, lambda: np.argsort(-scores, kind="stable")[:k])
+        partial = best_of(args.repeat, lambda: top_k(scores, k))
+        print(
+            f"{k:>6} | {old * 1000:>9.2f} ms | {full * 1000:>6.2f} ms | "
+            f"{partial * 1000:>6.2f} ms | {full / partial:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: in-memory vector index vs. the per-row cosine loop
+
+Compares the old semantic search scoring path (JSON-decode every row,
+pure-Python cosine similarity) with VectorIndex (one float32
+matrix-vector product) on random embeddings.
+
+Usage (from backend/):
+    python tests/bench_vector_index.py
+    python tests/bench_vector_index.py --sizes 1000 10000 100000 --loop-max 10000
+
+The per-row loop is very slow at 100k rows, so above --loop-max it is
+timed on a sample and extrapolated linearly (marked with "~").
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.search_service import cosine_similarity  # noqa: E402
+from app.services.vector_index import VectorIndex  # noqa: E402
+
+DIMENSION = 1536
+
+
+def time_loop(rows, query, repeat):
+    """Old path: json.loads + cosine_similarity per row, then full sort."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = []
+        for media_id, raw in rows:
+            results.append((media_id, cosine_similarity(query, json.loads(raw))))
+        results.sort(key=lambda x: x[1], reverse=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_index(index, query, candidate_ids, repeat):
+    """New path: VectorIndex.search over the same candidates."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.search(query, limit=20, candidate_ids=candidate_ids)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--loop-max", type=int, default=10000,
+                        help="Largest row count timed in full for the per-row loop")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    query = rng.standard_normal(DIMENSION).astype(np.float32).tolist()
+
+    print(f"{'rows':>8} | {'per-row loop':>14} | {'vector index':>13} | {'speedup':>8}")
+    print("-" * 54)
+
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, DIMENSION)).astype(np.float32)
+        ids = list(range(1, size + 1))
+
+        index = VectorIndex(dimension=DIMENSION, initial_capacity=size)
+        index.upsert_many(zip(ids, vectors))
+        index_seconds = time_index(index, query, ids, args.repeat)
+
+        sample = min(size, args.loop_max)
+        rows = [(ids[i], json.dumps(vectors[i].tolist())) for i in range(sample)]
+        loop_seconds = time_loop(rows, query, 1 if sample > 1000 else args.repeat)
+        estimated = sample < size
+        if estimated:
+            loop_seconds *= size / sample
+
+        loop_label = f"{'~' if estimated else ''}{loop_seconds * 1000:.1f} ms"
+        print(
+            f"{size:>8} | {loop_label:>14} | {index_seconds * 1000:>10.2f} ms | "
+            f"{loop_seconds / index_seconds:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
-import { useState, useCallback } from "react";
+import { useState, useCallback, useRef } from "react";
 import { api } from "../utils/api";
+import { useAuth } from "./useAuth";
 
 /**
  * Custom hook for search functionality with filters and pagination
  * @returns {Object} Search state and methods
  */
 export default function useSearch() {
+  const { user } = useAuth();
   const [results, setResults] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [totalResults, setTotalResults] = useState(0);
   const [searchType, setSearchType] = useState("hybrid");
+  // Cursor of the last search - the server keeps its ranked results, so
+  // other pages of the same search are served without re-ranking. A cursor
+  // sent with a different query or filters is ignored by the server.
+  const cursorRef = useRef(null);
 
   /**
    * Execute search with query and filters
@@ -35,6 +41,11 @@ export default function useSearch() {
         offset: options.offset || 0,
       });
 
+      // Search the signed-in user's own library
+      if (user?.id) {
+        params.append("user_id", user.id);
+      }
+
       // Add filters if provided
       if (options.hasPeople !== undefined && options.hasPeople !== null) {
         params.append("has_people", options.hasPeople);
@@ -48,12 +59,16 @@ export default function useSearch() {
       if (options.sortBy) {
         params.append("sort_by", options.sortBy);
       }
+      if (cursorRef.current) {
+        params.append("cursor", cursorRef.current);
+      }
 
       const response = await api.get(`/api/search?${params.toString()}`);
       
       setResults(response.data.results || []);
       setTotalResults(response.data.total_results || 0);
       setSearchType(response.data.search_type || "hybrid");
+      cursorRef.current = response.data.cursor || null;
     } catch (err) {
       console.error("Search error:", err);
       setError(err?.response?.data?.detail || "Search failed. Please try again.");
@@ -62,12 +77,13 @@ export default function useSearch() {
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [user?.id]);
 
   /**
    * Clear search results
    */
   const clearSearch = useCallback(() => {
+    cursorRef.current = null;
     setResults([]);
     setTotalResults(0);
     setError(null);
@@ -104,6 +104,10 @@ export async function searchMedia(query, options = {}) {
   if (options.userId) {
     params.append("user_id", options.userId);
   }
+  // Cursor from a previous response, to page the same search cheaply
+  if (options.cursor) {
+    params.append("cursor", options.cursor);
+  }
 
   const response = await api.get(`/api/search?${params.toString()}`);
   return response.data;
@@ -1,6 +1,20 @@
 """Pytest fixtures for backend tests."""
+import itertools
+
+import numpy as np
 import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
 from app.database.init_database import init_db
+from app.database.migrations import run_migrations
+from app.database.models_media import Media, ProcessingStatus
+from app.database.models_user import User
+from app.database.session import Base
+from app.services.index_shards import index_shards
+from app.services.vector_index import vector_index
+from app.utils.embeddings import embedding_service
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -8,3 +22,71 @@ def setup_database():
     """Initialize the database schema before running tests."""
     init_db()
     yield
+
+
+@pytest.fixture
+def db_session():
+    """Isolated in-memory SQLite session with the full schema."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    vector_index.clear()
+    index_shards.clear()
+    embedding_service.query_cache.clear()
+    try:
+        yield session
+    finally:
+        session.close()
+        vector_index.clear()
+        index_shards.clear()
+        engine.dispose()
+
+
+@pytest.fixture
+def owner(db_session):
+    """A user to own test media."""
+    user = User(email="owner@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture
+def add_media(db_session):
+    """
+    Factory for committed media rows: `add_media(owner, caption, **columns)`.
+
+    Rows are DONE unless `status` is given; any other Media column (tags,
+    embedding, has_people, ...) can be passed as a keyword.
+    """
+    paths = itertools.count()
+
+    def add(owner, caption, **columns):
+        columns.setdefault("status", ProcessingStatus.DONE)
+        media = Media(
+            owner_id=owner.id,
+            filename=f"{caption[:10]}.jpg",
+            stored_path=f"uploads/{next(paths)}_{caption}.jpg",
+            mime_type="image/jpeg",
+            size_bytes=1,
+            caption=caption,
+            **columns,
+        )
+        db_session.add(media)
+        db_session.commit()
+        return media
+    return add
+
+
+@pytest.fixture
+def unit():
+    """Scales a list of numbers to a float32 unit vector."""
+    def unit(values):
+        vec = np.asarray(values, dtype=np.float32)
+        return vec / np.linalg.norm(vec)
+    return unit
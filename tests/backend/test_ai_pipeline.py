@@ -0,0 +1,147 @@
+"""Tests for the AI pipeline: concurrent stages and the analysis cache."""
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import ai_pipeline
+from app.core.config import settings
+from app.database.models_media import AnalysisCache, Media, ProcessingStatus
+from app.services.index_shards import index_shards
+from app.services.vector_index import vector_index
+from app.utils.embeddings import embedding_service
+
+STAGE_SECONDS = 0.2
+
+
+@pytest.fixture
+def media(db_session, owner, monkeypatch):
+    monkeypatch.setattr(ai_pipeline, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    row = Media(
+        owner_id=owner.id,
+        filename="a.jpg",
+        stored_path="uploads/a.jpg",
+        mime_type="image/jpeg",
+        size_bytes=1,
+        metadata_json={"width": 10},
+        status=ProcessingStatus.PENDING,
+    )
+    db_session.add(row)
+    db_session.commit()
+    return row
+
+
+def slow(result, spans=None):
+    def stage(*args, **kwargs):
+        start = time.perf_counter()
+        time.sleep(STAGE_SECONDS)
+        if spans is not None:
+            spans.append((start, time.perf_counter()))
+        return result
+    return stage
+
+
+def test_vision_and_face_overlap(db_session, media, monkeypatch):
+    monkeypatch.setattr(settings, "azure_face_enabled", True)
+    spans = []
+    monkeypatch.setattr(ai_pipeline.azure_vision, "analyze_image_from_file",
+                        slow({"tags": ["beach", "sky"], "description": "A beach."}, spans))
+    monkeypatch.setattr(ai_pipeline.azure_face, "detect_emotion_from_file",
+                        slow({"emotions": {"happiness": 0.9}, "face_count": 1}, spans))
+    captions = []
+
+    def generate_caption(tags, emotions, description, strict=False):
+        captions.append((tags, emotions, description))
+        return "Smiles at the beach."
+    monkeypatch.setattr(ai_pipeline.openai_caption, "generate_caption", generate_caption)
+    monkeypatch.setattr(embedding_service, "generate_embeddings_batch",
+                        lambda texts: [[1.0] + [0.0] * (settings.embedding_dimension - 1) for _ in texts])
+
+    result = ai_pipeline.process_media_sync(media.id, "uploads/a.jpg")
+
+    assert result["status"] == "done"
+    assert captions == [(["beach", "sky"], {"happiness": 0.9}, "A beach.")]
+    timings = result["timings_ms"]
+    assert set(timings) == {"cache", "prepare", "vision", "face", "caption", "embedding", "total"}
+    assert timings["vision"] >= STAGE_SECONDS * 1000 and timings["face"] >= STAGE_SECONDS * 1000
+    # Each stage started before the other finished (wall-clock totals are
+    # at the mercy of GC pauses and a loaded machine)
+    (first_start, first_end), (second_start, second_end) = sorted(spans)
+    assert second_start < first_end
+
+    db_session.expire_all()
+    stored = db_session.get(Media, media.id)
+    assert stored.caption == "Smiles at the beach."
+    assert stored.has_people
+    assert stored.metadata_json == {"width": 10, "pipeline_timings_ms": timings}
+    # Shards serve scoped search; the global index loads it on demand
+    assert index_shards.enabled and media.id not in vector_index
+
+
+def test_failed_stages_fall_back(db_session, media, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("service down")
+    monkeypatch.setattr(ai_pipeline.azure_vision, "analyze_image_from_file", fail)
+    monkeypatch.setattr(ai_pipeline.openai_caption, "generate_caption", fail)
+    monkeypatch.setattr(embedding_service, "generate_embeddings_batch", lambda texts: [None] * len(texts))
+
+    result = ai_pipeline.process_media_sync(media.id, "uploads/a.jpg")
+
+    # Face is off by default, so only its note reaches the caption stage
+    assert result["status"] == "done"
+    assert result["tags"] == [] and "note" in result["emotions"]
+    assert result["caption"] == "A memorable moment."
+    assert db_session.query(AnalysisCache).count() == 0
+
+
+def add_upload(db, name, content_hash):
+    row = Media(
+        filename=f"{name}.jpg",
+        stored_path=f"uploads/{name}.jpg",
+        mime_type="image/jpeg",
+        size_bytes=1,
+        content_hash=content_hash,
+        status=ProcessingStatus.PENDING,
+    )
+    db.add(row)
+    db.commit()
+    return row.id
+
+
+def test_reupload_reuses_cached_analysis(db_session, media, monkeypatch):
+    calls = []
+
+    def record(name, result):
+        def stage(*args, **kwargs):
+            calls.append(name)
+            return result
+        return stage
+    monkeypatch.setattr(ai_pipeline.azure_vision, "analyze_image_from_file",
+                        record("vision", {"tags": ["Dog", "grass"], "description": "A dog."}))
+    monkeypatch.setattr(ai_pipeline.openai_caption, "generate_caption",
+                        record("caption", "A dog on the grass."))
+    monkeypatch.setattr(embedding_service, "generate_embeddings_batch",
+                        record("embedding", [[0.0, 1.0] + [0.0] * (settings.embedding_dimension - 2)]))
+
+    first = ai_pipeline.process_media_sync(add_upload(db_session, "first", "ab" * 32), "uploads/first.jpg")
+    assert not first["cached"] and calls == ["vision", "caption", "embedding"]
+    entry = db_session.query(AnalysisCache).one()
+    assert (entry.content_hash, entry.pipeline_version) == ("ab" * 32, ai_pipeline.pipeline_version())
+    assert entry.description == "A dog."
+
+    second_id = add_upload(db_session, "second", "ab" * 32)
+    second = ai_pipeline.process_media_sync(second_id, "uploads/second.jpg")
+    assert second["cached"] and calls == ["vision", "caption", "embedding"]
+    assert set(second["timings_ms"]) == {"cache", "total"}
+
+    db_session.expire_all()
+    stored = db_session.get(Media, second_id)
+    assert stored.status == ProcessingStatus.DONE
+    assert stored.tags == ["Dog", "grass"] and stored.caption == "A dog on the grass."
+    assert stored.embedding[1] == pytest.approx(1.0)
+    assert stored.search_text == "A dog on the grass. | Tags: Dog, grass"
+
+    # A different pipeline version analyzes the file again
+    monkeypatch.setattr(ai_pipeline, "PIPELINE_VERSION", ai_pipeline.PIPELINE_VERSION + 1)
+    third = ai_pipeline.process_media_sync(add_upload(db_session, "third", "ab" * 32), "uploads/third.jpg")
+    assert not third["cached"] and calls.count("vision") == 2
@@ -0,0 +1,74 @@
+"""Tests for the downscaled analysis copies sent to Vision and Face."""
+import pytest
+from PIL import Image
+
+from app.services import analysis_image
+from app.services.analysis_image import (
+    derivative_path,
+    prepare_analysis_image,
+    remove_analysis_images,
+)
+
+
+def save(path, size, mode="RGB", format="JPEG", orientation=None):
+    image = Image.new(mode, size, (200, 30, 30) if mode == "RGB" else None)
+    kwargs = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kwargs["exif"] = exif
+    image.save(path, format, **kwargs)
+    return str(path)
+
+
+def test_large_upload_is_downscaled_once(tmp_path, monkeypatch):
+    original = save(tmp_path / "1_big.png", (3000, 2000), mode="RGBA", format="PNG")
+
+    prepared = prepare_analysis_image(original, max_side=1024)
+    assert prepared == str(derivative_path(original, 1024))
+    with Image.open(prepared) as image:
+        assert image.format == "JPEG" and image.mode == "RGB"
+        assert image.size == (1024, 683)
+
+    # Later stages and retries reuse the file instead of decoding again
+    def fail(*args, **kwargs):
+        raise AssertionError("decoded twice")
+    monkeypatch.setattr(analysis_image.Image, "open", fail)
+    assert prepare_analysis_image(original, max_side=1024) == prepared
+
+
+def test_exif_orientation_is_applied(tmp_path):
+    # Orientation 6: stored landscape, displayed rotated 90 degrees
+    original = save(tmp_path / "1_phone.jpg", (400, 300), orientation=6)
+
+    prepared = prepare_analysis_image(original, max_side=1024)
+    assert prepared != original
+    with Image.open(prepared) as image:
+        assert image.size == (300, 400)
+        assert image.getexif().get(0x0112, 1) == 1
+
+
+def test_small_upright_jpeg_is_sent_as_is(tmp_path):
+    original = save(tmp_path / "1_small.jpg", (800, 600))
+    assert prepare_analysis_image(original, max_side=1024) == original
+    assert not derivative_path(original, 1024).exists()
+
+
+@pytest.mark.parametrize("max_side", [0, 1024])
+def test_falls_back_to_original(tmp_path, max_side):
+    original = tmp_path / "1_notes.jpg"
+    original.write_bytes(b"not an image")
+    assert prepare_analysis_image(str(original), max_side=max_side) == str(original)
+
+
+def test_remove_analysis_images(tmp_path):
+    original = save(tmp_path / "1_big.png", (2000, 2000), format="PNG")
+    other = save(tmp_path / "2_big.png", (2000, 2000), format="PNG")
+    for max_side in (512, 1024):
+        prepare_analysis_image(original, max_side=max_side)
+    kept = prepare_analysis_image(other, max_side=1024)
+
+    remove_analysis_images(original)
+    assert not derivative_path(original, 512).exists()
+    assert not derivative_path(original, 1024).exists()
+    assert Image.open(kept).size == (1024, 1024)
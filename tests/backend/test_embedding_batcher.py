@@ -0,0 +1,83 @@
+"""Tests for micro-batching of document embeddings."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.embedding_batcher import EmbeddingBatcher
+from app.utils.embeddings import EmbeddingService
+
+
+class FakeAPI:
+    """Records each call; texts starting with "bad" make the whole call fail."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        time.sleep(self.latency)
+        if any(text.startswith("bad") for text in texts):
+            return [None] * len(texts)
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_requests_share_calls():
+    api = FakeAPI(latency=0.02)
+    batcher = EmbeddingBatcher(api, max_batch_size=16, max_wait_ms=50)
+
+    texts = [f"photo {i}" for i in range(64)]
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(batcher.embed, texts))
+
+    assert results == [[float(len(text))] for text in texts]
+    assert all(len(batch) <= 16 for batch in api.batches)
+    assert len(api.batches) <= 8
+    assert sorted(text for batch in api.batches for text in batch) == sorted(texts)
+
+
+def test_lone_request_waits_at_most_max_wait():
+    api = FakeAPI()
+    batcher = EmbeddingBatcher(api, max_batch_size=16, max_wait_ms=30)
+
+    start = time.perf_counter()
+    assert batcher.embed("a dog") == [5.0]
+    assert time.perf_counter() - start < 0.5
+    assert api.batches == [["a dog"]]
+
+
+def test_failed_batch_is_retried_text_by_text():
+    api = FakeAPI()
+    batcher = EmbeddingBatcher(api, max_batch_size=8, max_wait_ms=200)
+
+    results = batcher.embed_many(["sunset", "bad input", "beach", "sunset"])
+
+    assert results == [[6.0], None, [5.0], [6.0]]
+    # Duplicates are sent once; the failed call is split into single texts
+    assert api.batches == [["sunset", "bad input", "beach"], ["sunset"], ["bad input"], ["beach"]]
+    assert (batcher.calls, batcher.texts) == (4, 6)
+
+
+def test_exceptions_resolve_to_none():
+    def broken(texts):
+        raise RuntimeError("rate limited")
+    batcher = EmbeddingBatcher(broken, max_batch_size=4, max_wait_ms=10)
+
+    assert batcher.embed_many(["a", "b"]) == [None, None]
+    # The dispatcher keeps serving later requests
+    batcher.embed_batch = FakeAPI()
+    assert batcher.embed("c") == [1.0]
+
+
+def test_batch_size_one_bypasses_the_batcher(monkeypatch):
+    service = EmbeddingService()
+    service.batcher = EmbeddingBatcher(FakeAPI(), max_batch_size=1)
+    monkeypatch.setattr(service, "generate_embedding", lambda text: [float(len(text))])
+
+    def no_batcher(*args, **kwargs):
+        raise AssertionError("expected a direct API call")
+    monkeypatch.setattr(service.batcher, "submit", no_batcher)
+
+    assert service.embed_documents(["ab", " ", "abc"]) == [[2.0], None, [3.0]]
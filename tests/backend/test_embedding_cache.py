@@ -0,0 +1,113 @@
+"""Tests for the query embedding cache."""
+import sqlite3
+
+import numpy as np
+
+from app.api.routes.health import health
+from app.utils import embedding_cache as cache_module
+from app.utils.embedding_cache import EmbeddingCache
+from app.utils.embeddings import EmbeddingService
+
+
+def test_hits_ignore_case_and_whitespace():
+    cache = EmbeddingCache(max_entries=4)
+    cache.put("model", "Beach  Sunset", [1.0, 2.0])
+
+    assert np.array_equal(cache.get("model", " beach sunset "), [1.0, 2.0])
+    assert cache.get("other-model", "beach sunset") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("model", "a", [1.0])
+    cache.put("model", "b", [2.0])
+    cache.get("model", "a")
+    cache.put("model", "c", [3.0])
+
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") is not None
+    assert len(cache) == 2
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = EmbeddingCache(ttl_seconds=60)
+    cache.put("model", "beach", [1.0])
+
+    now[0] += 59
+    assert cache.get("model", "beach") is not None
+    now[0] += 2
+    assert cache.get("model", "beach") is None
+
+
+def test_file_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    EmbeddingCache(persist_path=path).put("model", "beach", [0.5, 0.25])
+
+    restarted = EmbeddingCache(persist_path=path)
+    assert np.array_equal(restarted.get("model", "beach"), [0.5, 0.25])
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_file_tier_is_trimmed(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    monkeypatch.setattr(cache_module, "DISK_TRIM_EVERY", 5)
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(max_entries=1, ttl_seconds=60, persist_path=path, disk_max_entries=3)
+
+    cache.put("model", "old", [1.0])
+    now[0] += 61
+    for i in range(4):
+        now[0] += 1
+        cache.put("model", f"query {i}", [float(i)])
+
+    # The fifth write trimmed the expired row and the oldest live one
+    rows = [text for text, in cache._disk.execute("SELECT text FROM query_embeddings ORDER BY created_at")]
+    assert rows == ["query 1", "query 2", "query 3"]
+
+
+def test_expired_file_row_is_a_miss_even_if_delete_fails(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    path = str(tmp_path / "cache.db")
+    EmbeddingCache(ttl_seconds=60, persist_path=path).put("model", "beach", [1.0])
+
+    class ReadOnly:
+        def __init__(self, connection):
+            self.connection = connection
+
+        def execute(self, sql, *args):
+            if sql.startswith("DELETE"):
+                raise sqlite3.OperationalError("attempt to write a readonly database")
+            return self.connection.execute(sql, *args)
+
+    restarted = EmbeddingCache(ttl_seconds=60, persist_path=path)
+    restarted._disk = ReadOnly(restarted._disk)
+    now[0] += 61
+    assert restarted.get("model", "beach") is None
+
+
+def test_health_reports_cache_counters():
+    body = health()
+    assert set(body.query_embedding_cache) >= {"hits", "misses", "hit_rate"}
+
+
+def test_embed_query_calls_api_once(monkeypatch):
+    service = EmbeddingService()
+    calls = []
+
+    def fake_generate(text):
+        calls.append(text)
+        return [0.1, 0.2, 0.3]
+
+    monkeypatch.setattr(service, "generate_embedding", fake_generate)
+
+    first = service.embed_query("family picnic")
+    second = service.embed_query("Family Picnic")
+
+    assert calls == ["family picnic"]
+    assert np.array_equal(first, second)
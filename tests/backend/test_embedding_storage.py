@@ -0,0 +1,172 @@
+import json
+import os
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+
+from app.core.config import settings
+
+from app.database import migrations
+from app.database.migrations import derive_coarse_embeddings, migrate_embeddings_to_binary
+from app.database.models_media import Media, ProcessingStatus
+from app.database.session import Base, normalize_database_url
+from app.database.types import pack_embedding, pgvector_available, truncate_embedding, unpack_embedding
+
+
+def test_pack_round_trip():
+    vector = np.linspace(-1, 1, 1536, dtype=np.float32)
+    blob = pack_embedding(vector.tolist())
+
+    assert len(blob) == 8 + 1536 * 4
+    np.testing.assert_array_equal(unpack_embedding(blob), vector)
+
+
+def test_unpack_rejects_corrupt_blobs():
+    blob = pack_embedding([1.0, 2.0, 3.0])
+    with pytest.raises(ValueError):
+        unpack_embedding(blob[:-1])
+    with pytest.raises(ValueError):
+        unpack_embedding(b"XX" + blob[2:])
+
+
+def test_unpack_reads_legacy_json():
+    np.testing.assert_array_equal(unpack_embedding("[0.5, 1.5]"), [0.5, 1.5])
+
+
+def test_truncate_embedding_renormalizes_prefix():
+    short = truncate_embedding([3.0, 4.0, 12.0], 2)
+    np.testing.assert_allclose(short, [0.6, 0.8])
+    assert truncate_embedding([0.0, 0.0, 1.0], 2) is None
+    assert truncate_embedding(None, 2) is None
+
+
+def test_derive_coarse_embeddings(db_session):
+    db_session.add_all([
+        Media(
+            filename=f"{i}.jpg",
+            stored_path=f"uploads/{i}.jpg",
+            mime_type="image/jpeg",
+            size_bytes=1,
+            status=ProcessingStatus.DONE,
+            embedding=embedding,
+        )
+        for i, embedding in enumerate([[3.0, 4.0, 1.0], [1.0, 0.0, 5.0], None])
+    ])
+    db_session.commit()
+
+    engine = db_session.get_bind()
+    assert derive_coarse_embeddings(engine, dimension=2) == 2
+    assert derive_coarse_embeddings(engine, dimension=2) == 0
+    assert derive_coarse_embeddings(engine, dimension=2, force=True) == 2
+
+    db_session.expire_all()
+    rows = db_session.query(Media).order_by(Media.id).all()
+    np.testing.assert_allclose(rows[0].coarse_embedding, [0.6, 0.8], rtol=1e-6)
+    np.testing.assert_allclose(rows[1].coarse_embedding, [1.0, 0.0])
+    assert rows[2].coarse_embedding is None
+
+
+def test_backfill_converts_json_rows(db_session, monkeypatch):
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH_SIZE", 2)
+    for i in range(5):
+        db_session.add(Media(
+            filename=f"{i}.jpg",
+            stored_path=f"uploads/{i}.jpg",
+            mime_type="image/jpeg",
+            size_bytes=1,
+            status=ProcessingStatus.DONE,
+        ))
+    db_session.commit()
+    db_session.execute(
+        text("UPDATE media SET embedding = :e"),
+        {"e": json.dumps([0.25, 0.75])},
+    )
+    db_session.commit()
+
+    engine = db_session.get_bind()
+    assert migrate_embeddings_to_binary(engine) == 5
+    assert migrate_embeddings_to_binary(engine) == 0
+
+    kinds = db_session.execute(text("SELECT DISTINCT typeof(embedding) FROM media")).scalars().all()
+    assert kinds == ["blob"]
+    db_session.expire_all()
+    np.testing.assert_array_equal(db_session.query(Media).first().embedding, [0.25, 0.75])
+
+
+@pytest.mark.skipif(not pgvector_available(), reason="pgvector not installed")
+def test_postgres_uses_native_vector_and_pushdown_ordering():
+    dialect = postgresql.dialect()
+
+    ddl = str(CreateTable(Media.__table__).compile(dialect=dialect))
+    assert "embedding VECTOR(1536)" in ddl
+
+    distance = Media.embedding.cosine_distance([0.1, 0.2, 0.3])
+    sql = str(select(Media.id).order_by(distance).limit(10).compile(dialect=dialect))
+    assert "ORDER BY media.embedding <=> %(embedding_1)s" in sql
+    assert "LIMIT" in sql
+
+
+@pytest.mark.skipif(
+    not os.environ.get("TEST_POSTGRES_URL") or not pgvector_available(),
+    reason="set TEST_POSTGRES_URL to a scratch PostgreSQL database with pgvector"
+)
+def test_postgres_migrates_binary_embeddings_and_ranks_in_database():
+    schema = f"test_pgvector_{uuid.uuid4().hex[:8]}"
+    engine = create_engine(
+        normalize_database_url(os.environ["TEST_POSTGRES_URL"]),
+        connect_args={"options": f"-csearch_path={schema},public"},
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            # The column as an earlier release stored it
+            conn.execute(text("ALTER TABLE media ALTER COLUMN embedding TYPE bytea USING NULL"))
+
+        dimension = settings.embedding_dimension
+        axes = np.eye(dimension, dtype=np.float32)
+        vectors = {"beach": axes[0], "sunset beach": axes[0] + axes[1], "mountain": axes[2]}
+        session = sessionmaker(bind=engine)()
+        ids = {}
+        for caption in vectors:
+            media = Media(filename=f"{caption}.jpg", stored_path=f"uploads/{caption}.jpg",
+                          mime_type="image/jpeg", size_bytes=1, status=ProcessingStatus.DONE,
+                          caption=caption)
+            session.add(media)
+            session.flush()
+            ids[caption] = media.id
+        session.commit()
+        with engine.begin() as conn:
+            for caption, vector in vectors.items():
+                conn.execute(text("UPDATE media SET embedding = :e WHERE id = :id"),
+                             {"e": pack_embedding(vector.tolist()), "id": ids[caption]})
+
+        migrations.migrate_embeddings_to_pgvector(engine)
+
+        with engine.connect() as conn:
+            column_type = conn.execute(text(
+                "SELECT udt_name FROM information_schema.columns WHERE table_schema = :schema "
+                "AND table_name = 'media' AND column_name = 'embedding'"
+            ), {"schema": schema}).scalar()
+        assert column_type == "vector"
+
+        distance = Media.embedding.cosine_distance(axes[0].tolist())
+        ranked = session.execute(select(Media.caption).order_by(distance)).scalars().all()
+        assert ranked == ["beach", "sunset beach", "mountain"]
+        session.close()
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        engine.dispose()
+
+
+def test_normalize_database_url():
+    assert normalize_database_url("postgres://u:p@h/db") == "postgresql://u:p@h/db"
+    assert normalize_database_url("sqlite:///x.db") == "sqlite:///x.db"
@@ -0,0 +1,85 @@
+"""Tests for the pooled keep-alive sessions of the Azure clients."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.utils.azure_face import AzureFaceAPI
+from app.utils.azure_vision import AzureVisionAPI
+from app.utils.http_session import PooledHTTP
+
+VISION_RESPONSE = {
+    "tags": [{"name": "beach"}, {"name": "sky"}],
+    "description": {"captions": [{"text": "a sandy beach"}]},
+}
+FACE_RESPONSE = [{"faceAttributes": {"smile": 0.9}}]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = FACE_RESPONSE if self.path.startswith("/face/") else VISION_RESPONSE
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"\xff\xd8" + b"0" * 1000)
+    return str(path)
+
+
+def client(cls, server):
+    api = cls(http=PooledHTTP(pool_size=2))
+    api.api_key = "key"
+    api.endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+    return api
+
+
+def test_sync_calls_reuse_one_connection(stub_server, image):
+    vision = client(AzureVisionAPI, stub_server)
+    for _ in range(5):
+        result = vision.analyze_image_from_file(image)
+        assert result["tags"] == ["beach", "sky"]
+        assert result["description"] == "a sandy beach"
+    assert stub_server.connections == 1
+
+    face = client(AzureFaceAPI, stub_server)
+    assert face.detect_emotion_from_file(image)["emotions"]["overall_mood"] == "joyful"
+    assert face.detect_emotion("https://example.com/a.jpg")["face_count"] == 1
+    assert stub_server.connections == 2
+
+
+def test_session_is_recreated_after_fork(monkeypatch):
+    http = PooledHTTP()
+    session = http.session
+    assert http.session is session
+    monkeypatch.setattr("app.utils.http_session.os.getpid", lambda: -1)
+    assert http.session is not session
@@ -0,0 +1,124 @@
+"""Tests for per-user vector index shards."""
+import numpy as np
+
+from app.database.models_media import ProcessingStatus
+from app.services.index_shards import IndexShards
+from app.services.media_attributes import MediaAttributes
+
+DIM = 8
+
+
+def rows_for(owner_id, count=3):
+    return [(owner_id * 100 + i, np.eye(DIM)[i % DIM]) for i in range(count)]
+
+
+def test_shard_loads_once_and_updates_in_place():
+    shards = IndexShards(dimension=DIM)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return rows_for(1)
+
+    shard = shards.shard(1, load)
+    assert len(shard) == 3
+    assert shards.shard(1, load) is shard
+    assert len(loads) == 1
+
+    shards.upsert(1, 150, np.eye(DIM)[5])
+    shards.remove(1, 100)
+    assert 150 in shard and 100 not in shard
+
+    # Updates for users without a loaded shard cost nothing
+    shards.upsert(2, 200, np.eye(DIM)[0])
+    assert 2 not in shards
+
+
+def test_least_recently_used_shard_is_evicted():
+    one_shard = IndexShards(dimension=DIM).shard(1, lambda: rows_for(1)).nbytes
+    shards = IndexShards(dimension=DIM, memory_budget=2 * one_shard)
+
+    shards.shard(1, lambda: rows_for(1))
+    shards.shard(2, lambda: rows_for(2))
+    shards.shard(1, lambda: rows_for(1))  # user 1 is hot again
+    shards.shard(3, lambda: rows_for(3))
+
+    assert shards.loaded_owners() == [1, 3]
+    assert shards.nbytes <= shards.memory_budget
+
+
+def test_oversized_shard_still_loads():
+    shards = IndexShards(dimension=DIM, memory_budget=1)
+    shards.shard(1, lambda: rows_for(1))
+    shards.shard(2, lambda: rows_for(2))
+
+    assert shards.loaded_owners() == [2]
+
+
+def test_filter_attributes_follow_row_moves():
+    shards = IndexShards(dimension=DIM)
+    attributes = {
+        i: MediaAttributes(has_people=i % 2 == 0, tags=(f"tag{i}",), status=ProcessingStatus.DONE)
+        for i in range(6)
+    }
+    shard = shards.shard(1, lambda: [(i, np.eye(DIM)[i], attributes[i]) for i in range(6)])
+
+    def matches(filters):
+        return sorted(int(i) for i in shard.score(np.ones(DIM), filters=filters)[0])
+
+    assert matches({"has_people": True}) == [0, 2, 4]
+    # Removing a row moves the last one into its slot
+    shard.remove(0)
+    shard.remove(5)
+    assert matches({"has_people": True}) == [2, 4]
+    assert matches({"tags": ["tag4", "tag0"]}) == [4]
+
+    shards.upsert(1, 4, np.eye(DIM)[4], attributes[4]._replace(tags=("other",)))
+    shards.upsert(1, 7, np.eye(DIM)[7])  # no attributes: never matches a filter
+    assert matches({"tags": ["tag1", "TAG2", "tag3", "tag4"]}) == [1, 2, 3]
+    assert matches({}) == [1, 2, 3, 4, 7]
+
+
+def test_shard_catches_up_with_other_processes():
+    # The "database": media_id -> (vector, updated_at)
+    rows = {i: (np.eye(DIM)[i], 1) for i in range(3)}
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [(i, vector, None) for i, (vector, _) in rows.items()]
+
+    def watermark():
+        return len(rows), max(updated for _, updated in rows.values())
+
+    def load_changed(since):
+        return [(i, vector, None) for i, (vector, updated) in rows.items() if updated >= since]
+
+    shards = IndexShards(dimension=DIM, check_interval=0)
+    shard = shards.shard(1, load, watermark, load_changed)
+
+    # Another worker ingests an item and edits one
+    rows[5] = (np.eye(DIM)[5], 2)
+    rows[0] = (np.eye(DIM)[4], 2)
+    assert shards.shard(1, load, watermark, load_changed) is shard
+    assert 5 in shard and shard.get(0)[4] == 1.0
+    assert len(loads) == 1
+
+    # A deletion elsewhere changes only the count: the shard is reloaded
+    del rows[1]
+    shard = shards.shard(1, load, watermark, load_changed)
+    assert len(loads) == 2
+    assert sorted(shard.ids.tolist()) == [0, 2, 5]
+
+
+def test_shard_checks_watermark_at_most_every_interval():
+    calls = []
+
+    def watermark():
+        calls.append(1)
+        return 3, 1
+
+    shards = IndexShards(dimension=DIM, check_interval=60)
+    for _ in range(3):
+        shards.shard(1, lambda: rows_for(1), watermark)
+    assert len(calls) == 1
@@ -0,0 +1,107 @@
+"""Tests for the normalized media_tags table and the queries built on it."""
+import pytest
+
+from app.database.migrations import backfill_media_tags
+from app.database.models_album import Album
+from app.database.models_media import Media, MediaTag, ProcessingStatus
+from app.database.models_user import User
+from app.services.album_service import SmartAlbumService
+from app.services.search_service import SearchService
+
+
+def tag_rows(db):
+    return sorted(db.query(MediaTag.media_id, MediaTag.tag, MediaTag.position))
+
+
+def test_tag_rows_follow_media_tags(db_session, add_media, owner):
+    media = add_media(owner, "a", tags=["Cat", " dog ", "cat"])
+    assert tag_rows(db_session) == [(media.id, "cat", 0), (media.id, "dog", 1)]
+
+    media.tags = ["dog", "bird"]
+    db_session.commit()
+    assert tag_rows(db_session) == [(media.id, "bird", 1), (media.id, "dog", 0)]
+
+    db_session.delete(media)
+    db_session.commit()
+    assert tag_rows(db_session) == []
+
+
+def test_backfill_fills_only_missing_rows(db_session, add_media, owner):
+    # Bulk inserts skip the ORM hook, like rows written before the table existed
+    db_session.bulk_insert_mappings(Media, [
+        {"owner_id": owner.id, "filename": "old.jpg", "stored_path": "uploads/old.jpg",
+         "mime_type": "image/jpeg", "size_bytes": 1, "status": ProcessingStatus.DONE,
+         "tags": ["Beach", "sand"]},
+    ])
+    db_session.commit()
+    add_media(owner, "new", tags=["dog"])
+
+    engine = db_session.get_bind()
+    assert backfill_media_tags(engine) == 1
+    assert backfill_media_tags(engine) == 0
+    assert [tag for _, tag, _ in tag_rows(db_session)] == ["beach", "sand", "dog"]
+
+
+def test_tag_filter_matches_whole_tags(db_session, add_media, owner):
+    cat = add_media(owner, "cat", tags=["cat"])
+    add_media(owner, "category", tags=["category"])
+    dog = add_media(owner, "dog", tags=["Dog", "grass"])
+    add_media(owner, "pending", tags=["cat"], status=ProcessingStatus.PENDING)
+
+    query = db_session.query(Media.id).filter(Media.status == ProcessingStatus.DONE)
+    filtered = SearchService(db_session)._apply_filters(query, {"tags": ["CAT", "dog"]})
+    assert sorted(media_id for media_id, in filtered) == [cat.id, dog.id]
+
+
+def test_suggestions_count_tags_in_the_database(db_session, add_media, owner):
+    for i, tags in enumerate([["beach", "photo"], ["Beach", "dog"], ["dog", "beach"], ["city"], ["city"]]):
+        add_media(owner, str(i), tags=tags)
+    add_media(owner, "pending", tags=["city"], status=ProcessingStatus.PENDING)
+    db_session.add(Album(owner_id=owner.id, title="Dog", theme_tag="dog"))
+    db_session.commit()
+
+    suggestions = SmartAlbumService(db_session).get_album_suggestions(owner.id)
+    assert suggestions == [
+        {"theme": "beach", "title": "Beach", "photo_count": 3},
+        {"theme": "city", "title": "City", "photo_count": 2},
+    ]
+
+
+@pytest.mark.parametrize("max_albums", [30, 4])
+def test_rebuild_matches_photo_by_photo_assignment(db_session, add_media, monkeypatch, max_albums):
+    monkeypatch.setattr(SmartAlbumService, "MAX_AUTO_ALBUMS", max_albums)
+    library = [
+        (["sky", "Beach", "sand", "water", "people"], False),
+        (["tree", "nature", "grass", "outdoor"], True),
+        (["food", "plate", "indoor"], True),
+        (["person", "Party", "cake", "people", "birthday"], True),
+        (["photo", "ab", "dog"], False),
+        ([], True),
+        (["sky", "mountain", "snow"], False),
+    ]
+    users = []
+    for email in ("loop@example.com", "rebuild@example.com"):
+        user = User(email=email, hashed_password="x")
+        db_session.add(user)
+        db_session.commit()
+        for i, (tags, has_people) in enumerate(library):
+            add_media(user, str(i), tags=tags, has_people=has_people)
+        users.append(user)
+    looped, rebuilt = users
+    service = SmartAlbumService(db_session)
+
+    assigned = sum(
+        len(service.assign_to_albums(media))
+        for media in db_session.query(Media).filter(Media.owner_id == looped.id).order_by(Media.id)
+    )
+    result = service.rebuild_albums(rebuilt.id)
+
+    def albums(user):
+        return sorted(
+            (album.theme_tag, album.title)
+            for album in db_session.query(Album).filter(Album.owner_id == user.id)
+        )
+
+    assert albums(rebuilt) == albums(looped)
+    assert len(albums(rebuilt)) <= max_albums
+    assert result == {"photos_processed": len(library), "assignments_made": assigned}
@@ -0,0 +1,161 @@
+"""Tests for the precomputed "more like this" neighbour lists."""
+import time
+
+import pytest
+
+from app.database.models_media import MediaNeighbor, ProcessingStatus
+from app.services import search_service as search_module
+from app.services.index_shards import IndexShards
+from app.services.neighbor_graph import NeighborGraph
+from app.services.search_service import SearchService
+from app.services.vector_index import VectorIndex
+
+DIM = 8
+
+
+@pytest.fixture
+def graph(db_session, monkeypatch):
+    graph = NeighborGraph(k=2, max_age_seconds=60)
+    monkeypatch.setattr(search_module, "neighbor_graph", graph)
+    monkeypatch.setattr(search_module, "vector_index", VectorIndex(dimension=DIM))
+    monkeypatch.setattr(search_module, "index_shards", IndexShards(dimension=DIM))
+    return graph
+
+
+@pytest.fixture
+def library(db_session, add_media, unit, owner):
+    return {
+        caption: add_media(owner, caption, embedding=unit(values).tolist())
+        for caption, values in [
+            ("beach", [1, 0, 0, 0, 0, 0, 0, 0]),
+            ("sunset beach", [1, 1, 0, 0, 0, 0, 0, 0]),
+            ("sunset", [0, 1, 0, 0, 0, 0, 0, 0]),
+            ("mountain", [0, 0, 1, 0, 0, 0, 0, 0]),
+        ]
+    }
+
+
+def neighbor_ids(db, media_id):
+    return [
+        neighbor_id for neighbor_id, in db.query(MediaNeighbor.neighbor_id).filter(
+            MediaNeighbor.media_id == media_id
+        ).order_by(MediaNeighbor.rank)
+    ]
+
+
+def test_first_request_stores_list_and_later_ones_read_it(db_session, unit, graph, owner, library, monkeypatch):
+    service = SearchService(db_session)
+    beach = library["beach"]
+
+    results = service.get_recommendations(beach.id, user_id=owner.id, limit=2)
+    assert [r["media"].caption for r in results] == ["sunset beach", "sunset"]
+    assert neighbor_ids(db_session, beach.id) == [library["sunset beach"].id, library["sunset"].id]
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("expected a neighbour table lookup")
+
+    monkeypatch.setattr(SearchService, "similar_ranking", no_scan)
+    results = service.get_recommendations(beach.id, user_id=owner.id, limit=1)
+    assert [r["media"].caption for r in results] == ["sunset beach"]
+    assert results[0]["score"] == pytest.approx(float(unit([1, 1, 0, 0, 0, 0, 0, 0])[0]))
+
+
+def test_stale_other_scope_and_long_requests_rank_live(db_session, graph, owner, library):
+    service = SearchService(db_session)
+    beach = library["beach"]
+    service.refresh_neighbors(beach.id)
+
+    assert graph.lookup(db_session, beach.id, owner.id, 2) is not None
+    # Ranked for the owner's library, which is also the unscoped default
+    assert graph.lookup(db_session, beach.id, None, 2) is not None
+    assert graph.lookup(db_session, beach.id, owner.id + 1, 2) is None
+    # More than k neighbours
+    assert graph.lookup(db_session, beach.id, owner.id, 3) is None
+
+    db_session.query(MediaNeighbor).update({"computed_at": time.time() - 120})
+    db_session.commit()
+    assert graph.lookup(db_session, beach.id, owner.id, 2) is None
+    assert graph.stale_ids(db_session, 10)[-1] == beach.id
+
+    # Falls back to a live scan beyond k
+    results = service.get_recommendations(beach.id, user_id=owner.id, limit=3)
+    assert [r["media"].caption for r in results] == ["sunset beach", "sunset", "mountain"]
+
+
+def test_new_items_are_merged_into_neighbour_lists(db_session, add_media, unit, graph, owner, library):
+    service = SearchService(db_session)
+    for media in library.values():
+        service.refresh_neighbors(media.id)
+    mountain = library["mountain"]
+
+    peak = add_media(owner, "peak", embedding=unit([0, 0, 1, 0.2, 0, 0, 0, 0]).tolist())
+    search_module.index_shards.upsert(owner.id, peak.id, peak.embedding)
+    service.index_neighbors(peak.id)
+
+    assert neighbor_ids(db_session, peak.id)[0] == mountain.id
+    assert neighbor_ids(db_session, mountain.id)[0] == peak.id
+    # Not close enough to displace anything in the beach list
+    assert peak.id not in neighbor_ids(db_session, library["beach"].id)
+
+    graph.forget(db_session, peak.id)
+    assert neighbor_ids(db_session, peak.id) == []
+    assert neighbor_ids(db_session, mountain.id) == []
+    assert neighbor_ids(db_session, library["beach"].id) != []
+
+
+def test_sweep_ranks_missing_lists(db_session, graph, library):
+    assert graph.sweep(db_session, batch=3) == 3
+    assert graph.sweep(db_session) == 1
+    assert graph.sweep(db_session) == 0
+    assert all(neighbor_ids(db_session, media.id) for media in library.values())
+
+
+def test_unscoped_requests_read_the_owner_list(db_session, graph, owner, library, monkeypatch):
+    service = SearchService(db_session)
+    beach = library["beach"]
+    results = service.get_recommendations(beach.id, limit=2)
+    assert [r["media"].caption for r in results] == ["sunset beach", "sunset"]
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("expected a neighbour table lookup")
+
+    monkeypatch.setattr(SearchService, "similar_ranking", no_scan)
+    assert len(service.get_recommendations(beach.id, limit=2)) == 2
+
+
+def test_sweep_skips_unfinished_media_and_leaves_shard_cache_alone(
+    db_session, add_media, unit, graph, owner, library
+):
+    pending = add_media(owner, "pending", embedding=unit([1, 0, 0, 0, 0, 0, 0, 0]).tolist(),
+                        status=ProcessingStatus.PROCESSING)
+
+    assert pending.id not in graph.stale_ids(db_session, 10)
+    assert graph.sweep(db_session) == 4
+    assert search_module.index_shards.loaded_owners() == []
+    assert neighbor_ids(db_session, library["beach"].id)[0] == library["sunset beach"].id
+
+
+def test_empty_lists_are_remembered(db_session, add_media, unit, graph, owner):
+    only = add_media(owner, "only", embedding=unit([1, 0, 0, 0, 0, 0, 0, 0]).tolist())
+
+    assert graph.sweep(db_session) == 1
+    assert graph.sweep(db_session) == 0
+    assert graph.lookup(db_session, only.id, owner.id, 2) == []
+
+    # The next upload is merged into the placeholder list
+    other = add_media(owner, "other", embedding=unit([1, 1, 0, 0, 0, 0, 0, 0]).tolist())
+    SearchService(db_session).index_neighbors(other.id)
+    assert neighbor_ids(db_session, only.id) == [other.id]
+
+
+def test_only_one_process_sweeps(tmp_path):
+    lock_path = str(tmp_path / "sweep.lock")
+    first = NeighborGraph(sweep_lock_path=lock_path)
+    second = NeighborGraph(sweep_lock_path=lock_path)
+
+    assert first._hold_sweep_lock()
+    assert not second._hold_sweep_lock()
+
+    first.stop_sweeper()
+    assert second._hold_sweep_lock()
+    second.stop_sweeper()
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import inspect
+
+from app.database.models_media import ProcessingStatus
+from app.schemas.media import MediaCard
+from app.services.search_service import SearchService
+
+
+def captions(results):
+    return sorted(r["media"].caption for r in results)
+
+
+def test_text_search_is_tokenized_and_prefix_aware(db_session, add_media, owner):
+    add_media(owner, "Kids playing on the sunny beach")
+    add_media(owner, "Snowy mountain hike", tags=["mountain", "snow"])
+    add_media(owner, "Beach volleyball with friends")
+    service = SearchService(db_session)
+
+    assert service.use_fts
+    # Word order and partial words no longer need a literal substring match
+    results = service.text_search("beach kid")
+    assert results[0]["media"].caption == "Kids playing on the sunny beach"
+    assert captions(service.text_search("volley")) == ["Beach volleyball with friends"]
+    # Tags are indexed too
+    assert captions(service.text_search("snow")) == ["Snowy mountain hike"]
+    # FTS syntax in user input is treated as plain words
+    assert service.text_search('"x* NOT -y') == []
+
+
+def test_text_scores_are_bm25_normalized(db_session, add_media, owner):
+    add_media(owner, "Sunset over the beach", tags=["beach", "sunset"])
+    add_media(owner, "Beach towels drying", tags=["towel"])
+    add_media(owner, "City skyline at night", tags=["city"])
+
+    results = SearchService(db_session).text_search("beach sunset")
+
+    assert [r["media"].caption for r in results] == ["Sunset over the beach", "Beach towels drying"]
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert 0.0 < results[1]["score"] < 1.0
+
+
+def test_text_index_follows_updates_and_deletes(db_session, add_media, owner):
+    media = add_media(owner, "Placeholder", status=ProcessingStatus.PROCESSING)
+    service = SearchService(db_session)
+
+    media.caption = "Birthday cake with candles"
+    media.tags = ["cake", "party"]
+    media.status = ProcessingStatus.DONE
+    db_session.commit()
+    assert captions(service.text_search("party")) == ["Birthday cake with candles"]
+    assert service.text_search("placeholder") == []
+
+    db_session.delete(media)
+    db_session.commit()
+    assert service.text_search("cake") == []
+
+
+def test_hybrid_search_without_embeddings_ranks_by_text(db_session, add_media, owner, monkeypatch):
+    from app.services import search_service as search_module
+
+    monkeypatch.setattr(search_module.embedding_service, "generate_embedding", lambda text: None)
+    add_media(owner, "Sunset over the beach")
+    add_media(owner, "City skyline at night")
+
+    results = SearchService(db_session).hybrid_search("beach")
+
+    assert [r["media"].caption for r in results] == ["Sunset over the beach"]
+    assert results[0]["text_score"] == pytest.approx(1.0)
+    assert results[0]["semantic_score"] == 0.0
+
+
+def test_hydrate_loads_only_card_columns(db_session, add_media, owner):
+    media = add_media(owner, "Beach at dusk", tags=["beach"], search_text="beach dusk")
+    media.embedding = [1.0, 0.0]
+    db_session.commit()
+    media_id = media.id
+    db_session.expunge_all()
+
+    [result] = SearchService(db_session).hydrate([(media_id, 0.5)], "text")
+    unloaded = inspect(result["media"]).unloaded
+    assert {"embedding", "coarse_embedding", "search_text"} <= unloaded
+
+    card = MediaCard.from_media(result["media"], "http://host")
+    assert card.file_url == f"http://host/{media.stored_path}"
+    assert (card.caption, card.tags) == ("Beach at dusk", ["beach"])
+    # Rendering did not pull the heavy columns in
+    assert {"embedding", "search_text"} <= inspect(result["media"]).unloaded
+
@@ -0,0 +1,185 @@
+"""Tests for server-side search snapshots behind pagination cursors."""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import search as search_routes
+from app.database.models_media import Media, ProcessingStatus
+from app.database.models_user import User
+from app.database.session import get_db
+from app.services import search_snapshots as snapshots_module
+from app.services.search_service import SearchService
+from app.services.search_snapshots import SearchSnapshotStore
+
+
+RANKED = [(i, 1.0 - i / 100) for i in range(1, 51)]
+
+
+def test_pages_slice_the_stored_ranking():
+    store = SearchSnapshotStore()
+    key = store.make_key("beach", "hybrid", 1, {"has_people": True})
+    cursor, _ = store.create(key, "user-1", RANKED, "hybrid")
+
+    snapshot = store.get(cursor, key, "user-1")
+    assert len(snapshot) == 50
+    assert [media_id for media_id, _ in snapshot.page(20, 20)] == list(range(21, 41))
+    assert snapshot.page(40, 20)[-1][0] == 50
+
+
+def test_cursor_only_serves_its_own_search_and_client():
+    store = SearchSnapshotStore()
+    key = store.make_key("beach", "hybrid", 1, None)
+    cursor, _ = store.create(key, "user-1", RANKED, "hybrid")
+
+    assert store.get(cursor, store.make_key("sunset", "hybrid", 1, None), "user-1") is None
+    assert store.get(cursor, key, "user-2") is None
+    assert store.get("made-up", key, "user-1") is None
+
+
+def test_snapshots_expire_and_are_bounded_per_user(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(snapshots_module.time, "time", lambda: now[0])
+    store = SearchSnapshotStore(ttl_seconds=60, max_per_user=2, max_results=10)
+
+    cursors = [
+        store.create(store.make_key(q, "text", 1, None), "user-1", RANKED, "text")[0]
+        for q in ("a", "b", "c")
+    ]
+    # Oldest snapshot evicted; results capped
+    assert store.get(cursors[0], store.make_key("a", "text", 1, None), "user-1") is None
+    assert len(store.get(cursors[2], store.make_key("c", "text", 1, None), "user-1")) == 10
+
+    now[0] += 61
+    assert store.get(cursors[2], store.make_key("c", "text", 1, None), "user-1") is None
+
+
+def test_anonymous_clients_do_not_share_snapshots():
+    store = SearchSnapshotStore(max_per_user=2, max_clients=3)
+    key = store.make_key("beach", "hybrid", None, None)
+    first, _ = store.create(key, store.client_for(None), RANKED, "hybrid")
+    client = store.client_for(None, first)
+    assert client.startswith("anon-") and store.get(first, key, client)
+
+    # Other anonymous callers fill their own groups, not this client's
+    for _ in range(2):
+        store.create(key, store.client_for(None), RANKED, "hybrid")
+    assert store.get(first, key, client)
+    assert store.get(first, key, store.client_for(None)) is None
+    assert store.get(first, key, store.client_for(7, first)) is None
+
+    # The least recently used client goes once there are too many
+    for _ in range(3):
+        store.create(key, store.client_for(None), RANKED, "hybrid")
+    assert store.get(first, key, client) is None
+
+
+def test_snapshot_extends_without_repeating_results():
+    store = SearchSnapshotStore(window=10)
+    key = store.make_key("beach", "hybrid", 1, None)
+    depth = store.depth(20)
+    _, snapshot = store.create(key, "user-1", RANKED[:depth], "hybrid", depth)
+    assert depth == 30 and not snapshot.covers(40)
+
+    # A deeper ranking whose head shifted slightly keeps the served order
+    deeper = [RANKED[1], RANKED[0]] + RANKED[2:]
+    snapshot.extend(deeper, store.depth(40))
+    assert snapshot.covers(40) and len(snapshot) == 50
+    assert [media_id for media_id, _ in snapshot.page(0, 50)] == list(range(1, 51))
+
+
+def add_library(db, count):
+    user = User(email="pages@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    for i in range(count):
+        db.add(Media(
+            owner_id=user.id,
+            filename=f"{i}.jpg",
+            stored_path=f"uploads/{i}.jpg",
+            mime_type="image/jpeg",
+            size_bytes=1,
+            status=ProcessingStatus.DONE,
+            caption=f"Beach day {i}",
+        ))
+    db.commit()
+    return user
+
+
+def test_search_route_ranks_in_windows(db_session, monkeypatch):
+    user = add_library(db_session, 12)
+    monkeypatch.setattr(search_routes, "search_snapshots", SearchSnapshotStore(max_results=8, window=2))
+    depths = []
+    rank = SearchService.rank
+
+    def recording_rank(self, *args, **kwargs):
+        depths.append((kwargs["limit"], kwargs["offset"]))
+        return rank(self, *args, **kwargs)
+    monkeypatch.setattr(SearchService, "rank", recording_rank)
+
+    app = FastAPI()
+    app.include_router(search_routes.router, prefix="/api/search")
+    app.dependency_overrides[get_db] = lambda: db_session
+    client = TestClient(app)
+
+    seen, cursor = [], None
+    for offset in range(0, 12, 3):
+        params = {"query": "beach", "search_type": "text", "user_id": user.id, "limit": 3, "offset": offset}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/search/", params=params).json()
+        cursor = body["cursor"]
+        seen += [result["id"] for result in body["results"]]
+
+    # Every result once; the snapshot grew a window at a time up to its
+    # cap, and pages past the cap were ranked on their own
+    assert len(seen) == len(set(seen)) == 12
+    assert depths == [(5, 0), (8, 0), (3, 6), (3, 9)]
+
+
+def test_rank_then_hydrate_pages(db_session):
+    user = User(email="pages@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.flush()
+    for i in range(5):
+        db_session.add(Media(
+            owner_id=user.id,
+            filename=f"{i}.jpg",
+            stored_path=f"uploads/{i}.jpg",
+            mime_type="image/jpeg",
+            size_bytes=1,
+            status=ProcessingStatus.DONE,
+            caption=f"Beach day {i}",
+        ))
+    db_session.commit()
+    service = SearchService(db_session)
+
+    ranked, match_type = service.rank("beach", "text", user_id=user.id)
+    assert match_type == "text" and len(ranked) == 5
+
+    page = service.hydrate(ranked[2:4], match_type)
+    assert [r["media"].id for r in page] == [media_id for media_id, _ in ranked[2:4]]
+
+
+def test_batch_larger_than_user_cap_keeps_every_cursor(db_session, monkeypatch):
+    user = add_library(db_session, 6)
+    store = SearchSnapshotStore(max_per_user=8, window=2)
+    monkeypatch.setattr(search_routes, "search_snapshots", store)
+
+    app = FastAPI()
+    app.include_router(search_routes.router, prefix="/api/search")
+    app.dependency_overrides[get_db] = lambda: db_session
+    client = TestClient(app)
+
+    queries = [f"beach {i}" for i in range(20)]
+    body = client.post("/api/search/batch", json={
+        "queries": queries, "search_type": "text", "user_id": user.id, "limit": 2,
+    }).json()
+    first = body["results"][0]
+
+    # The first cursor of the batch still pages its own snapshot
+    assert store.get(first["cursor"], store.make_key(queries[0], "text", user.id, {}),
+                     store.client_for(None, first["cursor"]))
+    page = client.get("/api/search/", params={
+        "query": queries[0], "search_type": "text", "user_id": user.id,
+        "limit": 2, "offset": 2, "cursor": first["cursor"],
+    }).json()
+    assert page["cursor"] == first["cursor"]
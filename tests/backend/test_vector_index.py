@@ -0,0 +1,437 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from app.database.models_media import Media
+from app.database.models_user import User
+from app.services import search_service as search_module
+from app.services.search_service import SearchService
+from app.services.ann_index import ann_available
+from app.services.index_shards import IndexShards
+from app.services.vector_index import VectorIndex, top_k
+
+DIM = 8
+
+
+def test_upsert_search_and_remove():
+    index = VectorIndex(dimension=DIM, initial_capacity=2)
+    index.upsert(1, np.eye(DIM)[0])
+    index.upsert(2, np.eye(DIM)[1])
+    index.upsert(3, np.eye(DIM)[0] + np.eye(DIM)[1])
+
+    ranked = index.search(np.eye(DIM)[0], limit=3)
+    assert [media_id for media_id, _ in ranked] == [1, 3, 2]
+    assert ranked[0][1] == pytest.approx(1.0)
+
+    assert index.remove(1)
+    assert 1 not in index and len(index) == 2
+    assert [media_id for media_id, _ in index.search(np.eye(DIM)[0], limit=3)] == [3, 2]
+
+
+def test_candidate_and_exclude_filters():
+    index = VectorIndex(dimension=DIM)
+    index.upsert_many((i, np.eye(DIM)[i % DIM]) for i in range(1, 9))
+
+    ranked = index.search(np.eye(DIM)[1], limit=5, candidate_ids=[1, 2, 3], exclude_ids=[1])
+    assert [media_id for media_id, _ in ranked] == [2, 3]
+
+
+def test_rejects_wrong_dimension_and_zero_vectors():
+    index = VectorIndex(dimension=DIM)
+    assert not index.upsert(1, [1.0, 2.0])
+    assert not index.upsert(2, np.zeros(DIM))
+    assert len(index) == 0
+
+
+@pytest.mark.parametrize("k", [0, 1, 7, 20, 200, 500])
+def test_top_k_matches_stable_sort(k):
+    # Few distinct values, so many ties straddle the cut-off
+    scores = np.random.default_rng(0).integers(0, 10, 300).astype(np.float32)
+
+    expected = np.argsort(-scores, kind="stable")[:k]
+    assert np.array_equal(top_k(scores, k), expected)
+
+
+@pytest.fixture
+def library(db_session, add_media, unit, owner, monkeypatch):
+    monkeypatch.setattr(search_module, "vector_index", VectorIndex(dimension=DIM))
+    monkeypatch.setattr(search_module, "index_shards", IndexShards(dimension=DIM))
+
+    vectors = {
+        "beach": unit([1, 0, 0, 0, 0, 0, 0, 0]),
+        "sunset beach": unit([1, 1, 0, 0, 0, 0, 0, 0]),
+        "mountain": unit([0, 0, 1, 0, 0, 0, 0, 0]),
+    }
+    rows = {
+        caption: add_media(owner, caption, embedding=vec.tolist())
+        for caption, vec in vectors.items()
+    }
+
+    monkeypatch.setattr(
+        search_module.embedding_service,
+        "generate_embedding",
+        lambda text: vectors[text].tolist(),
+    )
+    return owner, rows
+
+
+def test_semantic_search_uses_index(db_session, library):
+    user, rows = library
+    results = SearchService(db_session).semantic_search("beach", user_id=user.id, limit=2)
+
+    assert [r["media"].caption for r in results] == ["beach", "sunset beach"]
+    # User-scoped searches load the owner's shard, not the global index
+    assert user.id in search_module.index_shards
+    assert len(search_module.vector_index) == 0
+
+    unscoped = SearchService(db_session).semantic_search("beach", limit=2)
+    assert [r["media"].caption for r in unscoped] == ["beach", "sunset beach"]
+    assert len(search_module.vector_index) == 3
+
+
+def test_recommendations_exclude_reference(db_session, library):
+    user, rows = library
+    results = SearchService(db_session).get_recommendations(rows["beach"].id, user_id=user.id)
+
+    assert [r["media"].caption for r in results] == ["sunset beach", "mountain"]
+    assert all(r["match_type"] == "similar" for r in results)
+
+
+@pytest.mark.skipif(not ann_available(), reason="hnswlib not installed")
+def test_hnsw_path_matches_exact_and_tracks_deletes(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, DIM)).astype(np.float32)
+    index = VectorIndex(dimension=DIM, ann_min_items=100, persist_dir=tmp_path)
+    index.upsert_many(zip(range(1, 301), vectors))
+    index.build_ann()
+
+    query = vectors[9]
+    top = index.search(query, limit=5)
+    assert top[0][0] == 10
+
+    index.remove(10)
+    assert 10 not in [media_id for media_id, _ in index.search(query, limit=5)]
+
+    # Filters restrict the graph search to the candidate ids
+    allowed = list(range(150, 301))
+    assert all(150 <= media_id for media_id, _ in index.search(query, limit=5, candidate_ids=allowed))
+
+    index.save_ann()
+    restored = VectorIndex(dimension=DIM, ann_min_items=100, persist_dir=tmp_path)
+    assert restored.load_ann()
+    assert 10 not in [media_id for media_id, _ in restored.search(query, limit=5)]
+
+
+@pytest.mark.skipif(not ann_available(), reason="hnswlib not installed")
+@pytest.mark.parametrize("options", [{"scan_dimension": 16}, {"quantize": True}])
+def test_hnsw_path_reranks_approximate_rows(options):
+    rng = np.random.default_rng(3)
+    vectors = (rng.standard_normal((600, 64)) * np.geomspace(1.0, 0.05, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = list(range(1, 601))
+    stored = dict(zip(ids, vectors))
+    loaded = []
+
+    def loader(wanted):
+        loaded.append(len(wanted))
+        return [(i, stored[i]) for i in wanted]
+
+    exact = VectorIndex(dimension=64)
+    exact.upsert_many(zip(ids, vectors))
+    index = VectorIndex(dimension=64, ann_min_items=100, rerank_depth=200, vector_loader=loader, **options)
+    index.upsert_many(zip(ids, vectors))
+    index.build_ann()
+
+    query = rng.standard_normal(64)
+    expected = exact.search(query, limit=10, offset=5)
+    ranked = index.search(query, limit=10, offset=5)
+    assert loaded == [200]
+    assert [i for i, _ in ranked] == [i for i, _ in expected]
+    assert [s for _, s in ranked] == pytest.approx([s for _, s in expected], abs=1e-5)
+
+
+@pytest.mark.skipif(not ann_available(), reason="hnswlib not installed")
+def test_first_search_keeps_restored_graph(db_session, library, monkeypatch, tmp_path):
+    user, rows = library
+    ids = [media.id for media in rows.values()]
+    saved = VectorIndex(dimension=DIM, ann_min_items=1, persist_dir=tmp_path)
+    saved.upsert_many((media.id, media.embedding) for media in rows.values())
+    saved.build_ann()
+    saved.save_ann()
+
+    restored = VectorIndex(dimension=DIM, ann_min_items=1, persist_dir=tmp_path)
+    assert restored.load_ann()
+    added = []
+    original_add = restored._ann.add
+    monkeypatch.setattr(restored._ann, "add", lambda *args: added.append(args) or original_add(*args))
+    monkeypatch.setattr(search_module, "vector_index", restored)
+
+    SearchService(db_session)._ensure_indexed(ids)
+    assert len(restored) == 3 and added == []
+
+
+@pytest.mark.skipif(not ann_available(), reason="hnswlib not installed")
+def test_restored_graph_drops_media_changed_while_down(db_session, library, unit, tmp_path):
+    user, rows = library
+    hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    db_session.query(Media).update({"updated_at": hour_ago})
+    db_session.commit()
+    saved = VectorIndex(dimension=DIM, ann_min_items=1, persist_dir=tmp_path)
+    saved.upsert_many((media.id, media.embedding) for media in rows.values())
+    saved.build_ann()
+    saved.save_ann()
+
+    # While the server was down: one item re-embedded, one deleted
+    beach, mountain = rows["beach"], rows["mountain"]
+    beach.embedding = unit([0, 0, 0, 1, 0, 0, 0, 0]).tolist()
+    beach.updated_at = datetime.now(timezone.utc) + timedelta(seconds=5)
+    db_session.delete(mountain)
+    db_session.commit()
+
+    restored = VectorIndex(dimension=DIM, ann_min_items=1, persist_dir=tmp_path)
+    assert restored.load_ann(stale=SearchService(db_session).changed_since)
+    assert restored._ann.ids() == [rows["sunset beach"].id]
+
+    # The new vector goes into the graph when the item is loaded again
+    restored.load_many([(beach.id, beach.embedding)])
+    assert beach.id in restored._ann
+    assert restored.search(unit([0, 0, 0, 1, 0, 0, 0, 0]), limit=1)[0][0] == beach.id
+
+
+def test_owner_shard_sees_other_workers_writes(db_session, add_media, unit, library, monkeypatch):
+    monkeypatch.setattr(search_module, "index_shards", IndexShards(dimension=DIM, check_interval=0))
+    user, rows = library
+    service = SearchService(db_session)
+    shard = service._owner_shard(user.id)
+    assert len(shard) == 3
+
+    # Written by another process: this one's shard is not told
+    lake = add_media(user, "lake", embedding=unit([0, 0, 0, 1, 0, 0, 0, 0]).tolist())
+    assert service._owner_shard(user.id) is shard and lake.id in shard
+
+    db_session.delete(rows["mountain"])
+    db_session.commit()
+    shard = service._owner_shard(user.id)
+    assert sorted(shard.ids.tolist()) == sorted([rows["beach"].id, rows["sunset beach"].id, lake.id])
+
+
+def test_hybrid_semantic_scores_are_exact_on_quantized_shards(db_session, unit, library, monkeypatch):
+    user, rows = library
+    # Values int8 quantization cannot hold exactly
+    rng = np.random.default_rng(5)
+    for media in rows.values():
+        media.embedding = unit(rng.standard_normal(DIM)).tolist()
+    db_session.commit()
+    stored = {media.id: np.asarray(media.embedding) for media in rows.values()}
+    monkeypatch.setattr(search_module, "index_shards", IndexShards(
+        dimension=DIM, quantize=True, vector_loader=lambda ids: [(i, stored[i]) for i in ids]
+    ))
+    query = unit([1, 0, 0, 0, 0, 0, 0, 0])
+    expected = {media_id: float(vector @ query) for media_id, vector in stored.items()}
+    service = SearchService(db_session)
+
+    results = service.hybrid_search("beach", user_id=user.id, limit=10)
+    assert {r["media"].id: r["semantic_score"] for r in results} == pytest.approx(expected, abs=1e-6)
+
+    ids, semantic, _ = service._hybrid_signals_many(["beach"], [query], user.id, None)
+    assert dict(zip(ids.tolist(), semantic[0])) == pytest.approx(expected, abs=1e-6)
+
+
+def test_hybrid_search_ranks_every_candidate(db_session, library):
+    user, rows = library
+    service = SearchService(db_session)
+
+    results = service.hybrid_search("beach", user_id=user.id, limit=10)
+    assert [r["media"].caption for r in results] == ["beach", "sunset beach", "mountain"]
+    assert results[0]["text_score"] == pytest.approx(1.0)
+    assert results[2]["text_score"] == 0.0
+    assert results[2]["semantic_score"] == pytest.approx(0.0, abs=1e-6)
+
+    # Pages past limit * 2 used to come back empty
+    deep = service.hybrid_search("beach", user_id=user.id, limit=1, offset=2)
+    assert [r["media"].caption for r in deep] == ["mountain"]
+
+
+def test_hybrid_search_reciprocal_rank_fusion(db_session, library):
+    user, rows = library
+    results = SearchService(db_session).hybrid_search("beach", user_id=user.id, fusion="rrf")
+
+    assert [r["media"].caption for r in results] == ["beach", "sunset beach", "mountain"]
+    # Ranked first on both signals
+    assert results[0]["score"] == pytest.approx(2 / 61)
+
+
+def test_quantized_index_reranks_with_float_vectors():
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((500, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = list(range(1, 501))
+    stored = dict(zip(ids, vectors))
+
+    exact = VectorIndex(dimension=64)
+    exact.upsert_many(zip(ids, vectors))
+    coarse = VectorIndex(dimension=64, quantize=True)
+    coarse.upsert_many(zip(ids, vectors))
+    reranked = VectorIndex(
+        dimension=64, quantize=True, rerank_depth=50,
+        vector_loader=lambda wanted: [(i, stored[i]) for i in wanted],
+    )
+    reranked.upsert_many(zip(ids, vectors))
+    reranked.remove(7)
+    exact.remove(7)
+
+    assert coarse.nbytes < exact.nbytes / 3
+    query = rng.standard_normal(64)
+
+    expected = exact.search(query, limit=10)
+    approx = coarse.search(query, limit=10)
+    assert len({i for i, _ in expected} & {i for i, _ in approx}) >= 8
+    approx_scores = dict(approx)
+    for media_id, score in expected:
+        if media_id in approx_scores:
+            assert approx_scores[media_id] == pytest.approx(score, abs=0.02)
+
+    ranked = reranked.search(query, limit=10)
+    assert [i for i, _ in ranked] == [i for i, _ in expected]
+    assert [s for _, s in ranked] == pytest.approx([s for _, s in expected], abs=1e-5)
+
+
+def test_truncated_scan_reranks_with_full_vectors():
+    rng = np.random.default_rng(2)
+    # Matryoshka-style: most of the signal sits in the leading dimensions
+    vectors = (rng.standard_normal((500, 64)) * np.geomspace(1.0, 0.05, 64)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = list(range(1, 501))
+    stored = dict(zip(ids, vectors))
+
+    exact = VectorIndex(dimension=64)
+    exact.upsert_many(zip(ids, vectors))
+    truncated = VectorIndex(
+        dimension=64, scan_dimension=16, rerank_depth=100,
+        vector_loader=lambda wanted: [(i, stored[i]) for i in wanted],
+    )
+    # Rows may arrive full-length or already truncated
+    truncated.upsert_many((i, v if i % 2 else v[:16]) for i, v in zip(ids, vectors))
+
+    assert truncated.approximate
+    assert truncated.matrix.shape == (500, 16)
+    assert truncated.nbytes < exact.nbytes / 3
+
+    query = rng.standard_normal(64)
+    expected = exact.search(query, limit=10)
+    ranked = truncated.search(query, limit=10)
+    assert [i for i, _ in ranked] == [i for i, _ in expected]
+    assert [s for _, s in ranked] == pytest.approx([s for _, s in expected], abs=1e-5)
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_search_many_matches_single_queries(quantize):
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((300, 32)).astype(np.float32)
+    stored = dict(zip(range(1, 301), vectors))
+    index = VectorIndex(
+        dimension=32, quantize=quantize, rerank_depth=40,
+        vector_loader=lambda wanted: [(i, stored[i]) for i in wanted],
+    )
+    index.upsert_many(stored.items())
+    queries = list(rng.standard_normal((4, 32))) + [[1.0, 2.0]]
+    candidates = list(range(1, 301, 2))
+
+    ids, scores = index.score_many(queries, candidates)
+    assert scores.shape == (5, 150)
+    assert np.isnan(scores[4]).all()
+    for query, row in zip(queries[:4], scores):
+        single_ids, single = index.score(query, candidates)
+        assert np.array_equal(ids, single_ids)
+        assert row == pytest.approx(single, abs=1e-5)
+
+    batched = index.search_many(queries, limit=5, candidate_ids=candidates)
+    assert batched[4] == []
+    for query, ranked in zip(queries, batched[:4]):
+        single = index.search(query, limit=5, candidate_ids=candidates)
+        assert [i for i, _ in ranked] == [i for i, _ in single]
+        assert [s for _, s in ranked] == pytest.approx([s for _, s in single], abs=1e-5)
+
+
+@pytest.mark.parametrize("search_type,fusion", [("semantic", "linear"), ("hybrid", "linear"), ("hybrid", "rrf")])
+def test_rank_many_matches_rank(db_session, library, monkeypatch, search_type, fusion):
+    user, rows = library
+    batches = []
+
+    def embed_batch(texts):
+        batches.append(list(texts))
+        return [None if text == "nothing" else np.eye(DIM)[len(text) % DIM].tolist() for text in texts]
+
+    monkeypatch.setattr(search_module.embedding_service, "generate_embeddings_batch", embed_batch)
+    queries = ["beach", "sunset beach", "mountain", "nothing", "Beach", ""]
+    service = SearchService(db_session)
+
+    batched = service.rank_many(queries, search_type, user_id=user.id, fusion=fusion)
+
+    # One API call, repeated and blank queries not re-sent
+    assert batches == [["beach", "sunset beach", "mountain", "nothing"]]
+    assert batched[5] == ([], search_type)
+    # The single-query path reads the embeddings the batch cached
+    monkeypatch.setattr(search_module.embedding_service, "generate_embedding", lambda text: None)
+    for query, (ranked, match_type) in zip(queries[:5], batched):
+        expected, expected_type = service.rank(query, search_type, user_id=user.id, fusion=fusion)
+        assert match_type == expected_type
+        assert [i for i, _ in ranked] == [i for i, _ in expected]
+        assert [s for _, s in ranked] == pytest.approx([s for _, s in expected], abs=1e-6)
+
+
+@pytest.mark.parametrize("use_fts", [True, False])
+def test_rank_many_text_matches_stay_in_scope(db_session, add_media, library, monkeypatch, use_fts):
+    user, rows = library
+    stranger = User(email="b@example.com", hashed_password="x")
+    db_session.add(stranger)
+    db_session.flush()
+    add_media(stranger, "beach beach beach")
+    monkeypatch.setattr(search_module.embedding_service, "generate_embeddings_batch", lambda texts: [None] * len(texts))
+    service = SearchService(db_session)
+    service.use_fts = use_fts
+
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    [(ranked, _)] = service.rank_many(["beach"], "hybrid", user_id=user.id, filters={"has_people": False})
+
+    assert [i for i, _ in ranked] == [rows["beach"].id, rows["sunset beach"].id]
+    # The text match query is joined to the caller's candidates
+    text_queries = [sql for sql in statements if ("MATCH" in sql or "LIKE" in sql)]
+    assert text_queries and all("owner_id" in sql and "has_people" in sql for sql in text_queries)
+
+
+@pytest.mark.parametrize("filters", [
+    {"has_people": True},
+    {"has_people": False, "tags": ["SUNSET"]},
+    {"tags": ["beach", "rock", "bea"]},
+    {"date_from": datetime(2024, 6, 1), "date_to": datetime(2024, 6, 30, 23, 59)},
+    {"date_from": datetime(2024, 6, 1, tzinfo=timezone.utc)},
+])
+def test_shard_filters_match_sql_filters(db_session, library, monkeypatch, filters):
+    user, rows = library
+    attributes = {
+        "beach": (True, datetime(2024, 5, 1), ["beach", "sand"]),
+        "sunset beach": (False, datetime(2024, 6, 15), ["Sunset", "beach"]),
+        "mountain": (None, datetime(2024, 7, 1), ["rock"]),
+    }
+    for caption, (has_people, created_at, tags) in attributes.items():
+        rows[caption].has_people = has_people
+        rows[caption].created_at = created_at
+        rows[caption].tags = tags
+    db_session.commit()
+    service = SearchService(db_session)
+
+    # Unscoped searches filter in SQL
+    expected = service.semantic_search("beach", limit=5, filters=filters)
+    assert expected
+
+    def no_candidates(*args, **kwargs):
+        raise AssertionError("expected the shard to filter")
+
+    monkeypatch.setattr(SearchService, "_candidate_ids", no_candidates)
+    results = service.semantic_search("beach", user_id=user.id, limit=5, filters=filters)
+    assert [r["media"].id for r in results] == [r["media"].id for r in expected]
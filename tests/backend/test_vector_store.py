@@ -0,0 +1,98 @@
+"""Tests for the memory-mapped vector store shared between workers."""
+import numpy as np
+import pytest
+
+from app.services.vector_index import MappedVectorIndex, VectorIndex
+from app.services.vector_store import SegmentStore
+
+DIM = 8
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return tmp_path / "vectors"
+
+
+def test_second_process_sees_appends_and_deletes(store_dir):
+    writer = MappedVectorIndex(store_dir, dimension=DIM)
+    reader = MappedVectorIndex(store_dir, dimension=DIM)
+
+    writer.upsert_many((i, np.eye(DIM)[i % DIM]) for i in range(1, 5))
+    assert len(reader) == 4
+    assert [media_id for media_id, _ in reader.search(np.eye(DIM)[2], limit=1)] == [2]
+
+    # Replacing a vector: the latest segment wins
+    writer.upsert(2, np.eye(DIM)[5])
+    assert reader.get(2) == pytest.approx(np.eye(DIM)[5])
+
+    assert writer.remove(3)
+    assert not writer.remove(3)
+    assert 3 not in reader and reader.missing([1, 3, 9]) == [3, 9]
+    # Re-adding after a delete
+    writer.upsert(3, np.eye(DIM)[3])
+    assert 3 in reader and len(reader) == 4
+
+
+def test_compaction_keeps_live_rows(store_dir):
+    index = MappedVectorIndex(store_dir, dimension=DIM)
+    reader = MappedVectorIndex(store_dir, dimension=DIM)
+    for i in range(1, 7):
+        index.upsert(i, np.eye(DIM)[i % DIM] + 0.1)
+    index.remove(4)
+    index.upsert(5, np.eye(DIM)[0])
+    before = {media_id: reader.get(media_id) for media_id in reader.ids}
+    assert reader.store.segment_count == 7
+
+    assert index.store.compact() == 5
+    assert reader.store.segment_count == 1
+    assert sorted(reader.ids) == [1, 2, 3, 5, 6]
+    for media_id, vector in before.items():
+        assert reader.get(media_id) == pytest.approx(vector)
+    assert len(list(store_dir.glob("seg-*.vec.npy"))) == 1
+
+
+def test_scores_match_in_memory_index(store_dir):
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((300, DIM)).astype(np.float32)
+    memory = VectorIndex(dimension=DIM)
+    mapped = MappedVectorIndex(store_dir, dimension=DIM)
+    # Several segments, so scans and gathers cross segment boundaries
+    for start in range(0, 300, 70):
+        items = [(i + 1, vectors[i]) for i in range(start, min(start + 70, 300))]
+        memory.upsert_many(items)
+        mapped.upsert_many(items)
+
+    query = rng.standard_normal(DIM)
+    candidates = rng.choice(np.arange(1, 301), 40, replace=False).tolist()
+    for candidate_ids in (None, candidates):
+        expected = memory.search(query, limit=10, candidate_ids=candidate_ids)
+        actual = mapped.search(query, limit=10, candidate_ids=candidate_ids)
+        assert [i for i, _ in actual] == [i for i, _ in expected]
+        assert [s for _, s in actual] == pytest.approx([s for _, s in expected], abs=1e-5)
+
+    ids, scores = mapped.score_many([query, -query], candidate_ids=candidates)
+    assert list(ids) == candidates
+    assert scores[0] == pytest.approx(-scores[1])
+
+
+def test_vectors_loaded_for_a_search_are_not_written(store_dir):
+    index = MappedVectorIndex(store_dir, dimension=DIM)
+    index.upsert_many((i, np.eye(DIM)[i]) for i in range(1, 3))
+
+    assert index.load_many((i, np.eye(DIM)[i]) for i in range(3, 6)) == 3
+    assert index.store.segment_count == 1 and len(index.store) == 2
+    assert index.missing([1, 4, 9]) == [9] and len(index) == 5
+    assert [media_id for media_id, _ in index.search(np.eye(DIM)[4], limit=1)] == [4]
+    assert 4 not in MappedVectorIndex(store_dir, dimension=DIM)
+
+    # Once persisted (e.g. by `vector_store build`) it is scored once, from the store
+    index.upsert(4, np.eye(DIM)[4])
+    assert len(index) == 5
+    assert [media_id for media_id, _ in index.search(np.eye(DIM)[4], limit=2)][0] == 4
+    assert len(index.search(np.eye(DIM)[4], limit=10)) == 5
+
+
+def test_rejects_store_of_another_dimension(store_dir):
+    MappedVectorIndex(store_dir, dimension=DIM).upsert(1, np.ones(DIM))
+    with pytest.raises(ValueError):
+        SegmentStore(store_dir, DIM * 2)